@@ -0,0 +1,159 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import database, importer, report, search
+from app.pool import ConnectionPool
+
+# Nombre de résultats lus à chaque aller-retour vers l'exécuteur
+ASYNC_PAGE_SIZE = 500
+# Threads (et connexions) de lecture par défaut
+READ_THREADS = 4
+
+
+class AsyncInventory:
+    """Façade asyncio de l'inventaire, sur un ConnectionPool. Les
+    écritures s'exécutent dans l'ordre de leur soumission sur un thread
+    dédié, seul à utiliser la connexion d'écriture ; les lectures
+    (recherches, rapports) sur readers threads ayant chacun sa connexion
+    de lecture : un rapport long ne bloque ni les recherches ni une
+    importation, et la boucle d'événements n'est jamais bloquée. Une
+    lecture voit les écritures terminées, pas celle en cours. La base
+    doit être sur disque (WAL partagé entre les connexions).
+
+    Exemple :
+        async with AsyncInventory("inventory.db") as inventory:
+            await inventory.import_csv_files(["fruits.csv"])
+            async for row in inventory.iter_search(["category:=Fruits"]):
+                ...
+    """
+
+    def __init__(self, db_path="inventory.db", profile="performance",
+                 config_file=None, readers=READ_THREADS):
+        self.db_path = db_path
+        self.profile = profile
+        self.config_file = config_file
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="inventory-writer"
+            )
+        # Un lecteur du pool par thread : leur nombre est borné ici
+        self._readers = ThreadPoolExecutor(
+            max_workers=readers, thread_name_prefix="inventory-reader"
+            )
+        self._pool = None
+
+    async def open(self):
+        if self._pool is None:
+            self._pool = await self._submit(
+                self._writer, ConnectionPool, self.db_path, self.profile,
+                self.config_file
+                )
+        return self
+
+    async def close(self):
+        # Les lectures en cours se terminent avant la fermeture du pool ;
+        # l'attente a lieu hors de la boucle d'événements
+        await asyncio.to_thread(self._readers.shutdown)
+        if self._pool is not None:
+            await self._submit(self._writer, self._pool.close)
+            self._pool = None
+        await asyncio.to_thread(self._writer.shutdown)
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _submit(self, executor, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(
+            executor, functools.partial(fn, *args, **kwargs)
+            )
+
+    def _connections(self):
+        if self._pool is None:
+            raise RuntimeError("La base n'est pas ouverte (await open()).")
+        return self._pool
+
+    def _read(self, fn, *args, **kwargs):
+        """Exécute fn(connexion de lecture, ...) sur un thread de lecture"""
+        pool = self._connections()
+
+        def run():
+            with pool.reader() as conn:
+                return fn(conn, *args, **kwargs)
+        return self._submit(self._readers, run)
+
+    def _write(self, fn, *args, **kwargs):
+        """Exécute fn(connexion d'écriture, ...) sur le thread d'écriture ;
+        la transaction est validée au retour, annulée en cas d'erreur"""
+        pool = self._connections()
+
+        def run():
+            with pool.writer() as conn:
+                return fn(conn, *args, **kwargs)
+        return self._submit(self._writer, run)
+
+    async def import_csv_files(self, file_paths, workers=1, **kwargs):
+        """Importe les fichiers ; l'annulation de la tâche interrompt
+        l'importation au lot suivant (ImportCancelled côté thread) et
+        annule les lignes non validées avant de propager CancelledError"""
+        cancel_event = threading.Event()
+        future = self._write(
+            lambda conn: importer.import_csv_files_parallel(
+                file_paths, conn, workers=workers, verbose=False,
+                cancel_event=cancel_event, **kwargs
+                )
+            )
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            # Attendre le retour du thread : la connexion doit être libre
+            # (et la transaction annulée) avant l'opération suivante
+            try:
+                await future
+            except importer.ImportCancelled:
+                pass
+            raise
+
+    async def search(self, search_criteria):
+        """Liste des produits correspondant aux critères"""
+        return [row async for row in self.iter_search(search_criteria)]
+
+    async def iter_search(self, search_criteria, page_size=ASYNC_PAGE_SIZE):
+        """Itération asynchrone sur les résultats, page par page (keyset) :
+        aucun curseur ne reste ouvert entre deux pages"""
+        after_id = None
+        while True:
+            rows, after_id = await self._read(
+                search.search_page, search_criteria, page_size, after_id
+                )
+            for row in rows:
+                yield row
+            if after_id is None:
+                break
+
+    async def write_report(self, report_name, output_file, **kwargs):
+        return await self._read(
+            report.write_report, report_name, output_file, **kwargs
+            )
+
+    async def generate_summary_report(self, output_file):
+        return await self._read(report.generate_summary_report, output_file)
+
+    async def add_product(self, name, quantity, price, category):
+        return await self._write(
+            database.add_product, name, quantity, price, category
+            )
+
+    async def delete_item_by_id(self, item_id):
+        return await self._write(database.delete_item_by_id, item_id)
+
+    async def delete_items(self, **filters):
+        return await self._write(database.delete_items, **filters)
+
+    async def update_items(self, **changes):
+        return await self._write(database.update_items, **changes)
@@ -0,0 +1,237 @@
+import bisect
+import csv
+import heapq
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:  # calculs en pur Python sur les mêmes tableaux
+    numpy = None
+
+from app.database import FETCH_SIZE, data_version
+from app.instrumentation import instrumented, record_rows
+from app.report import REPORTS
+
+# Type NumPy correspondant à chaque type de tableau array
+NUMPY_TYPES = {"q": "int64", "d": "float64", "I": "uint32"}
+# Tolérance de la comparaison des totaux avec la base
+TOLERANCE = 1e-6
+
+
+def _view(values):
+    """Vue NumPy (sans copie) d'un tableau array. Elle ne doit pas être
+    conservée : un tableau exporté ne peut plus être agrandi."""
+    return numpy.frombuffer(values, dtype=NUMPY_TYPES[values.typecode])
+
+
+def _percentile(ordered, fraction):
+    """Percentile par interpolation linéaire (méthode par défaut de
+    numpy.percentile) d'une liste triée"""
+    position = (len(ordered) - 1) * fraction
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class InventoryColumns:
+    """Copie en mémoire de la table inventory, colonne par colonne :
+    tableaux typés pour les nombres, catégories encodées par un
+    dictionnaire (numéro de catégorie par produit). Les calculs utilisent
+    NumPy s'il est installé, des boucles Python sinon.
+
+    refresh() ajoute les produits insérés depuis le chargement ; si les
+    totaux par catégorie ne correspondent plus à ceux de la base
+    (suppression ou modification), tout est rechargé. Le renommage seul
+    d'un produit n'est pas détecté."""
+
+    def __init__(self, db_conn):
+        self.db_conn = db_conn
+        self.version = None
+        self._clear()
+        self.refresh()
+
+    def _clear(self):
+        self.ids = array("q")
+        self.names = []
+        self.quantities = array("q")
+        self.prices = array("d")
+        self.codes = array("I")
+        self.categories = []
+        self._category_codes = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _append(self, rows):
+        codes = self._category_codes
+        for item_id, name, quantity, price, category in rows:
+            if category is None:
+                # Comptée avec la catégorie vide, comme dans le rapport
+                category = ""
+            code = codes.get(category)
+            if code is None:
+                code = codes[category] = len(self.categories)
+                self.categories.append(category)
+            self.ids.append(item_id)
+            self.names.append(name)
+            self.quantities.append(quantity)
+            self.prices.append(price)
+            self.codes.append(code)
+
+    def _load_after(self, last_id):
+        cursor = self.db_conn.execute(
+            "SELECT id, name, quantity, price, category FROM inventory"
+            " WHERE id > ? ORDER BY id", (last_id,)
+            )
+        count = 0
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return count
+            self._append(rows)
+            count += len(rows)
+
+    def _matches_database(self):
+        """Compare les totaux par catégorie à ceux de la base (table
+        matérialisée si elle existe)"""
+        query, values = REPORTS["summary"][1](self.db_conn, {})
+        expected = {
+            row[0]: row[1:] for row in self.db_conn.execute(query, values)
+        }
+        actual = {row[0]: row[1:] for row in self.category_totals()}
+        if expected.keys() != actual.keys():
+            return False
+        for category, (count, quantity, value) in expected.items():
+            if actual[category][:2] != (count, quantity):
+                return False
+            if not math.isclose(actual[category][2], value or 0.0,
+                                rel_tol=TOLERANCE, abs_tol=TOLERANCE):
+                return False
+        return True
+
+    @instrumented
+    def refresh(self):
+        """Met les colonnes à jour ; retourne le nombre de produits lus"""
+        version = data_version(self.db_conn)
+        if version == self.version:
+            return 0
+        last_id = self.ids[-1] if self.ids else 0
+        count = self._load_after(last_id)
+        if self.version is not None and not self._matches_database():
+            self._clear()
+            count = self._load_after(0)
+        self.version = version
+        record_rows(count)
+        return count
+
+    def category_totals(self):
+        """[(catégorie, nombre de produits, quantité totale, valeur
+        totale)], triés par catégorie comme le rapport récapitulatif"""
+        size = len(self.categories)
+        if numpy is not None:
+            codes = _view(self.codes)
+            quantities = _view(self.quantities)
+            counts = numpy.bincount(codes, minlength=size)
+            totals = numpy.bincount(codes, weights=quantities,
+                                    minlength=size)
+            values = numpy.bincount(
+                codes, weights=_view(self.prices) * quantities,
+                minlength=size
+                )
+            del codes, quantities
+            counts = counts.tolist()
+            totals = [int(total) for total in totals.tolist()]
+            values = values.tolist()
+        else:
+            counts = [0] * size
+            totals = [0] * size
+            values = [0.0] * size
+            for code, quantity, price in zip(self.codes, self.quantities,
+                                             self.prices):
+                counts[code] += 1
+                totals[code] += quantity
+                values[code] += price * quantity
+        return sorted(
+            (category, counts[code], totals[code], values[code])
+            for code, category in enumerate(self.categories)
+            if counts[code]
+        )
+
+    def _column(self, column):
+        if column not in ("quantity", "price", "value"):
+            raise ValueError(f"Colonne non numérique : {column}")
+        if column == "value":
+            if numpy is not None:
+                return _view(self.prices) * _view(self.quantities)
+            return array("d", (price * quantity for price, quantity
+                               in zip(self.prices, self.quantities)))
+        values = self.quantities if column == "quantity" else self.prices
+        return _view(values) if numpy is not None else values
+
+    def percentiles(self, column, fractions=(0.5, 0.9, 0.99)):
+        """{fraction: valeur} des percentiles d'une colonne (quantity,
+        price ou value = prix x quantité)"""
+        if not self.ids:
+            return {}
+        values = self._column(column)
+        if numpy is not None:
+            results = numpy.percentile(
+                values, [fraction * 100 for fraction in fractions]
+                ).tolist()
+            return dict(zip(fractions, results))
+        ordered = sorted(values)
+        return {fraction: _percentile(ordered, fraction)
+                for fraction in fractions}
+
+    def top_by_value(self, limit=10):
+        """Les limit produits de plus grande valeur (prix x quantité) :
+        [(id, name, quantity, price, category, value)]"""
+        values = self._column("value")
+        limit = min(limit, len(values))
+        if limit <= 0:
+            return []
+        if numpy is not None:
+            positions = numpy.argpartition(-values, limit - 1)[:limit]
+            positions = positions.tolist()
+        else:
+            positions = heapq.nlargest(limit, range(len(values)),
+                                       key=values.__getitem__)
+        values = [float(values[position]) for position in positions]
+        rows = [
+            (self.ids[position], self.names[position],
+             self.quantities[position], self.prices[position],
+             self.categories[self.codes[position]], value)
+            for position, value in zip(positions, values)
+        ]
+        return sorted(rows, key=lambda row: (-row[5], row[0]))
+
+    def price_histogram(self, bins=10):
+        """Histogramme des prix en intervalles de même largeur (comme
+        numpy.histogram) : (bornes, effectifs)"""
+        if not self.ids:
+            return [], []
+        if numpy is not None:
+            counts, edges = numpy.histogram(_view(self.prices), bins=bins)
+            return edges.tolist(), counts.tolist()
+        low, high = min(self.prices), max(self.prices)
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        width = (high - low) / bins
+        edges = [low + width * i for i in range(bins)] + [high]
+        counts = [0] * bins
+        for price in self.prices:
+            # Le dernier intervalle inclut sa borne supérieure
+            counts[min(bisect.bisect_right(edges, price) - 1, bins - 1)] += 1
+        return edges, counts
+
+    @instrumented
+    def write_summary_report(self, output_file):
+        """Rapport récapitulatif au format de report.generate_summary_report"""
+        rows = self.category_totals()
+        with open(output_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORTS["summary"][0])
+            writer.writerows(rows)
+        record_rows(len(rows))
+        return len(rows)
@@ -1,8 +1,113 @@
+import json
+import re
 import sqlite3
 
+from app.instrumentation import instrumented, record_rows
 
-def initialize_database(db_path="inventory.db"):
-    conn = sqlite3.connect(db_path)
+# Nombre de lignes lues à chaque appel à fetchmany
+FETCH_SIZE = 500
+# Nombre de lignes par page pour la pagination
+PAGE_SIZE = 20
+# Nombre de lignes d'index examinées par ANALYZE
+ANALYSIS_LIMIT = 1000
+# Part des lignes analysées qu'une importation doit écrire pour relancer
+# ANALYZE (analyze_if_stale)
+REANALYZE_FRACTION = 0.1
+# Nombre maximal de paramètres liés par requête des opérations en masse
+BULK_CHUNK_SIZE = 500
+
+# PRAGMA réglables, dans l'ordre où ils doivent être appliqués :
+# page_size doit précéder journal_mode, qui fige la taille des pages en WAL
+TUNABLE_PRAGMAS = (
+    "page_size", "journal_mode", "synchronous",
+    "cache_size", "mmap_size", "temp_store"
+)
+
+# Profils de réglage de la connexion
+PROFILES = {
+    # Réglages par défaut de SQLite
+    "default": {},
+    # Imports massifs et lecteurs concurrents
+    "performance": {
+        "page_size": 8192,
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "cache_size": -65536,  # en Kio, soit 64 Mio
+        "mmap_size": 268435456,  # 256 Mio
+        "temp_store": "memory"
+    },
+    # WAL sans sacrifier la durabilité de chaque transaction
+    "safe": {
+        "journal_mode": "wal",
+        "synchronous": "full"
+    }
+}
+
+
+def load_profile(profile="default", config_file=None):
+    """Retourne les PRAGMA à appliquer pour un profil nommé, éventuellement
+    complété par un fichier JSON de la forme
+    {"profile": "performance", "pragmas": {"cache_size": -131072}}"""
+    if config_file:
+        with open(config_file, "r") as f:
+            config = json.load(f)
+        profile = config.get("profile", profile)
+    else:
+        config = {}
+    if profile not in PROFILES:
+        raise ValueError(f"Profil inconnu : {profile}")
+    pragmas = dict(PROFILES[profile])
+    pragmas.update(config.get("pragmas", {}))
+    for name, value in pragmas.items():
+        if name not in TUNABLE_PRAGMAS:
+            raise ValueError(f"PRAGMA non pris en charge : {name}")
+        if not re.fullmatch(r"-?\w+", str(value)):
+            raise ValueError(f"Valeur invalide pour {name} : {value}")
+    return pragmas
+
+
+def apply_pragmas(conn, pragmas):
+    """Applique les PRAGMA à la connexion et retourne les valeurs actives"""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA page_count")
+    is_new_database = cursor.fetchone()[0] == 0
+    for name in TUNABLE_PRAGMAS:
+        if name not in pragmas:
+            continue
+        if name == "page_size" and not is_new_database:
+            # Sans effet sur une base existante (il faudrait un VACUUM)
+            continue
+        cursor.execute(f"PRAGMA {name} = {pragmas[name]}")
+    return active_pragmas(conn)
+
+
+def active_pragmas(conn):
+    """Lit les valeurs effectivement actives des PRAGMA réglables"""
+    cursor = conn.cursor()
+    values = {}
+    for name in TUNABLE_PRAGMAS:
+        cursor.execute(f"PRAGMA {name}")
+        row = cursor.fetchone()
+        # Certains PRAGMA (mmap_size en mémoire) ne retournent rien
+        values[name] = row[0] if row else None
+    return values
+
+
+class InventoryConnection(sqlite3.Connection):
+    """Connexion ouverte par initialize_database. Contrairement à
+    sqlite3.Connection, elle accepte les références faibles : les caches
+    par connexion (search) ne la gardent pas en vie. L'attribut pragmas
+    retient les valeurs actives après application du profil."""
+
+    pragmas = {}
+
+
+@instrumented
+def initialize_database(db_path="inventory.db", profile="default",
+                        config_file=None, check_same_thread=True):
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread,
+                           factory=InventoryConnection)
+    conn.pragmas = apply_pragmas(conn, load_profile(profile, config_file))
     cursor = conn.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS inventory (
@@ -13,25 +118,520 @@ def initialize_database(db_path="inventory.db"):
             category TEXT
         )
     """)
+    create_search_indexes(cursor)
+    create_category_summary(cursor)
     conn.commit()
     return conn
 
 
-def display_all_data(db_conn):
+# Seules les colonnes indexées (et l'id) concernent l'index plein texte
+FTS_UPDATE_TRIGGER = """CREATE TRIGGER inventory_fts_update
+        AFTER UPDATE OF id, name, category ON inventory BEGIN
+            INSERT INTO inventory_fts (inventory_fts, rowid, name, category)
+            VALUES ('delete', old.id, old.name, old.category);
+            INSERT INTO inventory_fts (rowid, name, category)
+            VALUES (new.id, new.name, new.category);
+        END"""
+
+
+def create_search_indexes(cursor):
+    """Crée les index B-tree (égalité, préfixe, comparaisons) et, si SQLite
+    dispose de FTS5, l'index plein texte trigramme tenu à jour par des
+    triggers. L'index trigramme occupe environ 85 octets par produit (un
+    trigramme par position du nom et de la catégorie) : il double à peu
+    près la taille de la base et, alimenté ligne par ligne, le temps
+    d'insertion ; les importations le suspendent (suspend_triggers)."""
+    for column in ("name", "category", "quantity", "price"):
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_inventory_{column}"
+            f" ON inventory ({column})"
+            )
+    cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'inventory_fts_update'"
+        )
+    trigger = cursor.fetchone()
+    if trigger:
+        if trigger[0] != FTS_UPDATE_TRIGGER:
+            # Ancienne version, déclenchée aussi par les changements de
+            # quantité ou de prix
+            cursor.execute("DROP TRIGGER inventory_fts_update")
+            cursor.execute(FTS_UPDATE_TRIGGER)
+        return
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE inventory_fts USING fts5(
+                name, category,
+                content='inventory', content_rowid='id',
+                tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        # SQLite compilé sans FTS5 : la recherche se fera par LIKE
+        return
+    cursor.executescript("""
+        CREATE TRIGGER inventory_fts_insert AFTER INSERT ON inventory BEGIN
+            INSERT INTO inventory_fts (rowid, name, category)
+            VALUES (new.id, new.name, new.category);
+        END;
+        CREATE TRIGGER inventory_fts_delete AFTER DELETE ON inventory BEGIN
+            INSERT INTO inventory_fts (inventory_fts, rowid, name, category)
+            VALUES ('delete', old.id, old.name, old.category);
+        END;
+    """)
+    cursor.execute(FTS_UPDATE_TRIGGER)
+    # Indexe les lignes déjà présentes dans une base existante
+    cursor.execute(
+        "INSERT INTO inventory_fts (inventory_fts) VALUES ('rebuild')"
+        )
+
+
+# Nombre d'analyses faites par analyze_inventory dans ce processus : un
+# ANALYZE ne change pas data_version pour la connexion qui le fait
+_analyses = 0
+
+
+def analyze_inventory(db_conn):
+    """Met à jour les statistiques des index de inventory (sqlite_stat1),
+    utilisées par SQLite et par l'ordre des critères de recherche.
+    analysis_limit borne le coût à un échantillon de chaque index."""
+    global _analyses
+    db_conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    db_conn.execute("ANALYZE inventory")
+    db_conn.commit()
+    _analyses += 1
+
+
+def analysis_generation():
+    """Change à chaque analyze_inventory : avec data_version, indique si
+    les statistiques d'ANALYZE ont pu changer"""
+    return _analyses
+
+
+def analyze_if_stale(db_conn, changed_rows):
+    """Relance analyze_inventory si changed_rows lignes écrites depuis la
+    dernière analyse représentent au moins REANALYZE_FRACTION des lignes
+    qu'elle avait comptées (ou s'il n'y en a jamais eu) ; retourne True si
+    l'analyse a été faite"""
+    if not changed_rows:
+        return False
+    try:
+        row = db_conn.execute(
+            "SELECT stat FROM sqlite_stat1"
+            " WHERE tbl = 'inventory' AND stat IS NOT NULL LIMIT 1"
+            ).fetchone()
+    except sqlite3.OperationalError:
+        # sqlite_stat1 n'existe qu'après le premier ANALYZE
+        row = None
+    analyzed_rows = int(row[0].split()[0]) if row else 0
+    if changed_rows < REANALYZE_FRACTION * analyzed_rows:
+        return False
+    analyze_inventory(db_conn)
+    return True
+
+
+# Clé et valeurs d'un produit dans category_summary : une catégorie NULL
+# est comptée avec la catégorie vide (une clé primaire NULL ne déclenche
+# jamais ON CONFLICT), une quantité ou un prix NULL pour 0
+SUMMARY_CATEGORY_SQL = "COALESCE({row}.category, '')"
+SUMMARY_QUANTITY_SQL = "COALESCE({row}.quantity, 0)"
+SUMMARY_VALUE_SQL = "COALESCE({row}.price * {row}.quantity, 0)"
+
+
+def _summary_terms(row):
+    """Catégorie, quantité et valeur d'un produit en SQL"""
+    return (SUMMARY_CATEGORY_SQL.format(row=row),
+            SUMMARY_QUANTITY_SQL.format(row=row),
+            SUMMARY_VALUE_SQL.format(row=row))
+
+
+def create_category_summary(cursor):
+    """Crée la table category_summary, tenue à jour par des triggers à
+    chaque écriture dans inventory, et la remplit pour une base existante.
+    Les additions et soustractions successives de total_value accumulent
+    des arrondis : check_category_summary la compare à l'agrégat avec une
+    tolérance et rebuild_category_summary la recalcule."""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'category_summary'"
+        )
+    if cursor.fetchone():
+        return
+    new_category, new_quantity, new_value = _summary_terms("new")
+    old_category, old_quantity, old_value = _summary_terms("old")
+    add_new = f"""
+        INSERT INTO category_summary
+        VALUES ({new_category}, 1, {new_quantity}, {new_value})
+        ON CONFLICT (category) DO UPDATE SET
+            product_count = product_count + 1,
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_value = total_value + excluded.total_value;
+    """
+    remove_old = f"""
+        UPDATE category_summary SET
+            product_count = product_count - 1,
+            total_quantity = total_quantity - {old_quantity},
+            total_value = total_value - {old_value}
+        WHERE category = {old_category};
+        DELETE FROM category_summary
+        WHERE category = {old_category} AND product_count <= 0;
+    """
+    cursor.executescript(f"""
+        CREATE TABLE category_summary (
+            category TEXT NOT NULL PRIMARY KEY,
+            product_count INTEGER NOT NULL,
+            total_quantity INTEGER NOT NULL,
+            total_value REAL NOT NULL
+        );
+        CREATE TRIGGER category_summary_insert
+        AFTER INSERT ON inventory BEGIN
+            {add_new}
+        END;
+        CREATE TRIGGER category_summary_delete
+        AFTER DELETE ON inventory BEGIN
+            {remove_old}
+        END;
+        CREATE TRIGGER category_summary_update
+        AFTER UPDATE OF quantity, price, category ON inventory BEGIN
+            {remove_old}
+            {add_new}
+        END;
+    """)
+    rebuild_category_summary(cursor)
+
+
+def _bulk_summary_insert():
+    """Équivalent en une passe de category_summary_insert"""
+    category, quantity, value = _summary_terms("inventory")
+    return f"""
+        INSERT INTO category_summary
+        SELECT {category}, COUNT(*), SUM({quantity}), SUM({value})
+        FROM inventory
+        WHERE id > ?
+        GROUP BY 1
+        ON CONFLICT (category) DO UPDATE SET
+            product_count = product_count + excluded.product_count,
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_value = total_value + excluded.total_value
+    """
+
+
+# Travail de chaque trigger d'insertion suspendu par les importations,
+# fait en une passe pour les lignes d'id supérieur au paramètre (les
+# lignes insérées depuis la suspension)
+BULK_INSERT_SQL = {
+    "inventory_fts_insert": """
+        INSERT INTO inventory_fts (rowid, name, category)
+        SELECT id, name, category FROM inventory WHERE id > ?
+    """,
+    "category_summary_insert": _bulk_summary_insert(),
+    "change_log_insert": """
+        INSERT INTO change_log (op, item_id, name, quantity, price, category)
+        SELECT 'I', id, name, quantity, price, category
+        FROM inventory
+        WHERE id > ?
+        ORDER BY id
+    """
+}
+
+
+def suspend_triggers(cursor, names):
+    """Supprime ceux des triggers d'insertion nommés (voir BULK_INSERT_SQL)
+    qui existent, dans la transaction en cours ; retourne leurs (nom, sql)
+    pour resume_triggers"""
+    placeholders = ", ".join("?" * len(names))
+    cursor.execute(
+        "SELECT name, sql FROM sqlite_master"
+        f" WHERE type = 'trigger' AND name IN ({placeholders})", names
+        )
+    triggers = cursor.fetchall()
+    for name, _ in triggers:
+        cursor.execute(f'DROP TRIGGER "{name}"')
+    return triggers
+
+
+def resume_triggers(cursor, triggers, after_id):
+    """Fait en une passe le travail des triggers suspendus pour les lignes
+    insérées depuis (id > after_id), puis les recrée. Ces lignes ne
+    doivent pas avoir été supprimées, ni modifiées dans une colonne
+    suivie par les triggers concernés."""
+    for name, sql in triggers:
+        cursor.execute(BULK_INSERT_SQL[name], (after_id,))
+        cursor.execute(sql)
+
+
+def rebuild_category_summary(cursor):
+    """Recalcule entièrement category_summary à partir de inventory"""
+    category, quantity, value = _summary_terms("inventory")
+    cursor.execute("DELETE FROM category_summary")
+    cursor.execute(f"""
+        INSERT INTO category_summary
+        SELECT {category}, COUNT(*), SUM({quantity}), SUM({value})
+        FROM inventory
+        GROUP BY 1
+    """)
+
+
+def create_change_log(cursor):
+    """Crée le journal des modifications de inventory (change_log), tenu
+    par des triggers : chaque insertion, modification ou suppression,
+    quel que soit le chemin d'écriture, y ajoute une entrée numérotée
+    (seq strictement croissant). Le journal n'est créé qu'à la demande
+    (replication.enable_change_log) : il coûte une écriture de plus par
+    modification. Si l'inventaire n'est pas vide, le journal commence par
+    une copie complète."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'change_log'")
+    if cursor.fetchone():
+        return
+    cursor.executescript("""
+        CREATE TABLE change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            item_id INTEGER,
+            name TEXT,
+            quantity INTEGER,
+            price REAL,
+            category TEXT,
+            logged_at REAL NOT NULL DEFAULT (julianday('now'))
+        );
+        CREATE TRIGGER change_log_insert AFTER INSERT ON inventory BEGIN
+            INSERT INTO change_log (op, item_id, name, quantity, price,
+                                    category)
+            VALUES ('I', new.id, new.name, new.quantity, new.price,
+                    new.category);
+        END;
+        CREATE TRIGGER change_log_update AFTER UPDATE ON inventory BEGIN
+            INSERT INTO change_log (op, item_id) SELECT 'D', old.id
+            WHERE old.id <> new.id;
+            INSERT INTO change_log (op, item_id, name, quantity, price,
+                                    category)
+            VALUES ('U', new.id, new.name, new.quantity, new.price,
+                    new.category);
+        END;
+        CREATE TRIGGER change_log_delete AFTER DELETE ON inventory BEGIN
+            INSERT INTO change_log (op, item_id) VALUES ('D', old.id);
+        END;
+    """)
+    cursor.execute("SELECT 1 FROM inventory LIMIT 1")
+    if cursor.fetchone():
+        log_full_copy(cursor)
+
+
+def log_full_copy(cursor):
+    """Ajoute au journal une remise à zéro ('R') suivie d'une insertion
+    par produit : à utiliser après une écriture faite sans les triggers
+    (chargement d'un instantané)"""
+    cursor.execute("INSERT INTO change_log (op) VALUES ('R')")
+    cursor.execute("""
+        INSERT INTO change_log (op, item_id, name, quantity, price, category)
+        SELECT 'I', id, name, quantity, price, category
+        FROM inventory
+        ORDER BY id
+    """)
+
+
+def create_import_manifest(cursor):
+    """Crée les tables de suivi des fichiers importés : le manifeste
+    (taille, date, empreinte du contenu) et les empreintes de lignes"""
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime INTEGER NOT NULL,
+            sha256 TEXT,
+            rows INTEGER NOT NULL,
+            imported_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS import_fingerprints (
+            path TEXT NOT NULL,
+            fingerprint INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (path, fingerprint)
+        ) WITHOUT ROWID;
+    """)
+
+
+@instrumented
+def deduplicate_inventory(db_conn):
+    """Supprime les doublons (nom, catégorie) en gardant la ligne la plus
+    récente ; retourne le nombre de lignes supprimées"""
     cursor = db_conn.cursor()
-    cursor.execute("SELECT * FROM inventory")
+    cursor.execute("""
+        DELETE FROM inventory
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM inventory GROUP BY name, category
+        )
+    """)
+    db_conn.commit()
+    record_rows(cursor.rowcount)
+    return cursor.rowcount
+
+
+def data_version(db_conn):
+    """Version des données vue par la connexion : change à chaque écriture
+    faite par elle (total_changes, qui compte aussi les lignes modifiées
+    par add_product, delete_item_by_id, les imports et leurs triggers)
+    ou validée par une autre connexion (PRAGMA data_version)"""
+    cursor = db_conn.execute("PRAGMA data_version")
+    return db_conn.total_changes, cursor.fetchone()[0]
+
+
+def iter_rows(cursor, fetch_size=FETCH_SIZE):
+    """Parcourt les résultats d'un curseur par lots, sans tout charger"""
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def iter_inventory(db_conn, where="", values=(), fetch_size=FETCH_SIZE):
+    """Générateur sur les lignes de l'inventaire (filtrées par where),
+    dans l'ordre des id"""
+    query = "SELECT * FROM inventory"
+    if where:
+        query += f" WHERE {where}"
+    query += " ORDER BY id"
+    cursor = db_conn.cursor()
+    cursor.execute(query, list(values))
+    return iter_rows(cursor, fetch_size)
+
+
+@instrumented
+def fetch_page(db_conn, where="", values=(), page_size=PAGE_SIZE,
+               after_id=None):
+    """Lit une page par pagination sur l'id (keyset).
+    Retourne (lignes, jeton) où le jeton est l'id à passer en after_id
+    pour obtenir la page suivante, ou None s'il n'y en a plus."""
+    conditions = [f"({where})"] if where else []
+    params = list(values)
+    if after_id is not None:
+        conditions.append("id > ?")
+        params.append(after_id)
+    query = "SELECT * FROM inventory"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id LIMIT ?"
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    params.append(page_size + 1)
+    cursor = db_conn.cursor()
+    cursor.execute(query, params)
     rows = cursor.fetchall()
-    for row in rows:
-        print(row)
+    record_rows(len(rows))
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, rows[-1][0]
+    return rows, None
+
 
+@instrumented
+def display_all_data(db_conn, emit=print):
+    """Affiche (ou passe à emit) chaque ligne de l'inventaire ;
+    retourne le nombre de lignes"""
+    count = 0
+    for row in iter_inventory(db_conn):
+        emit(row)
+        count += 1
+    record_rows(count)
+    return count
 
+
+@instrumented
 def delete_item_by_id(db_conn, item_id):
     cursor = db_conn.cursor()
     cursor.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
     db_conn.commit()
+    record_rows(cursor.rowcount)
     return cursor.rowcount  # Retourne le nombre de lignes affectées
 
 
+def _bulk_filters(where, values, item_ids, id_range, reserved,
+                  chunk_size):
+    """Découpe le filtre des opérations en masse en clauses WHERE liant au
+    plus chunk_size paramètres (reserved sont pris par la clause SET)"""
+    conditions = []
+    base = list(values)
+    if where:
+        conditions.append(f"({where})")
+    if id_range is not None:
+        conditions.append("id BETWEEN ? AND ?")
+        base.extend(id_range)
+    if item_ids is None:
+        if not conditions:
+            raise ValueError(
+                "Aucun filtre : indiquer des ID, un intervalle"
+                " ou des critères."
+                )
+        yield " AND ".join(conditions), base
+        return
+    ids = list(dict.fromkeys(int(item_id) for item_id in item_ids))
+    room = max(1, chunk_size - reserved - len(base))
+    for start in range(0, len(ids), room):
+        chunk = ids[start:start + room]
+        placeholders = ", ".join("?" * len(chunk))
+        yield (" AND ".join(conditions + [f"id IN ({placeholders})"]),
+               base + chunk)
+
+
+def _execute_bulk(db_conn, statement, set_values, filters):
+    """Exécute l'instruction pour chaque clause, dans une seule
+    transaction ; retourne le nombre de lignes affectées"""
+    cursor = db_conn.cursor()
+    count = 0
+    try:
+        for where, values in filters:
+            cursor.execute(f"{statement} WHERE {where}", set_values + values)
+            count += cursor.rowcount
+        db_conn.commit()
+    except Exception:
+        db_conn.rollback()
+        raise
+    record_rows(count)
+    return count
+
+
+@instrumented
+def delete_items(db_conn, item_ids=None, id_range=None, where="", values=(),
+                 chunk_size=BULK_CHUNK_SIZE):
+    """Supprime en une transaction les articles dont l'id est dans
+    item_ids, dans l'intervalle id_range (bornes incluses) et/ou
+    vérifiant la clause where ; les filtres donnés se cumulent.
+    Retourne le nombre d'articles supprimés."""
+    filters = _bulk_filters(where, values, item_ids, id_range, 0,
+                            chunk_size)
+    return _execute_bulk(db_conn, "DELETE FROM inventory", [], filters)
+
+
+@instrumented
+def update_items(db_conn, item_ids=None, id_range=None, where="", values=(),
+                 quantity=None, quantity_delta=None, price=None,
+                 price_factor=None, chunk_size=BULK_CHUNK_SIZE):
+    """Modifie en une transaction la quantité (valeur fixe ou écart) et/ou
+    le prix (valeur fixe ou coefficient) des articles filtrés comme pour
+    delete_items. Retourne le nombre d'articles modifiés."""
+    assignments = []
+    set_values = []
+    if quantity is not None:
+        assignments.append("quantity = ?")
+        set_values.append(quantity)
+    elif quantity_delta is not None:
+        assignments.append("quantity = quantity + ?")
+        set_values.append(quantity_delta)
+    if price is not None:
+        assignments.append("price = ?")
+        set_values.append(price)
+    elif price_factor is not None:
+        assignments.append("price = price * ?")
+        set_values.append(price_factor)
+    if not assignments:
+        raise ValueError("Aucune modification demandée.")
+    filters = _bulk_filters(where, values, item_ids, id_range,
+                            len(set_values), chunk_size)
+    return _execute_bulk(
+        db_conn, f"UPDATE inventory SET {', '.join(assignments)}",
+        set_values, filters
+        )
+
+
+@instrumented
 def add_product(db_conn, name, quantity, price, category):
     """Ajoute un produit dans la table inventory"""
     cursor = db_conn.cursor()
@@ -40,3 +640,5 @@ def add_product(db_conn, name, quantity, price, category):
         VALUES (?, ?, ?, ?)
     ''', (name, quantity, price, category))
     db_conn.commit()
+    record_rows(1)
+    return cursor.lastrowid  # Id du produit ajouté
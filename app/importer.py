@@ -1,20 +1,862 @@
 import csv
+import functools
+import hashlib
+import io
+import locale
+import math
+import mmap
+import os
+import sys
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
 
+from app.database import (
+    analyze_if_stale, create_import_manifest, resume_triggers,
+    suspend_triggers
+)
+from app.instrumentation import instrumented, record_rows
 
-def import_csv_files(file_paths, db_conn):
-    cursor = db_conn.cursor()
-    for file_path in file_paths:
-        with open(file_path, "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                cursor.execute("""
-                    INSERT INTO inventory (name, quantity, price, category)
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    row["name"],
-                    int(row["quantity"]),
-                    float(row["price"]),
-                    row["category"])
+INSERT_SQL = """
+    INSERT INTO inventory (name, quantity, price, category)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Modes d'importation :
+# - "insert"  : ajoute toutes les lignes (comportement historique)
+# - "replace" : un produit existant (même nom et catégorie ; le plus récent
+#               s'il y a des doublons) prend la quantité et le prix du
+#               fichier
+# - "add"     : la quantité du fichier s'ajoute à celle du produit existant
+# La clé (nom, catégorie) n'est pas imposée par un index unique : les
+# ajouts simples (mode insert, add_product) restent possibles.
+IMPORT_MODES = ("insert", "replace", "add")
+
+UPDATE_SQL = "UPDATE inventory SET quantity = ?, price = ? WHERE id = ?"
+
+# Triggers d'insertion suspendus par ImportWriter pendant chaque
+# transaction (leur travail est fait en une passe avant le commit). En
+# mode replace ou add, une ligne insérée puis modifiée dans la même
+# transaction serait retirée du récapitulatif sans y avoir été ajoutée :
+# le récapitulatif garde alors son trigger. L'index plein texte n'est pas
+# touché par ces modifications et le journal reçoit, après leurs entrées
+# 'U', une entrée 'I' avec l'état final de chaque ligne insérée.
+SUSPENDED_TRIGGERS = {
+    "insert": ("inventory_fts_insert", "category_summary_insert",
+               "change_log_insert"),
+    "replace": ("inventory_fts_insert", "change_log_insert"),
+    "add": ("inventory_fts_insert", "change_log_insert")
+}
+
+# Nombre de noms de produits recherchés par requête
+KEY_LOOKUP_SIZE = 400
+
+# Nombre de lignes envoyées à executemany en une fois
+BATCH_SIZE = 1000
+# Nombre de lignes entre deux commits
+COMMIT_EVERY = 50000
+# Taille (en octets) des tranches de fichier confiées à chaque processus
+SHARD_SIZE = 4 * 1024 * 1024
+# Taille (en octets) des blocs lus par le lecteur projeté en mémoire
+MMAP_CHUNK_SIZE = 1024 * 1024
+
+# Lecteurs de fichiers :
+# - "csv"  : module csv, colonnes repérées par la ligne d'en-tête
+# - "mmap" : fichier projeté en mémoire, découpé en blocs alignés sur les
+#            fins de ligne et converti directement en tuples
+READERS = ("csv", "mmap")
+CSV_COLUMNS = ("name", "quantity", "price", "category")
+
+
+class ImportAborted(Exception):
+    """Importation interrompue : trop de lignes invalides (max_errors)"""
+
+
+class ImportCancelled(Exception):
+    """Importation interrompue à la demande (cancel_event) ; les lignes
+    non encore validées sont annulées"""
+
+
+def _check_cancelled(db_conn, cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        db_conn.rollback()
+        raise ImportCancelled("Importation annulée.")
+
+
+def _column_positions(header):
+    """Position de chaque colonne attendue, résolue une fois pour toutes
+    à partir de la ligne d'en-tête"""
+    try:
+        return tuple(header.index(column) for column in CSV_COLUMNS)
+    except ValueError:
+        raise ValueError(
+            f"En-tête invalide : {header} (colonnes attendues :"
+            f" {', '.join(CSV_COLUMNS)})"
+            ) from None
+
+
+def _header_positions(text):
+    """Positions des colonnes d'après le texte de la ligne d'en-tête"""
+    return _column_positions(next(csv.reader([text]), []))
+
+
+def _convert_fields(fields, positions):
+    """Convertit une ligne découpée en champs en tuple prêt à être inséré"""
+    name, quantity, price, category = positions
+    try:
+        return (fields[name], int(fields[quantity]), float(fields[price]),
+                fields[category])
+    except IndexError:
+        raise ValueError("ligne incomplète") from None
+
+
+def _check_row(row):
+    """Contrôles stricts d'une ligne convertie, en plus de ceux de la
+    conversion"""
+    name, quantity, price, category = row
+    if not name or not category:
+        raise ValueError("nom ou catégorie vide")
+    if not math.isfinite(price):
+        raise ValueError(f"prix invalide : {price}")
+    return row
+
+
+def _convert_checked(fields, positions):
+    return _check_row(_convert_fields(fields, positions))
+
+
+def _fail_on_error(file_path=None):
+    """Fonction on_error sans quarantaine : la première ligne invalide
+    lève ValueError avec son numéro (et le fichier)"""
+    where = f"{file_path}, ligne" if file_path else "Ligne"
+
+    def fail(number, line, error):
+        raise ValueError(f"{where} {number} : {error} ({line})")
+    return fail
+
+
+def _parse_lines(text, positions, on_error=None, first_line=1,
+                 strict=False):
+    """Convertit des lignes CSV sans guillemets, avec les contrôles de
+    _check_row si strict. Une ligne invalide est passée à on_error(numéro
+    de ligne, texte, erreur) et ignorée ; sans on_error, elle lève
+    ValueError."""
+    if on_error is None:
+        on_error = _fail_on_error()
+    convert = _convert_checked if strict else _convert_fields
+    for number, line in enumerate(text.split("\n"), first_line):
+        if line.endswith("\r"):
+            line = line[:-1]
+        if not line:
+            continue
+        try:
+            row = convert(line.split(","), positions)
+        except ValueError as error:
+            on_error(number, line, error)
+            continue
+        yield row
+
+
+def _parse_records(records, positions, on_error=None, offset=0,
+                   strict=False):
+    """Comme _parse_lines pour les enregistrements d'un csv.reader ;
+    offset est le nombre de lignes du fichier précédant celles du lecteur"""
+    if on_error is None:
+        on_error = _fail_on_error()
+    convert = _convert_checked if strict else _convert_fields
+    previous = records.line_num
+    for fields in records:
+        number = offset + previous + 1
+        previous = records.line_num
+        if not fields:
+            continue
+        try:
+            row = convert(fields, positions)
+        except ValueError as error:
+            on_error(number, ",".join(fields), error)
+            continue
+        yield row
+
+
+def _iter_mmap_rows(file_path, chunk_size=MMAP_CHUNK_SIZE, on_error=None,
+                    strict=False):
+    """Lit un fichier projeté en mémoire par blocs alignés sur les fins de
+    ligne : la mémoire utilisée ne dépend que de chunk_size. Dès qu'un
+    bloc contient des guillemets (champ pouvant contenir une virgule ou
+    une fin de ligne), la suite du fichier est confiée au module csv."""
+    encoding = locale.getpreferredencoding(False)
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = mm.find(b"\n") + 1 or size
+            positions = _header_positions(mm[:start].decode(encoding))
+            line = 2
+            while start < size:
+                end = mm.find(b"\n", min(start + chunk_size, size))
+                end = size if end == -1 else end + 1
+                chunk = mm[start:end]
+                if b'"' in chunk:
+                    break
+                yield from _parse_lines(
+                    chunk.decode(encoding), positions, on_error, line, strict
                     )
-    db_conn.commit()
+                line += chunk.count(b"\n")
+                start = end
+            if start >= size:
+                return
+        f.seek(start)
+        text = io.TextIOWrapper(f, encoding=encoding, newline="")
+        yield from _parse_records(
+            csv.reader(text), positions, on_error, line - 1, strict
+            )
+
+
+def _iter_rows(f, file_path, reader, on_error=None, strict=False):
+    """Lignes converties d'un fichier avec le lecteur demandé ; l'entrée
+    standard ne peut pas être projetée en mémoire"""
+    if reader == "mmap" and file_path != "-":
+        return _iter_mmap_rows(file_path, on_error=on_error, strict=strict)
+    records = csv.reader(f)
+    header = next(records, None)
+    if header is None:
+        return iter(())
+    return _parse_records(
+        records, _column_positions(header), on_error, strict=strict
+        )
+
+
+def read_rows(file_path, reader="csv", on_error=None, strict=False):
+    """Générateur sur les lignes converties (nom, quantité, prix,
+    catégorie) d'un fichier CSV ("-" : entrée standard), contrôlées par
+    _check_row si strict. Une ligne invalide est passée à on_error comme
+    dans _parse_lines ; sans on_error, elle lève ValueError avec le
+    fichier et le numéro de ligne."""
+    if reader not in READERS:
+        raise ValueError(f"Lecteur inconnu : {reader}")
+    if on_error is None:
+        on_error = _fail_on_error(file_path)
+    with _open_source(file_path) as f:
+        yield from _iter_rows(f, file_path, reader, on_error, strict)
+
+
+class _Rejects:
+    """Mise en quarantaine des lignes invalides : chacune est écrite dans
+    le fichier de rejets (fichier, ligne, motif, contenu) ; au-delà de
+    max_errors lignes, l'importation est interrompue par ImportAborted"""
+
+    def __init__(self, reject_file=None, max_errors=None):
+        self.max_errors = max_errors
+        self.count = 0
+        self.file = None
+        self.writer = None
+        if reject_file is not None:
+            self.file = open(reject_file, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["file", "line", "reason", "data"])
+
+    def handler(self, file_stats):
+        """Fonction on_error des lignes d'un fichier"""
+        def reject(number, line, error):
+            self.add(file_stats, number, line, str(error))
+        return reject
+
+    def add(self, file_stats, number, line, reason):
+        self.count += 1
+        file_stats["rejected"] += 1
+        if self.writer is not None:
+            self.writer.writerow([file_stats["file"], number, reason, line])
+        if self.max_errors is not None and self.count > self.max_errors:
+            raise ImportAborted(
+                f"Importation interrompue : plus de {self.max_errors}"
+                " lignes invalides."
+                )
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def _open_rejects(reject_file, max_errors):
+    """Quarantaine demandée, ou None : une ligne invalide lève ValueError"""
+    if reject_file is None and max_errors is None:
+        return None
+    return _Rejects(reject_file, max_errors)
+
+
+def _open_source(file_path):
+    """Ouvre un fichier CSV ; "-" désigne l'entrée standard"""
+    if file_path == "-":
+        return nullcontext(sys.stdin)
+    return open(file_path, "r")
+
+
+def new_file_stats(file_path):
+    """Statistiques d'importation initiales d'un fichier"""
+    return {
+        "file": file_path,
+        "rows": 0,
+        "inserted": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "skipped": False,
+        "rows_skipped": 0,
+        "rejected": 0,
+        "seconds": 0.0
+    }
+
+
+def print_import_stats(stats):
+    """Affiche le récapitulatif de l'importation"""
+    for file_stats in stats:
+        if file_stats["skipped"]:
+            print(f"{file_stats['file']} : inchangé, ignoré")
+            continue
+        print(
+            f"{file_stats['file']} : {file_stats['rows']} lignes"
+            f" ({file_stats['inserted']} insérées,"
+            f" {file_stats['updated']} mises à jour,"
+            f" {file_stats['unchanged']} inchangées)"
+            f" en {file_stats['seconds']:.3f} s"
+            )
+    files_skipped = sum(file_stats["skipped"] for file_stats in stats)
+    rows_skipped = sum(file_stats["rows_skipped"] for file_stats in stats)
+    if files_skipped or rows_skipped:
+        print(
+            f"{files_skipped} fichiers et {rows_skipped} lignes ignorés"
+            " (déjà importés)."
+            )
+    rejected = sum(file_stats["rejected"] for file_stats in stats)
+    if rejected:
+        print(f"{rejected} lignes invalides rejetées.")
     print("Fichiers importés avec succès.")
+
+
+def _file_digest(file_path):
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _row_fingerprint(row):
+    """Empreinte 64 bits d'une ligne convertie"""
+    data = "\x1f".join(map(repr, row)).encode()
+    digest = hashlib.blake2b(data, digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class _ChangeTracker:
+    """Détection des changements d'un fichier déjà importé.
+    Le manifeste (taille, date, SHA-256) permet d'ignorer un fichier
+    inchangé ; les empreintes de lignes, comptées pour gérer les doublons,
+    permettent de n'appliquer que les lignes nouvelles d'un fichier modifié.
+    Les empreintes sont écrites dans la même transaction que les lignes :
+    une importation interrompue reprend là où elle s'était arrêtée.
+    Les lignes retirées du fichier ne sont pas supprimées de l'inventaire."""
+
+    def __init__(self, cursor, file_path):
+        self.cursor = cursor
+        self.file_path = file_path
+        self.path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime_ns
+        self.digest = None
+        self.rows = 0
+        self.previous = Counter()
+
+    def is_unchanged(self):
+        """Indique si le fichier est identique à la dernière importation"""
+        self.cursor.execute(
+            "SELECT size, mtime, sha256, rows FROM import_manifest"
+            " WHERE path = ?", (self.path,)
+            )
+        manifest = self.cursor.fetchone()
+        if manifest and manifest[:2] == (self.size, self.mtime):
+            self.rows = manifest[3]
+            return True
+        self.digest = _file_digest(self.file_path)
+        if manifest and manifest[2] == self.digest:
+            # Seule la date a changé (fichier recopié à l'identique)
+            self.rows = manifest[3]
+            self._save_manifest()
+            return True
+        self.cursor.execute(
+            "SELECT fingerprint, count FROM import_fingerprints"
+            " WHERE path = ?", (self.path,)
+            )
+        self.previous = Counter(dict(self.cursor.fetchall()))
+        return False
+
+    def filter(self, batch):
+        """Retire du lot les lignes déjà importées et enregistre les
+        empreintes des autres"""
+        kept = []
+        added = Counter()
+        for row in batch:
+            fingerprint = _row_fingerprint(row)
+            if self.previous[fingerprint] > 0:
+                self.previous[fingerprint] -= 1
+            else:
+                kept.append(row)
+                added[fingerprint] += 1
+        self.rows += len(batch)
+        self.cursor.executemany("""
+            INSERT INTO import_fingerprints (path, fingerprint, count)
+            VALUES (?, ?, ?)
+            ON CONFLICT (path, fingerprint) DO UPDATE SET
+                count = count + excluded.count
+        """, [(self.path, fp, count) for fp, count in added.items()])
+        return kept
+
+    def finish(self):
+        """Oublie les lignes disparues du fichier et met à jour le
+        manifeste"""
+        self.cursor.executemany("""
+            UPDATE import_fingerprints SET count = count - ?
+            WHERE path = ? AND fingerprint = ?
+        """, [
+            (count, self.path, fingerprint)
+            for fingerprint, count in self.previous.items() if count > 0
+        ])
+        self.cursor.execute(
+            "DELETE FROM import_fingerprints WHERE path = ? AND count <= 0",
+            (self.path,)
+            )
+        self._save_manifest()
+
+    def _save_manifest(self):
+        self.cursor.execute("""
+            INSERT OR REPLACE INTO import_manifest
+                (path, size, mtime, sha256, rows, imported_at)
+            VALUES (?, ?, ?, ?, ?, datetime('now'))
+        """, (self.path, self.size, self.mtime, self.digest, self.rows))
+
+
+def _begin_file(cursor, file_path, incremental, file_stats):
+    """Prépare le suivi des changements d'un fichier.
+    Retourne (tracker, ignoré) ; tracker vaut None hors mode incrémental."""
+    if not incremental or file_path == "-":
+        return None, False
+    tracker = _ChangeTracker(cursor, file_path)
+    if tracker.is_unchanged():
+        file_stats["skipped"] = True
+        file_stats["rows_skipped"] = tracker.rows
+        return None, True
+    return tracker, False
+
+
+def _apply_batch(cursor, batch, mode, file_stats, tracker):
+    """Écrit un lot, après avoir écarté les lignes déjà importées"""
+    if tracker is not None:
+        kept = tracker.filter(batch)
+        file_stats["rows_skipped"] += len(batch) - len(kept)
+        batch = kept
+    _write_batch(cursor, batch, mode, file_stats)
+
+
+def _fetch_existing(cursor, keys):
+    """Retourne {(nom, catégorie): (id, quantité, prix)} des produits
+    existants ; en cas de doublons, le plus récent (comme
+    deduplicate_inventory le garderait)"""
+    names = list({name for name, _ in keys})
+    existing = {}
+    for i in range(0, len(names), KEY_LOOKUP_SIZE):
+        chunk = names[i:i + KEY_LOOKUP_SIZE]
+        # IN sur name passe par son index, même sans statistiques
+        # d'ANALYZE ; la catégorie est vérifiée ensuite
+        cursor.execute(
+            "SELECT id, name, category, quantity, price FROM inventory"
+            f" WHERE name IN ({', '.join('?' * len(chunk))}) ORDER BY id",
+            chunk
+            )
+        for item_id, name, category, quantity, price in cursor.fetchall():
+            if (name, category) in keys:
+                existing[(name, category)] = (item_id, quantity, price)
+    return existing
+
+
+def _write_batch(cursor, batch, mode, file_stats):
+    """Écrit un lot de lignes converties et met à jour les compteurs"""
+    file_stats["rows"] += len(batch)
+    if mode == "insert":
+        cursor.executemany(INSERT_SQL, batch)
+        file_stats["inserted"] += len(batch)
+        return
+
+    # Le lot est rejoué dans l'ordre pour tenir compte des doublons à
+    # l'intérieur du lot ; chaque produit n'est ensuite écrit qu'une fois,
+    # dans son état final, et seulement s'il a changé
+    found = _fetch_existing(cursor, {(row[0], row[3]) for row in batch})
+    state = dict(found)
+    for name, quantity, price, category in batch:
+        current = state.get((name, category))
+        if current is None:
+            file_stats["inserted"] += 1
+            state[(name, category)] = (None, quantity, price)
+            continue
+        item_id, old_quantity, old_price = current
+        if mode == "add":
+            quantity += old_quantity
+        if (quantity, price) == (old_quantity, old_price):
+            file_stats["unchanged"] += 1
+        else:
+            file_stats["updated"] += 1
+        state[(name, category)] = (item_id, quantity, price)
+    # Les nouveaux produits sont insérés dans l'ordre du fichier
+    cursor.executemany(INSERT_SQL, [
+        (name, quantity, price, category)
+        for (name, category), (item_id, quantity, price) in state.items()
+        if item_id is None
+    ])
+    cursor.executemany(UPDATE_SQL, [
+        (quantity, price, item_id)
+        for key, (item_id, quantity, price) in state.items()
+        if item_id is not None and found[key][1:] != (quantity, price)
+    ])
+
+
+class ImportWriter:
+    """Destination des lignes converties d'une importation. Les lignes
+    passées à add() sont écrites par lots de batch_size (write() écrit un
+    lot déjà constitué) et la transaction est validée toutes les
+    commit_every lignes ; les compteurs de chaque fichier sont tenus dans
+    ses statistiques (new_file_stats). Si cancel_event est levé,
+    ImportCancelled interrompt l'écriture entre deux lots. Pendant chaque
+    transaction, les triggers de SUSPENDED_TRIGGERS sont suspendus et leur
+    travail est fait en une passe avant le commit : une transaction
+    validée laisse toujours les triggers en place.
+
+    Utilisé comme gestionnaire de contexte : en sortie normale, les
+    lignes restantes sont écrites et validées ; sur exception, les lignes
+    non encore validées sont annulées.
+
+        with ImportWriter(db_conn, mode="replace") as writer:
+            file_stats = new_file_stats(file_path)
+            for row in read_rows(file_path):
+                writer.add(row, file_stats)
+    """
+
+    def __init__(self, db_conn, mode="insert", batch_size=BATCH_SIZE,
+                 commit_every=COMMIT_EVERY, cancel_event=None):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Mode d'importation inconnu : {mode}")
+        self.db_conn = db_conn
+        self.cursor = db_conn.cursor()
+        self.mode = mode
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.cancel_event = cancel_event
+        # Lignes écrites depuis le dernier commit, et au total
+        self.pending = 0
+        self.rows = 0
+        # Triggers suspendus dans la transaction en cours et plus grand id
+        # au moment de la suspension (None : pas de suspension en cours)
+        self._triggers = []
+        self._mark = None
+        self._buffer = []
+        self._buffer_stats = None
+        self._buffer_tracker = None
+
+    def add(self, row, file_stats, tracker=None):
+        """Ajoute une ligne au lot en cours, écrit quand il est plein"""
+        if file_stats is not self._buffer_stats:
+            self.flush()
+            self._buffer_stats = file_stats
+            self._buffer_tracker = tracker
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Écrit le lot en cours"""
+        if self._buffer:
+            batch = self._buffer
+            self._buffer = []
+            self.write(batch, self._buffer_stats, self._buffer_tracker)
+
+    def write(self, batch, file_stats, tracker=None):
+        """Écrit un lot, après avoir écarté les lignes déjà importées
+        (tracker, en mode incrémental)"""
+        _check_cancelled(self.db_conn, self.cancel_event)
+        if self._mark is None:
+            self._suspend()
+        written = file_stats["rows"]
+        _apply_batch(self.cursor, batch, self.mode, file_stats, tracker)
+        self.rows += file_stats["rows"] - written
+        self.pending += len(batch)
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def _suspend(self):
+        """Suspend les triggers d'insertion dans la transaction en cours"""
+        if not self.db_conn.in_transaction:
+            # Sans transaction ouverte, DROP TRIGGER serait validé seul.
+            # IMMEDIATE : le verrou d'écriture est pris d'emblée, en
+            # attendant busy_timeout ; une transaction ouverte en lecture
+            # (sqlite_master, MAX(id)) échouerait aussitôt en SQLITE_BUSY
+            # au DROP TRIGGER si une autre connexion a écrit entre-temps.
+            self.cursor.execute("BEGIN IMMEDIATE")
+        self._triggers = suspend_triggers(
+            self.cursor, SUSPENDED_TRIGGERS[self.mode]
+            )
+        self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM inventory")
+        self._mark = self.cursor.fetchone()[0]
+
+    def commit(self):
+        if self._mark is not None:
+            resume_triggers(self.cursor, self._triggers, self._mark)
+            self._mark = None
+        self.db_conn.commit()
+        self.pending = 0
+
+    def rollback(self):
+        """Annule les lignes non validées (et la suspension des triggers)"""
+        self._buffer = []
+        self.db_conn.rollback()
+        self._mark = None
+        self.pending = 0
+
+    def close(self):
+        """Écrit les lignes restantes et valide la transaction"""
+        self.flush()
+        self.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.rollback()
+
+
+@instrumented
+def import_csv_files(file_paths, db_conn, batch_size=BATCH_SIZE,
+                     commit_every=COMMIT_EVERY, verbose=True,
+                     mode="insert", incremental=False, cancel_event=None,
+                     reader="csv", reject_file=None, max_errors=None,
+                     strict=None):
+    """Importe les fichiers CSV par lots et retourne les statistiques
+    (lignes appliquées, insérées, mises à jour, inchangées, ignorées et
+    durée) de chaque fichier. En mode incrémental, un fichier inchangé
+    depuis la dernière importation est ignoré et seules les lignes
+    nouvelles d'un fichier modifié sont appliquées. Si cancel_event
+    (threading.Event) est levé, ImportCancelled interrompt l'importation
+    entre deux lots. reader choisit le lecteur de fichiers (READERS).
+
+    Par défaut, une ligne invalide lève ValueError. Avec reject_file et/ou
+    max_errors, les lignes invalides sont écartées (et écrites dans
+    reject_file avec leur numéro et le motif) et les autres importées ;
+    au-delà de max_errors rejets, ImportAborted interrompt l'importation
+    et annule les lignes non encore validées.
+
+    Une ligne est invalide si sa quantité ou son prix ne se convertit pas
+    ou s'il lui manque des colonnes ; avec strict, aussi si son nom ou sa
+    catégorie est vide ou son prix infini (_check_row). Par défaut
+    (None), strict n'est actif qu'avec reject_file ou max_errors."""
+    if reader not in READERS:
+        raise ValueError(f"Lecteur inconnu : {reader}")
+    writer = ImportWriter(db_conn, mode, batch_size, commit_every,
+                          cancel_event)
+    if incremental:
+        create_import_manifest(writer.cursor)
+    stats = []
+    rejects = _open_rejects(reject_file, max_errors)
+    if strict is None:
+        strict = rejects is not None
+    try:
+        with writer:
+            for file_path in file_paths:
+                start = time.perf_counter()
+                file_stats = new_file_stats(file_path)
+                stats.append(file_stats)
+                tracker, skipped = _begin_file(
+                    writer.cursor, file_path, incremental, file_stats
+                    )
+                if skipped:
+                    continue
+                on_error = rejects and rejects.handler(file_stats)
+                for row in read_rows(file_path, reader, on_error, strict):
+                    writer.add(row, file_stats, tracker)
+                writer.flush()
+                if tracker is not None:
+                    tracker.finish()
+                file_stats["seconds"] = time.perf_counter() - start
+    finally:
+        if rejects is not None:
+            rejects.close()
+    analyze_if_stale(db_conn, writer.rows)
+    record_rows(sum(file_stats["rows"] for file_stats in stats))
+    if verbose:
+        print_import_stats(stats)
+    return stats
+
+
+def _plan_shards(file_path, shard_size):
+    """Découpe un fichier en plages d'octets alignées sur les fins
+    d'enregistrement. Une fin de ligne précédée, depuis le début de la
+    tranche, d'un nombre impair de guillemets est dans un champ entre
+    guillemets : la tranche se prolonge jusqu'à la suivante. Chaque
+    tranche emporte l'en-tête pour être lue indépendamment."""
+    shards = []
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        while start < size:
+            end = start + shard_size
+            if end < size:
+                quotes = f.read(shard_size).count(b'"')
+                line = f.readline()
+                quotes += line.count(b'"')
+                while quotes % 2 and line:
+                    line = f.readline()
+                    quotes += line.count(b'"')
+                end = f.tell()
+            else:
+                end = size
+            shards.append((file_path, header, start, end))
+            start = end
+    return shards
+
+
+def _read_shard(shard):
+    """Retourne les positions des colonnes, le contenu de la tranche et
+    son encodage"""
+    file_path, header, start, end = shard
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # Même décodage que open(file_path, "r") dans l'import séquentiel
+    encoding = locale.getpreferredencoding(False)
+    return _header_positions(header.decode(encoding)), data, encoding
+
+
+def _parse_data(positions, data, encoding, on_error=None, strict=False):
+    if b'"' not in data:
+        # Cas courant : découpage direct des lignes, sans module csv
+        return list(_parse_lines(
+            data.decode(encoding), positions, on_error, strict=strict
+            ))
+    text = io.TextIOWrapper(io.BytesIO(data), encoding=encoding, newline="")
+    return list(
+        _parse_records(csv.reader(text), positions, on_error, strict=strict)
+        )
+
+
+def _parse_shard(shard, strict=False):
+    """Lit et convertit une tranche de fichier (exécuté dans un processus)
+    en écartant les lignes invalides ; retourne les lignes, les rejets
+    (numéros de ligne relatifs à la tranche) et le nombre de lignes de la
+    tranche"""
+    positions, data, encoding = _read_shard(shard)
+    rejects = []
+
+    def reject(number, line, error):
+        rejects.append((number, line, str(error)))
+
+    rows = _parse_data(positions, data, encoding, reject, strict)
+    return rows, rejects, data.count(b"\n")
+
+
+def _map_bounded(executor, fn, items, max_pending):
+    """Comme executor.map, en gardant au plus max_pending tâches en vol
+    pour borner la mémoire, et en rendant les résultats dans l'ordre"""
+    pending = deque()
+    for item in items:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+@instrumented
+def import_csv_files_parallel(file_paths, db_conn, workers=None,
+                              shard_size=SHARD_SIZE,
+                              commit_every=COMMIT_EVERY, verbose=True,
+                              mode="insert", incremental=False,
+                              cancel_event=None, reader="csv",
+                              reject_file=None, max_errors=None,
+                              strict=None):
+    """Importe les fichiers CSV en parallèle : des processus lisent et
+    convertissent les tranches de fichiers, le thread appelant est le seul
+    à écrire dans la base via db_conn. Les lignes invalides sont traitées
+    comme dans import_csv_files."""
+    workers = workers or os.cpu_count() or 1
+    if "-" in file_paths:
+        # L'entrée standard ne peut pas être découpée en tranches
+        workers = 1
+    if workers == 1:
+        return import_csv_files(
+            file_paths, db_conn, commit_every=commit_every, verbose=verbose,
+            mode=mode, incremental=incremental, cancel_event=cancel_event,
+            reader=reader, reject_file=reject_file, max_errors=max_errors,
+            strict=strict
+            )
+
+    writer = ImportWriter(db_conn, mode, commit_every=commit_every,
+                          cancel_event=cancel_event)
+    cursor = writer.cursor
+    if incremental:
+        create_import_manifest(cursor)
+    stats = {file_path: new_file_stats(file_path) for file_path in file_paths}
+    trackers = {}
+    shards = []
+    for file_path in file_paths:
+        tracker, skipped = _begin_file(
+            cursor, file_path, incremental, stats[file_path]
+            )
+        if not skipped:
+            trackers[file_path] = tracker
+            shards.extend(_plan_shards(file_path, shard_size))
+
+    start = time.perf_counter()
+    executor = None
+    rejects = _open_rejects(reject_file, max_errors)
+    if strict is None:
+        strict = rejects is not None
+    parse = functools.partial(_parse_shard, strict=strict)
+    if len(shards) > 1:
+        # Chargé ici : inutile (et coûteux à importer) pour l'import
+        # séquentiel
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = _map_bounded(executor, parse, shards, workers * 2)
+    else:
+        # Une seule tranche : pas de processus à lancer
+        results = map(parse, shards)
+    # Numéro de la dernière ligne lue de chaque fichier (l'en-tête : 1)
+    lines_read = dict.fromkeys(file_paths, 1)
+    try:
+        with writer:
+            for shard, (rows, rejected, lines) in zip(shards, results):
+                file_stats = stats[shard[0]]
+                base = lines_read[shard[0]]
+                for number, line, reason in rejected:
+                    if rejects is None:
+                        _fail_on_error(shard[0])(base + number, line, reason)
+                    rejects.add(file_stats, base + number, line, reason)
+                lines_read[shard[0]] = base + lines
+                writer.write(rows, file_stats, trackers[shard[0]])
+                file_stats["seconds"] = time.perf_counter() - start
+            for tracker in trackers.values():
+                if tracker is not None:
+                    tracker.finish()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if rejects is not None:
+            rejects.close()
+    analyze_if_stale(db_conn, writer.rows)
+    stats = list(stats.values())
+    record_rows(sum(file_stats["rows"] for file_stats in stats))
+    if verbose:
+        print_import_stats(stats)
+    return stats
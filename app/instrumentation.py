@@ -0,0 +1,168 @@
+import csv
+import functools
+import json
+import sqlite3
+import threading
+import time
+
+# Nombre d'instructions de la machine virtuelle SQLite entre deux appels
+# du compteur de progression
+PROGRESS_STEP = 1000
+
+STAT_FIELDS = (
+    "calls", "total_seconds", "max_seconds", "rows",
+    "sql_statements", "sql_seconds", "vm_steps"
+)
+
+_enabled = False
+_stats = {}
+_lock = threading.Lock()
+# Pile des appels instrumentés en cours, propre à chaque thread
+_local = threading.local()
+
+
+def enable():
+    """Active la collecte des mesures"""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Désactive la collecte ; les fonctions ne paient plus qu'un test"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+
+
+def get_stats():
+    """Retourne une copie des mesures par fonction"""
+    with _lock:
+        return {name: dict(values) for name, values in _stats.items()}
+
+
+def record_rows(count):
+    """Ajoute des lignes traitées à l'appel instrumenté en cours"""
+    if not _enabled:
+        return
+    frames = getattr(_local, "frames", None)
+    if frames:
+        frames[-1]["rows"] += count
+
+
+def dump_stats(path):
+    """Écrit les mesures en JSON ou en CSV selon l'extension du fichier"""
+    stats = get_stats()
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("function",) + STAT_FIELDS)
+            for name, values in sorted(stats.items()):
+                writer.writerow(
+                    [name] + [values[field] for field in STAT_FIELDS]
+                    )
+    else:
+        with open(path, "w") as f:
+            json.dump(stats, f, indent=2)
+            f.write("\n")
+
+
+def _find_connection(args, kwargs):
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, sqlite3.Connection):
+            return value
+    return None
+
+
+class _SqlTracer:
+    """Chronomètre les requêtes d'une connexion et les attribue à l'appel
+    instrumenté le plus interne. SQLite ne signale que le début d'une
+    requête : sa durée est estimée jusqu'au début de la suivante, ou
+    jusqu'à la fin de l'appel pour la dernière."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.last_frame = None
+        self.last_start = None
+
+    def _close_statement(self, now):
+        if self.last_start is not None:
+            self.last_frame["sql_seconds"] += now - self.last_start
+
+    def on_statement(self, statement):
+        now = time.perf_counter()
+        self._close_statement(now)
+        self.last_frame = self.frames[-1]
+        self.last_start = now
+        self.last_frame["sql_statements"] += 1
+
+    def on_progress(self):
+        self.frames[-1]["vm_steps"] += PROGRESS_STEP
+        return 0  # ne pas interrompre la requête
+
+    def finish(self):
+        self._close_statement(time.perf_counter())
+        self.last_start = None
+
+
+def _run_instrumented(name, fn, args, kwargs):
+    frames = getattr(_local, "frames", None)
+    if frames is None:
+        frames = _local.frames = []
+        _local.tracer = None
+    frame = {field: 0 for field in STAT_FIELDS}
+    conn = None
+    # Le traceur est installé par l'appel le plus externe, les appels
+    # imbriqués sur la même connexion en profitent
+    if _local.tracer is None:
+        conn = _find_connection(args, kwargs)
+        if conn is not None:
+            _local.tracer = _SqlTracer(frames)
+            conn.set_trace_callback(_local.tracer.on_statement)
+            conn.set_progress_handler(
+                _local.tracer.on_progress, PROGRESS_STEP
+                )
+    frames.append(frame)
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        if _local.tracer is not None:
+            # La dernière requête de l'appel se termine au plus tard ici
+            _local.tracer.finish()
+        if conn is not None:
+            conn.set_trace_callback(None)
+            conn.set_progress_handler(None, 0)
+            _local.tracer = None
+        elapsed = time.perf_counter() - start
+        frames.pop()
+        with _lock:
+            values = _stats.setdefault(
+                name, {field: 0 for field in STAT_FIELDS}
+                )
+            values["calls"] += 1
+            values["total_seconds"] += elapsed
+            values["max_seconds"] = max(values["max_seconds"], elapsed)
+            for field in ("rows", "sql_statements", "sql_seconds",
+                          "vm_steps"):
+                values[field] += frame[field]
+
+
+def instrumented(fn):
+    """Décorateur : mesure durée, lignes traitées et requêtes SQL de la
+    fonction lorsque l'instrumentation est active"""
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+        return _run_instrumented(name, fn, args, kwargs)
+    return wrapper
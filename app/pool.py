@@ -0,0 +1,109 @@
+import pathlib
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+from app.database import (
+    InventoryConnection, apply_pragmas, initialize_database, load_profile
+)
+
+# PRAGMA qui modifient le fichier et ne concernent donc que l'écrivain
+WRITER_ONLY_PRAGMAS = ("page_size", "journal_mode")
+
+
+class ConnectionPool:
+    """Pool de connexions vers la base d'inventaire : une connexion de
+    lecture par thread et une seule connexion d'écriture, sérialisée.
+    Les connexions fournies s'utilisent avec les fonctions existantes
+    qui prennent un db_conn (search_products, import_csv_files...).
+
+    La connexion de lecture d'un thread est libérée (et fermée) à la fin
+    du thread : le nombre de lecteurs ouverts est celui des threads
+    vivants qui ont lu, à borner par un groupe de threads (voir
+    aio.AsyncInventory)."""
+
+    def __init__(self, db_path="inventory.db", profile="performance",
+                 config_file=None, timeout=30.0):
+        if db_path == ":memory:":
+            raise ValueError(
+                "Une base en mémoire ne peut pas être partagée entre"
+                " plusieurs connexions."
+                )
+        self.db_path = db_path
+        self.timeout = timeout
+        pragmas = load_profile(profile, config_file)
+        self._reader_pragmas = {
+            name: value for name, value in pragmas.items()
+            if name not in WRITER_ONLY_PRAGMAS
+        }
+        # Le WAL permet aux lecteurs de travailler pendant une écriture
+        self._writer = initialize_database(
+            db_path, profile, config_file, check_same_thread=False
+            )
+        self._writer.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+        self._writer_lock = threading.RLock()
+        self._local = threading.local()
+        # Lecteurs ouverts ; seul le thread propriétaire retient le sien
+        self._readers = weakref.WeakSet()
+        self._readers_lock = threading.Lock()
+        self._closed = False
+
+    def _open_reader(self):
+        """Ouvre une connexion en lecture seule pour le thread courant"""
+        uri = pathlib.Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(
+            uri, uri=True, timeout=self.timeout, check_same_thread=False,
+            factory=InventoryConnection
+            )
+        apply_pragmas(conn, self._reader_pragmas)
+        with self._readers_lock:
+            self._readers.add(conn)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Fournit la connexion de lecture propre au thread appelant"""
+        if self._closed:
+            raise RuntimeError("Le pool de connexions est fermé.")
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open_reader()
+        yield conn
+
+    @contextmanager
+    def writer(self):
+        """Fournit la connexion d'écriture, un seul thread à la fois.
+        La transaction est validée en sortie, annulée en cas d'erreur."""
+        if self._closed:
+            raise RuntimeError("Le pool de connexions est fermé.")
+        with self._writer_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.rollback()
+                raise
+            else:
+                self._writer.commit()
+
+    def close(self):
+        """Ferme toutes les connexions du pool"""
+        self._closed = True
+        with self._readers_lock:
+            readers = list(self._readers)
+            self._readers.clear()
+        for conn in readers:
+            conn.close()
+        with self._writer_lock:
+            self._writer.close()
+
+    def reader_count(self):
+        """Nombre de connexions de lecture ouvertes"""
+        with self._readers_lock:
+            return len(self._readers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,282 @@
+import time
+from itertools import groupby
+
+from app.database import create_change_log, initialize_database, iter_rows
+from app.instrumentation import instrumented, record_rows
+
+# Nombre d'entrées du journal appliquées par transaction sur la réplique
+REPLICATION_BATCH_SIZE = 5000
+# Triggers du journal, inutiles sur une réplique (qui ne fait que lire)
+CHANGE_LOG_TRIGGERS = (
+    "change_log_insert", "change_log_update", "change_log_delete"
+)
+
+# Instruction appliquée sur la réplique pour chaque type d'entrée
+APPLY_SQL = {
+    # Insertion et modification : la ligne est écrite telle quelle
+    "I": """
+        INSERT INTO inventory (id, name, quantity, price, category)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            name = excluded.name,
+            quantity = excluded.quantity,
+            price = excluded.price,
+            category = excluded.category
+    """,
+    "D": "DELETE FROM inventory WHERE id = ?",
+    "R": "DELETE FROM inventory"
+}
+APPLY_SQL["U"] = APPLY_SQL["I"]
+
+
+class ReplicationGap(Exception):
+    """Le journal de la source ne contient plus les entrées attendues par
+    la réplique (journal purgé) : la réplique doit être recréée"""
+
+
+def has_change_log(source_conn):
+    """Indique si le journal des modifications de la source est actif"""
+    cursor = source_conn.execute(
+        "SELECT 1 FROM sqlite_master"
+        " WHERE type = 'table' AND name = 'change_log'"
+        )
+    return cursor.fetchone() is not None
+
+
+def enable_change_log(source_conn):
+    """Active le journal des modifications de la source (voir
+    database.create_change_log) et la table des accusés de réception des
+    répliques ; sans effet s'il est déjà actif"""
+    cursor = source_conn.cursor()
+    create_change_log(cursor)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS replication_acks (
+            replica_id TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL,
+            acked_at REAL NOT NULL
+        )
+    """)
+    source_conn.commit()
+
+
+def open_replica(replica_path, profile="performance", config_file=None):
+    """Ouvre (ou crée) une réplique : même schéma que la source, sans
+    journal, plus la table replication_state qui retient son identifiant
+    et la dernière entrée appliquée"""
+    conn = initialize_database(replica_path, profile, config_file)
+    cursor = conn.cursor()
+    for name in CHANGE_LOG_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.executescript("""
+        DROP TABLE IF EXISTS change_log;
+        CREATE TABLE IF NOT EXISTS replication_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            replica_id TEXT NOT NULL DEFAULT (lower(hex(randomblob(8)))),
+            last_seq INTEGER NOT NULL,
+            applied_at REAL
+        );
+        INSERT OR IGNORE INTO replication_state (id, last_seq) VALUES (1, 0);
+    """)
+    conn.commit()
+    return conn
+
+
+def last_applied(replica_conn):
+    """Numéro de la dernière entrée du journal appliquée à la réplique"""
+    cursor = replica_conn.execute(
+        "SELECT last_seq FROM replication_state WHERE id = 1"
+        )
+    return cursor.fetchone()[0]
+
+
+def replication_lag(source_conn, replica_conn):
+    """Retard de la réplique : (entrées non appliquées, âge en secondes de
+    la plus ancienne d'entre elles, 0 si la réplique est à jour), ou None
+    si le journal de la source n'est pas actif. Lecture seule : le
+    journal n'est activé que par replicate (ou enable_change_log)."""
+    if not has_change_log(source_conn):
+        return None
+    last_seq = last_applied(replica_conn)
+    cursor = source_conn.execute(
+        "SELECT COUNT(*), (julianday('now') - MIN(logged_at)) * 86400"
+        " FROM change_log WHERE seq > ?", (last_seq,)
+        )
+    pending, seconds = cursor.fetchone()
+    return pending, max(seconds or 0.0, 0.0)
+
+
+def _apply_batch(cursor, entries):
+    """Applique des entrées (seq, op, id, name, quantity, price, category)
+    dans l'ordre, en regroupant les entrées consécutives de même type"""
+    for op, group in groupby(entries, key=lambda entry: entry[1]):
+        if op == "R":
+            for _ in group:
+                cursor.execute(APPLY_SQL["R"])
+        elif op == "D":
+            cursor.executemany(APPLY_SQL["D"],
+                               [(entry[2],) for entry in group])
+        elif op in APPLY_SQL:
+            cursor.executemany(APPLY_SQL[op],
+                               [entry[2:] for entry in group])
+        else:
+            raise ValueError(f"Entrée de journal inconnue : {op}")
+
+
+def _log_bounds(source):
+    """Numéros de la première entrée présente dans le journal et de la
+    dernière jamais écrite (0 si aucune), purgée ou non"""
+    source.execute(
+        "SELECT (SELECT MIN(seq) FROM change_log),"
+        " (SELECT seq FROM sqlite_sequence WHERE name = 'change_log')"
+        )
+    first, last = source.fetchone()
+    last = last or 0
+    return first or last + 1, last
+
+
+def _copy_inventory(source_conn, replica_conn):
+    """Remplit une réplique neuve par copie de l'inventaire de la source,
+    lu dans une même transaction que le numéro de la dernière entrée du
+    journal, qu'il reflète ; retourne ce numéro"""
+    source = source_conn.cursor()
+    cursor = replica_conn.cursor()
+    own_transaction = not source_conn.in_transaction
+    if own_transaction:
+        # Lecture cohérente : pas d'écriture entre les deux requêtes
+        source.execute("BEGIN")
+    try:
+        last_seq = _log_bounds(source)[1]
+        source.execute(
+            "SELECT id, name, quantity, price, category FROM inventory"
+            )
+        cursor.execute("DELETE FROM inventory")
+        cursor.executemany(APPLY_SQL["I"], iter_rows(source))
+        cursor.execute(
+            "UPDATE replication_state"
+            " SET last_seq = ?, applied_at = julianday('now')"
+            " WHERE id = 1", (last_seq,)
+            )
+        replica_conn.commit()
+    except Exception:
+        replica_conn.rollback()
+        raise
+    finally:
+        if own_transaction:
+            source_conn.commit()
+    return last_seq
+
+
+def _acknowledge(source_conn, replica_conn, last_seq):
+    """Enregistre sur la source la dernière entrée appliquée par la
+    réplique et purge les entrées appliquées par toutes les répliques
+    connues ; retourne le nombre d'entrées purgées. Une réplique
+    abandonnée doit être retirée de replication_acks pour ne pas bloquer
+    la purge."""
+    replica_id = replica_conn.execute(
+        "SELECT replica_id FROM replication_state WHERE id = 1"
+        ).fetchone()[0]
+    cursor = source_conn.cursor()
+    cursor.execute("""
+        INSERT INTO replication_acks (replica_id, last_seq, acked_at)
+        VALUES (?, ?, julianday('now'))
+        ON CONFLICT (replica_id) DO UPDATE SET
+            last_seq = excluded.last_seq,
+            acked_at = excluded.acked_at
+    """, (replica_id, last_seq))
+    cursor.execute(
+        "DELETE FROM change_log"
+        " WHERE seq <= (SELECT MIN(last_seq) FROM replication_acks)"
+        )
+    source_conn.commit()
+    return cursor.rowcount
+
+
+@instrumented
+def replicate(source_conn, replica_conn, batch_size=REPLICATION_BATCH_SIZE,
+              max_changes=None, prune=True):
+    """Applique à la réplique les entrées du journal de la source qui lui
+    manquent, par lots d'au plus batch_size entrées. Chaque lot est validé
+    avec le nouveau last_seq dans une même transaction : une réplication
+    interrompue reprend au lot suivant. Le premier appel active le journal
+    de la source (enable_change_log) ; une réplique neuve dont les
+    premières entrées ont été purgées est remplie par copie.
+
+    Avec prune, la source enregistre la progression de la réplique et
+    purge les entrées appliquées par toutes ses répliques. Retourne les
+    statistiques."""
+    start = time.perf_counter()
+    enable_change_log(source_conn)
+    pending, lag_seconds = replication_lag(source_conn, replica_conn)
+    last_seq = last_applied(replica_conn)
+    stats = {"pending": pending, "lag_seconds": lag_seconds,
+             "applied": 0, "batches": 0, "copied": 0}
+    source = source_conn.cursor()
+    cursor = replica_conn.cursor()
+    first_seq = _log_bounds(source)[0]
+    if last_seq == 0 and first_seq > 1:
+        last_seq = _copy_inventory(source_conn, replica_conn)
+        stats["copied"] = replica_conn.execute(
+            "SELECT COUNT(*) FROM inventory"
+            ).fetchone()[0]
+    elif first_seq > last_seq + 1:
+        raise ReplicationGap(
+            f"Les entrées {last_seq + 1} à {first_seq - 1} ont été"
+            " purgées du journal : recréer la réplique."
+            )
+    while max_changes is None or stats["applied"] < max_changes:
+        limit = batch_size
+        if max_changes is not None:
+            limit = min(limit, max_changes - stats["applied"])
+        source.execute(
+            "SELECT seq, op, item_id, name, quantity, price, category"
+            " FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+            (last_seq, limit)
+            )
+        entries = source.fetchall()
+        if not entries:
+            break
+        if entries[0][0] != last_seq + 1:
+            # Purge faite pendant la réplication
+            raise ReplicationGap(
+                f"Les entrées {last_seq + 1} à {entries[0][0] - 1} ont été"
+                " purgées du journal : recréer la réplique."
+                )
+        try:
+            _apply_batch(cursor, entries)
+            last_seq = entries[-1][0]
+            cursor.execute(
+                "UPDATE replication_state"
+                " SET last_seq = ?, applied_at = julianday('now')"
+                " WHERE id = 1", (last_seq,)
+                )
+            replica_conn.commit()
+        except Exception:
+            replica_conn.rollback()
+            raise
+        stats["applied"] += len(entries)
+        stats["batches"] += 1
+    stats["seconds"] = time.perf_counter() - start
+    stats["changes_per_second"] = (
+        stats["applied"] / stats["seconds"] if stats["seconds"] else 0.0
+        )
+    stats["last_seq"] = last_seq
+    stats["pruned"] = (
+        _acknowledge(source_conn, replica_conn, last_seq) if prune else 0
+        )
+    # Entrées restantes, y compris celles écrites pendant la réplication
+    stats["remaining"], _ = replication_lag(source_conn, replica_conn)
+    record_rows(stats["applied"] + stats["copied"])
+    return stats
+
+
+@instrumented
+def prune_change_log(source_conn, up_to_seq):
+    """Supprime du journal les entrées jusqu'à up_to_seq, quelle que soit
+    la progression des répliques (replicate purge automatiquement celles
+    qu'elles ont toutes appliquées) ; retourne le nombre d'entrées
+    supprimées"""
+    cursor = source_conn.cursor()
+    cursor.execute("DELETE FROM change_log WHERE seq <= ?", (up_to_seq,))
+    source_conn.commit()
+    record_rows(cursor.rowcount)
+    return cursor.rowcount
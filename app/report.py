@@ -1,21 +1,175 @@
 import csv
+import gzip
+import json
+import math
+import sys
+from contextlib import nullcontext
 
+from app.database import SUMMARY_CATEGORY_SQL
+from app.instrumentation import instrumented, record_rows
 
-def generate_summary_report(db_conn, output_file):
-    cursor = db_conn.cursor()
-    cursor.execute("""
-        SELECT category, COUNT(*), SUM(quantity), SUM(price * quantity)
+# Nombre de lignes lues puis écrites à chaque itération
+REPORT_CHUNK_SIZE = 1000
+REPORT_FORMATS = ("csv", "jsonl")
+
+# Catégories NULL regroupées avec la catégorie vide, comme dans
+# category_summary
+SUMMARY_QUERY = f"""
+    SELECT {SUMMARY_CATEGORY_SQL.format(row="inventory")}, COUNT(*),
+        SUM(quantity), SUM(price * quantity)
+    FROM inventory
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+MATERIALIZED_SUMMARY_QUERY = """
+    SELECT category, product_count, total_quantity, total_value
+    FROM category_summary
+    ORDER BY category
+"""
+
+
+def has_category_summary(db_conn):
+    """Indique si la table matérialisée category_summary existe"""
+    cursor = db_conn.execute(
+        "SELECT 1 FROM sqlite_master"
+        " WHERE type = 'table' AND name = 'category_summary'"
+        )
+    return cursor.fetchone() is not None
+
+
+@instrumented
+def check_category_summary(db_conn, tolerance=1e-6):
+    """Compare category_summary à l'agrégat calculé sur inventory.
+    Retourne la liste des écarts (catégorie, valeurs stockées, valeurs
+    réelles) ; les valeurs monétaires sont comparées avec une tolérance
+    car les mises à jour incrémentales accumulent des arrondis."""
+    stored = {
+        row[0]: row[1:] for row in db_conn.execute(MATERIALIZED_SUMMARY_QUERY)
+    }
+    live = {row[0]: row[1:] for row in db_conn.execute(SUMMARY_QUERY)}
+    mismatches = []
+    for category in sorted(set(stored) | set(live)):
+        expected = live.get(category)
+        actual = stored.get(category)
+        if (expected is None or actual is None
+                or (expected[0], expected[1] or 0) != actual[:2]
+                or not math.isclose(expected[2] or 0.0, actual[2],
+                                    rel_tol=tolerance, abs_tol=tolerance)):
+            mismatches.append((category, actual, expected))
+    return mismatches
+
+
+def _summary_query(db_conn, params):
+    if has_category_summary(db_conn):
+        # Lecture de la table matérialisée : une ligne par catégorie
+        return MATERIALIZED_SUMMARY_QUERY, ()
+    return SUMMARY_QUERY, ()
+
+
+def _detail_query(db_conn, params):
+    return """
+        SELECT id, name, quantity, price, category, price * quantity
+        FROM inventory
+        ORDER BY id
+    """, ()
+
+
+def _low_stock_query(db_conn, params):
+    return """
+        SELECT id, name, quantity, price, category, price * quantity
+        FROM inventory
+        WHERE quantity < ?
+        ORDER BY quantity, id
+    """, (params.get("threshold", 10),)
+
+
+def _top_value_query(db_conn, params):
+    return """
+        SELECT id, name, quantity, price, category, price * quantity AS value
         FROM inventory
-        GROUP BY category
-    """)
-    rows = cursor.fetchall()
-
-    with open(output_file, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(
-            ["Category",
-             "Number of Products",
-             "Total Quantity",
-             "Total Value"]
+        ORDER BY value DESC, id
+        LIMIT ?
+    """, (params.get("limit", 100),)
+
+
+PRODUCT_HEADER = ["ID", "Name", "Quantity", "Price", "Category", "Value"]
+
+# Rapports disponibles : en-tête et construction de la requête
+REPORTS = {
+    "summary": (
+        ["Category", "Number of Products", "Total Quantity", "Total Value"],
+        _summary_query
+    ),
+    "detail": (PRODUCT_HEADER, _detail_query),
+    "low-stock": (PRODUCT_HEADER, _low_stock_query),
+    "top-value": (PRODUCT_HEADER, _top_value_query)
+}
+
+
+def _open_output(output_file, compress):
+    """Ouvre la sortie en texte ; "-" désigne la sortie standard"""
+    if output_file == "-":
+        if compress:
+            return gzip.open(sys.stdout.buffer, "wt", newline="")
+        return nullcontext(sys.stdout)
+    if compress:
+        return gzip.open(output_file, "wt", newline="")
+    return open(output_file, "w", newline="")
+
+
+class _JsonLinesWriter:
+    """Même interface que csv.writer, une ligne JSON par enregistrement"""
+
+    def __init__(self, f, header):
+        self.f = f
+        self.header = header
+
+    def writerows(self, rows):
+        self.f.writelines(
+            json.dumps(dict(zip(self.header, row))) + "\n" for row in rows
             )
-        writer.writerows(rows)
+
+
+@instrumented
+def write_report(db_conn, report_name, output_file, fmt=None, compress=None,
+                 chunk_size=REPORT_CHUNK_SIZE, **params):
+    """Écrit un rapport en flux, par paquets de chunk_size lignes, sans
+    charger le résultat en mémoire. Le format (csv ou jsonl) et la
+    compression gzip sont déduits de l'extension s'ils ne sont pas donnés
+    (ex. detail.jsonl.gz). Retourne le nombre de lignes écrites."""
+    if report_name not in REPORTS:
+        raise ValueError(f"Rapport inconnu : {report_name}")
+    if compress is None:
+        compress = output_file.endswith(".gz")
+    if fmt is None:
+        base = output_file[:-3] if output_file.endswith(".gz") else output_file
+        fmt = "jsonl" if base.endswith((".jsonl", ".json")) else "csv"
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Format inconnu : {fmt}")
+
+    header, build_query = REPORTS[report_name]
+    query, values = build_query(db_conn, params)
+    cursor = db_conn.cursor()
+    cursor.execute(query, values)
+    count = 0
+    with _open_output(output_file, compress) as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(header)
+        else:
+            writer = _JsonLinesWriter(f, header)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            count += len(rows)
+    record_rows(count)
+    return count
+
+
+@instrumented
+def generate_summary_report(db_conn, output_file):
+    return write_report(db_conn, "summary", output_file, fmt="csv",
+                        compress=False)
@@ -1,20 +1,424 @@
-def search_products(db_conn, search_criteria):
-    cursor = db_conn.cursor()
-    query = "SELECT * FROM inventory"
-    values = []
-
-    if search_criteria:  # Si des critères de recherche sont fournis
-        query += " WHERE "
-        conditions = []
-        for criteria in search_criteria:
-            if ":" in criteria:
-                key, value = criteria.split(":")
-                conditions.append(f"{key} LIKE ?")
-                values.append(f"%{value}%")
-        query += " AND ".join(conditions)
-
-    cursor.execute(query, values)
-    results = cursor.fetchall()
-
-    for result in results:
-        print(result)
+import re
+import sqlite3
+import sys
+import threading
+import weakref
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import lru_cache
+
+from app.database import (
+    FETCH_SIZE, PAGE_SIZE, analysis_generation, data_version, fetch_page,
+    iter_inventory
+)
+from app.instrumentation import instrumented, record_rows
+
+# Colonnes interrogeables et type de leurs valeurs
+COLUMN_TYPES = {
+    "id": int,
+    "name": str,
+    "quantity": int,
+    "price": float,
+    "category": str
+}
+# Critères "clé opérateur valeur" ; ":=" et ":^" sont les formes
+# historiques de "=" et "^"
+CRITERIA_PATTERN = re.compile(r"\s*(\w+)\s*(:=|:\^|:|>=|<=|!=|=|>|<|\^)(.*)",
+                              re.DOTALL)
+OPERATOR_ALIASES = {":=": "=", ":^": "^"}
+# Nombre de formes de critères compilées gardées en cache
+COMPILE_CACHE_SIZE = 512
+
+# Sélectivité estimée (part des lignes retenues) par opérateur, à défaut
+# de statistiques ANALYZE pour l'égalité
+DEFAULT_SELECTIVITY = {
+    "=": 0.1,
+    "^": 0.125,
+    ">": 0.25,
+    ">=": 0.25,
+    "<": 0.25,
+    "<=": 0.25,
+    "!=": 0.9,
+    ":": 0.5
+}
+# Une sous-chaîne réduite par l'index plein texte
+FTS_SELECTIVITY = 0.1
+
+# Colonnes couvertes par l'index plein texte
+FTS_COLUMNS = ("name", "category")
+# Le tokenizer trigramme ne peut pas servir en dessous de 3 caractères
+FTS_MIN_LENGTH = 3
+
+# Limites du cache des résultats de recherche
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+# Un résultat plus volumineux n'est pas mis en cache
+CACHE_MAX_ENTRY_BYTES = 1024 * 1024
+
+
+class SearchCache:
+    """Cache LRU des résultats de recherche, borné en nombre d'entrées et
+    en mémoire. Une entrée n'est valable que pour la version des données
+    (data_version) à laquelle elle a été calculée. Les clés commencent
+    par l'identifiant de la connexion : les entrées d'une connexion
+    fermée et libérée sont retirées (forget_connection)."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES,
+                 max_bytes=CACHE_MAX_BYTES,
+                 max_entry_bytes=CACHE_MAX_ENTRY_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Connexions libérées dont les entrées restent à retirer
+        self._forgotten = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version):
+        """Retourne les lignes en cache, ou None"""
+        with self._lock:
+            self._purge()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, rows, size):
+        with self._lock:
+            self._purge()
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, rows, size)
+            self._bytes += size
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[2]
+
+    def forget_connection(self, conn_id):
+        """Appelé à la libération d'une connexion. Le retrait est différé
+        au prochain accès : l'appel peut survenir pendant un ramasse-miettes
+        déclenché alors que le verrou est déjà pris."""
+        self._forgotten.append(conn_id)
+
+    def _purge(self):
+        if not self._forgotten:
+            return
+        forgotten = set()
+        while self._forgotten:
+            forgotten.add(self._forgotten.pop())
+        for key in [key for key in self._entries if key[0] in forgotten]:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes
+            }
+
+
+_cache = SearchCache()
+# Connexions dont la libération purge déjà le cache
+_watched = weakref.WeakSet()
+
+
+def search_cache_stats():
+    """Statistiques du cache (succès, échecs, évictions, taille)"""
+    return _cache.stats()
+
+
+def clear_search_cache():
+    _cache.clear()
+
+
+def configure_search_cache(max_entries=None, max_bytes=None,
+                           max_entry_bytes=None):
+    """Ajuste les limites du cache ; les entrées en trop sont évincées
+    au prochain ajout"""
+    if max_entries is not None:
+        _cache.max_entries = max_entries
+    if max_bytes is not None:
+        _cache.max_bytes = max_bytes
+    if max_entry_bytes is not None:
+        _cache.max_entry_bytes = max_entry_bytes
+
+
+def _row_size(row):
+    """Estimation de la mémoire occupée par une ligne"""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+def _cache_key(db_conn, search_criteria):
+    """Clé du cache : l'id de la connexion et les critères normalisés,
+    l'ordre des critères n'influant pas sur le résultat. Le cache ne
+    retient pas la connexion ; ses entrées sont retirées à sa libération,
+    avant que son id puisse être réutilisé. Retourne None pour une
+    sqlite3.Connection simple (sans référence faible), qui n'est pas
+    mise en cache."""
+    if db_conn not in _watched:
+        try:
+            weakref.finalize(db_conn, _cache.forget_connection, id(db_conn))
+        except TypeError:
+            return None
+        _watched.add(db_conn)
+    criteria = tuple(sorted(criteria.strip() for criteria in search_criteria))
+    return id(db_conn), criteria
+
+
+def has_fts_index(db_conn):
+    """Indique si la table inventory dispose de l'index plein texte"""
+    cursor = db_conn.execute(
+        "SELECT 1 FROM sqlite_master"
+        " WHERE type = 'table' AND name = 'inventory_fts'"
+        )
+    return cursor.fetchone() is not None
+
+
+def _prefix_condition(key, prefix):
+    """Préfixe exprimé en intervalle pour passer par l'index B-tree"""
+    if not prefix:
+        return "1", []
+    last = ord(prefix[-1])
+    if last == 0x10FFFF:
+        return f"substr({key}, 1, ?) = ?", [len(prefix), prefix]
+    upper = prefix[:-1] + chr(last + 1)
+    return f"{key} >= ? AND {key} < ?", [prefix, upper]
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def parse_criteria(criteria):
+    """Décompose un critère en (colonne, opérateur, valeur typée).
+    Retourne None pour un critère sans opérateur, qui est ignoré.
+    - "name:pple"   : sous-chaîne, comme LIKE '%pple%' (index FTS5)
+    - "name=Apple"  : égalité exacte (aussi "name:=Apple")
+    - "name^Ap"     : préfixe, sensible à la casse (aussi "name:^Ap")
+    - "quantity>10", "price<=1.5", "quantity!=0" : comparaisons typées
+    """
+    match = CRITERIA_PATTERN.fullmatch(criteria)
+    if match is None:
+        return None
+    key, operator, value = match.groups()
+    operator = OPERATOR_ALIASES.get(operator, operator)
+    column_type = COLUMN_TYPES.get(key)
+    if column_type is None:
+        raise ValueError(
+            f"Colonne inconnue : {key} (colonnes : {', '.join(COLUMN_TYPES)})"
+            )
+    if operator == ":":
+        return key, operator, value
+    if column_type is str:
+        return key, operator, value
+    if operator == "^":
+        raise ValueError(f"Le préfixe ne s'applique pas à {key}.")
+    try:
+        return key, operator, column_type(value.strip())
+    except ValueError:
+        raise ValueError(f"Valeur invalide pour {key} : {value}") from None
+
+
+def _build_condition(key, operator, value, use_fts):
+    """Traduit un critère analysé en condition SQL et en sélectivité
+    estimée (sans tenir compte des statistiques)"""
+    if operator == "^":
+        condition, values = _prefix_condition(key, value)
+        return condition, values, DEFAULT_SELECTIVITY[operator]
+    if operator != ":":
+        # Valeur typée : l'index B-tree de la colonne est utilisable
+        return f"{key} {operator} ?", [value], DEFAULT_SELECTIVITY[operator]
+
+    condition = f"{key} LIKE ?"
+    values = [f"%{value}%"]
+    if (use_fts and key in FTS_COLUMNS
+            and len(value) >= FTS_MIN_LENGTH
+            and "%" not in value and "_" not in value):
+        # FTS5 réduit les candidats, LIKE garantit la même sémantique
+        phrase = value.replace('"', '""')
+        condition = (
+            "id IN (SELECT rowid FROM inventory_fts"
+            " WHERE inventory_fts MATCH ?) AND " + condition
+            )
+        values.insert(0, f'{key} : "{phrase}"')
+        return condition, values, FTS_SELECTIVITY
+    return condition, values, DEFAULT_SELECTIVITY[operator]
+
+
+# Sélectivités lues par connexion, avec la version des données et la
+# génération d'analyse auxquelles elles correspondent
+_selectivity = weakref.WeakKeyDictionary()
+
+
+def column_selectivity(db_conn):
+    """Part des lignes partageant une même valeur, par colonne indexée,
+    d'après les statistiques d'ANALYZE (vide si elles n'existent pas).
+    Le résultat est gardé par connexion tant que ni les données ni les
+    statistiques n'ont changé (un ANALYZE exécuté directement sur la même
+    connexion, hors analyze_inventory, n'est pas détecté)."""
+    version = (data_version(db_conn), analysis_generation())
+    try:
+        cached = _selectivity.get(db_conn)
+    except TypeError:
+        # sqlite3.Connection simple : pas de référence faible, pas de cache
+        return _read_selectivity(db_conn)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    selectivity = _read_selectivity(db_conn)
+    _selectivity[db_conn] = (version, selectivity)
+    return selectivity
+
+
+def _read_selectivity(db_conn):
+    try:
+        cursor = db_conn.execute(
+            "SELECT i.name, s.stat FROM sqlite_stat1 AS s,"
+            " pragma_index_info(s.idx) AS i"
+            " WHERE s.tbl = 'inventory' AND i.seqno = 0"
+            )
+    except sqlite3.OperationalError:
+        return ()
+    selectivity = {}
+    for column, stat in cursor.fetchall():
+        rows, per_value = (int(number) for number in stat.split()[:2])
+        value = per_value / max(rows, 1)
+        selectivity[column] = min(value, selectivity.get(column, value))
+    return tuple(sorted(selectivity.items()))
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def _compile(search_criteria, use_fts, selectivity):
+    """Compile des critères en clause WHERE ordonnée par sélectivité
+    croissante : les conditions les plus restrictives sont évaluées en
+    premier. Le texte SQL ne dépend que de la forme des critères, ce qui
+    permet à sqlite3 de réutiliser la requête préparée."""
+    statistics = dict(selectivity)
+    terms = []
+    for criteria in search_criteria:
+        parsed = parse_criteria(criteria)
+        if parsed is None:
+            continue
+        key, operator, value = parsed
+        condition, values, estimate = _build_condition(
+            key, operator, value, use_fts
+            )
+        if operator == "=" and key in statistics:
+            estimate = statistics[key]
+        elif operator == "=" and key == "id":
+            estimate = 0.0
+        terms.append((estimate, condition, values))
+    if not terms:
+        raise ValueError(
+            "Aucun critère valide (format attendu : clé:valeur)."
+            )
+    terms.sort(key=lambda term: term[0])
+    return (" AND ".join(condition for _, condition, _ in terms),
+            tuple(value for _, _, values in terms for value in values))
+
+
+def build_search_filter(db_conn, search_criteria):
+    """Construit la clause WHERE (sans le mot-clé) et ses paramètres"""
+    if not search_criteria:  # Aucun critère : tout l'inventaire
+        return "", []
+    where, values = _compile(
+        tuple(search_criteria), has_fts_index(db_conn),
+        column_selectivity(db_conn)
+        )
+    return where, list(values)
+
+
+def iter_search_results(db_conn, search_criteria, fetch_size=FETCH_SIZE):
+    """Générateur sur les produits correspondant aux critères"""
+    where, values = build_search_filter(db_conn, search_criteria)
+    return iter_inventory(db_conn, where, values, fetch_size)
+
+
+def _collect(rows, limit, emit=None):
+    """Parcourt les lignes (en les passant à emit) et les conserve tant
+    que leur taille reste sous la limite.
+    Retourne (lignes ou None si trop volumineuses, taille, nombre)."""
+    kept = []
+    size = 0
+    count = 0
+    for row in rows:
+        if emit is not None:
+            emit(row)
+        count += 1
+        if kept is not None:
+            kept.append(row)
+            size += _row_size(row)
+            if size > limit:
+                if emit is None:
+                    return None, size, count
+                kept = None
+    return kept, size, count
+
+
+@instrumented
+def search_page(db_conn, search_criteria, page_size=PAGE_SIZE,
+                after_id=None):
+    """Retourne une page de résultats et le jeton de la page suivante.
+    Les résultats déjà en cache (remplis par search_products) sont
+    paginés en mémoire ; sinon seule la page demandée est lue."""
+    key = _cache_key(db_conn, search_criteria)
+    rows = None
+    if key is not None:
+        rows = _cache.get(key, data_version(db_conn))
+    if rows is None:
+        where, values = build_search_filter(db_conn, search_criteria)
+        return fetch_page(db_conn, where, values, page_size, after_id)
+    # Les résultats sont triés par id : pagination par recherche binaire
+    start = 0
+    if after_id is not None:
+        start = bisect_right(rows, after_id, key=lambda row: row[0])
+    page = rows[start:start + page_size]
+    record_rows(len(page))
+    if start + page_size < len(rows):
+        return page, page[-1][0]
+    return page, None
+
+
+@instrumented
+def search_products(db_conn, search_criteria, emit=print):
+    """Affiche (ou passe à emit) chaque produit trouvé ;
+    retourne le nombre de résultats"""
+    key = _cache_key(db_conn, search_criteria)
+    version = data_version(db_conn)
+    rows = None if key is None else _cache.get(key, version)
+    if rows is not None:
+        for result in rows:
+            emit(result)
+        count = len(rows)
+    else:
+        rows, size, count = _collect(
+            iter_search_results(db_conn, search_criteria),
+            _cache.max_entry_bytes, emit
+            )
+        if rows is not None and key is not None:
+            _cache.put(key, version, rows, size)
+    record_rows(count)
+    return count
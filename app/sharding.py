@@ -0,0 +1,239 @@
+import csv
+import heapq
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from app import database, importer, report, search
+from app.instrumentation import instrumented, record_rows
+
+# Les id globaux encodent la partition : id local * ID_STRIDE + partition
+ID_STRIDE = 1000
+DEFAULT_SHARDS = 8
+# Nombre de lignes lues par page dans chaque partition lors d'une recherche
+PAGE_SIZE = 1000
+# Fichier décrivant le découpage, dans le répertoire des partitions
+LAYOUT_FILE = "shards.json"
+
+
+def encode_id(shard_no, local_id):
+    return local_id * ID_STRIDE + shard_no
+
+
+def decode_id(item_id):
+    """Retourne (partition, id local) d'un id global"""
+    local_id, shard_no = divmod(item_id, ID_STRIDE)
+    return shard_no, local_id
+
+
+def shard_for(category, shards):
+    """Partition d'une catégorie : tous les produits d'une catégorie sont
+    dans le même fichier"""
+    return zlib.crc32(category.encode("utf-8")) % shards
+
+
+def _exact_categories(search_criteria):
+    """Catégories imposées par un critère category:=..., qui permettent de
+    n'interroger que leur partition"""
+    categories = set()
+    for criteria in search_criteria:
+        parsed = search.parse_criteria(criteria)
+        if parsed is not None and parsed[:2] == ("category", "="):
+            categories.add(parsed[2])
+    return categories
+
+
+class ShardedInventory:
+    """Inventaire réparti sur plusieurs fichiers SQLite (un répertoire,
+    un fichier par partition), les produits étant affectés à une partition
+    d'après le hachage de leur catégorie. Chaque partition a son propre
+    verrou d'écriture ; les recherches et les rapports interrogent les
+    partitions en parallèle et fusionnent les résultats.
+
+    Les id exposés sont globaux (voir encode_id). Le mode mono-fichier
+    (initialize_database) reste le mode par défaut."""
+
+    def __init__(self, directory, shards=None, profile="performance",
+                 config_file=None):
+        os.makedirs(directory, exist_ok=True)
+        layout_path = os.path.join(directory, LAYOUT_FILE)
+        if os.path.exists(layout_path):
+            with open(layout_path) as f:
+                existing = json.load(f)["shards"]
+            if shards is not None and shards != existing:
+                raise ValueError(
+                    f"{directory} est découpé en {existing} partitions,"
+                    f" pas {shards}."
+                    )
+            shards = existing
+        else:
+            shards = shards or DEFAULT_SHARDS
+            if not 1 <= shards <= ID_STRIDE:
+                raise ValueError(
+                    f"Nombre de partitions invalide : {shards}"
+                    f" (1 à {ID_STRIDE})."
+                    )
+            with open(layout_path, "w") as f:
+                json.dump({"shards": shards}, f)
+        self.directory = directory
+        self.shards = shards
+        # Chaque connexion n'est utilisée que par un thread à la fois
+        self.connections = [
+            database.initialize_database(
+                os.path.join(directory, f"shard_{shard_no:03d}.db"),
+                profile, config_file, check_same_thread=False
+                )
+            for shard_no in range(shards)
+        ]
+        # Même profil sur toutes les partitions
+        self.pragmas = self.connections[0].pragmas
+        self._executor = ThreadPoolExecutor(max_workers=shards)
+
+    def close(self):
+        self._executor.shutdown()
+        for conn in self.connections:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _fan_out(self, fn, shard_numbers=None):
+        """Exécute fn(partition, connexion) sur les partitions en
+        parallèle ; retourne les résultats dans l'ordre des partitions"""
+        if shard_numbers is None:
+            shard_numbers = range(self.shards)
+        futures = [
+            self._executor.submit(fn, shard_no, self.connections[shard_no])
+            for shard_no in shard_numbers
+        ]
+        return [future.result() for future in futures]
+
+    @instrumented
+    def add_product(self, name, quantity, price, category):
+        """Ajoute un produit dans sa partition ; retourne son id global"""
+        shard_no = shard_for(category, self.shards)
+        local_id = database.add_product(
+            self.connections[shard_no], name, quantity, price, category
+            )
+        return encode_id(shard_no, local_id)
+
+    @instrumented
+    def delete_item_by_id(self, item_id):
+        shard_no, local_id = decode_id(item_id)
+        if shard_no >= self.shards:
+            return 0
+        return database.delete_item_by_id(
+            self.connections[shard_no], local_id
+            )
+
+    @instrumented
+    def import_csv_files(self, file_paths, batch_size=importer.BATCH_SIZE,
+                         commit_every=importer.COMMIT_EVERY, verbose=True,
+                         mode="insert", reader="csv"):
+        """Importe les fichiers CSV en envoyant chaque ligne à la partition
+        de sa catégorie (un ImportWriter par partition, validé toutes les
+        commit_every lignes) ; retourne les statistiques par fichier"""
+        if reader not in importer.READERS:
+            raise ValueError(f"Lecteur inconnu : {reader}")
+        writers = [
+            importer.ImportWriter(conn, mode, batch_size, commit_every)
+            for conn in self.connections
+        ]
+        stats = []
+        with ExitStack() as stack:
+            for writer in writers:
+                stack.enter_context(writer)
+            for file_path in file_paths:
+                start = time.perf_counter()
+                file_stats = importer.new_file_stats(file_path)
+                stats.append(file_stats)
+                for row in importer.read_rows(file_path, reader):
+                    writers[shard_for(row[3], self.shards)].add(
+                        row, file_stats
+                        )
+                for writer in writers:
+                    writer.flush()
+                file_stats["seconds"] = time.perf_counter() - start
+        for conn, writer in zip(self.connections, writers):
+            database.analyze_if_stale(conn, writer.rows)
+        record_rows(sum(file_stats["rows"] for file_stats in stats))
+        if verbose:
+            importer.print_import_stats(stats)
+        return stats
+
+    def _iter_shard(self, shard_no, where, values, page_size):
+        """Résultats d'une partition avec leur id global, lus par pages
+        (pagination sur l'id) : la page suivante est demandée dès
+        réception de la précédente"""
+        conn = self.connections[shard_no]
+        future = self._executor.submit(
+            database.fetch_page, conn, where, values, page_size
+            )
+        while future is not None:
+            rows, after_id = future.result()
+            future = None
+            if after_id is not None:
+                future = self._executor.submit(
+                    database.fetch_page, conn, where, values, page_size,
+                    after_id
+                    )
+            for row in rows:
+                yield (encode_id(shard_no, row[0]),) + row[1:]
+
+    def iter_search_results(self, search_criteria, page_size=PAGE_SIZE):
+        """Résultats de toutes les partitions concernées, avec leur id
+        global, fusionnés dans l'ordre des id. Chaque partition est lue
+        par pages de page_size lignes : la mémoire ne dépend pas du nombre
+        de résultats."""
+        categories = _exact_categories(search_criteria)
+        shard_numbers = range(self.shards)
+        if categories:
+            shard_numbers = sorted(
+                {shard_for(category, self.shards) for category in categories}
+                )
+        filters = self._fan_out(
+            lambda shard_no, conn: search.build_search_filter(
+                conn, search_criteria
+                ),
+            shard_numbers
+            )
+        # L'ordre des id locaux donne celui des id globaux
+        return heapq.merge(*[
+            self._iter_shard(shard_no, where, values, page_size)
+            for shard_no, (where, values) in zip(shard_numbers, filters)
+        ])
+
+    @instrumented
+    def search_products(self, search_criteria, emit=print):
+        """Comme search.search_products, sur toutes les partitions"""
+        count = 0
+        for row in self.iter_search_results(search_criteria):
+            emit(row)
+            count += 1
+        record_rows(count)
+        return count
+
+    @instrumented
+    def generate_summary_report(self, output_file):
+        """Rapport récapitulatif au même format qu'en mode mono-fichier.
+        Une catégorie n'étant que dans une partition, les lignes de chaque
+        partition sont fusionnées sans être additionnées."""
+        header, build_query = report.REPORTS["summary"]
+
+        def summarize(shard_no, conn):
+            query, values = build_query(conn, {})
+            return conn.execute(query, values).fetchall()
+
+        rows = list(heapq.merge(*self._fan_out(summarize)))
+        with open(output_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        record_rows(len(rows))
+        return len(rows)
@@ -0,0 +1,204 @@
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+from app.database import log_full_copy, rebuild_category_summary
+from app.instrumentation import instrumented, record_rows
+
+# Format d'un instantané :
+#   MAGIC, puis des blocs d'au plus SNAPSHOT_BLOCK_ROWS lignes, puis un
+#   bloc vide qui marque la fin du fichier.
+# Chaque bloc commence par BLOCK_HEADER (nombre de lignes, nombre de
+# nouvelles catégories) suivi des colonnes, chacune compressée par zlib et
+# précédée de sa longueur (COLUMN_HEADER) :
+#   - catégories apparues dans le bloc : longueurs, puis texte concaténé
+#   - id : écarts avec l'id précédent (entiers 64 bits)
+#   - name : longueurs, puis texte concaténé
+#   - quantity : entiers 64 bits
+#   - price : flottants 64 bits
+#   - category : numéro dans le dictionnaire des catégories
+# Les tableaux sont écrits en petit-boutiste.
+MAGIC = b"INVSNAP\x01"
+BLOCK_HEADER = struct.Struct("<II")
+COLUMN_HEADER = struct.Struct("<I")
+SNAPSHOT_BLOCK_ROWS = 65536
+SNAPSHOT_COMPRESSION = 6
+
+
+def _to_bytes(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _write_column(f, data):
+    data = zlib.compress(data, SNAPSHOT_COMPRESSION)
+    f.write(COLUMN_HEADER.pack(len(data)))
+    f.write(data)
+
+
+def _read_column(f):
+    (size,) = COLUMN_HEADER.unpack(f.read(COLUMN_HEADER.size))
+    return zlib.decompress(f.read(size))
+
+
+def _write_strings(f, strings):
+    _write_column(f, _to_bytes(array("I", map(len, strings))))
+    _write_column(f, "".join(strings).encode("utf-8"))
+
+
+def _read_strings(f):
+    lengths = _from_bytes("I", _read_column(f))
+    text = _read_column(f).decode("utf-8")
+    ends = list(accumulate(lengths))
+    return [text[end - length:end] for end, length in zip(ends, lengths)]
+
+
+def _write_block(f, rows, codes, last_id):
+    """Écrit un bloc de lignes ; codes (catégorie -> numéro) est complété
+    des catégories nouvelles. Retourne le dernier id écrit."""
+    new_categories = []
+    ids = array("q")
+    names = []
+    quantities = array("q")
+    prices = array("d")
+    categories = array("I")
+    try:
+        for item_id, name, quantity, price, category in rows:
+            ids.append(item_id - last_id)
+            last_id = item_id
+            names.append(name)
+            quantities.append(quantity)
+            prices.append(price)
+            code = codes.get(category)
+            if code is None:
+                code = codes[category] = len(codes)
+                new_categories.append(category)
+            categories.append(code)
+    except TypeError:
+        raise ValueError(
+            f"Valeur manquante dans le produit {item_id} : l'instantané"
+            " n'accepte pas les valeurs NULL."
+            ) from None
+    f.write(BLOCK_HEADER.pack(len(ids), len(new_categories)))
+    _write_strings(f, new_categories)
+    _write_column(f, _to_bytes(ids))
+    _write_strings(f, names)
+    _write_column(f, _to_bytes(quantities))
+    _write_column(f, _to_bytes(prices))
+    _write_column(f, _to_bytes(categories))
+    return last_id
+
+
+@instrumented
+def write_snapshot(db_conn, path, block_rows=SNAPSHOT_BLOCK_ROWS):
+    """Écrit la table inventory dans un instantané en colonnes, bloc par
+    bloc ; retourne le nombre de produits écrits"""
+    cursor = db_conn.cursor()
+    cursor.execute(
+        "SELECT id, name, quantity, price, category FROM inventory"
+        " ORDER BY id"
+        )
+    codes = {}
+    last_id = 0
+    count = 0
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        while True:
+            rows = cursor.fetchmany(block_rows)
+            if not rows:
+                break
+            last_id = _write_block(f, rows, codes, last_id)
+            count += len(rows)
+        f.write(BLOCK_HEADER.pack(0, 0))
+    record_rows(count)
+    return count
+
+
+def iter_snapshot(path):
+    """Générateur sur les blocs d'un instantané, chacun sous forme de
+    liste de lignes (id, name, quantity, price, category)"""
+    categories = []
+    last_id = 0
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} n'est pas un instantané d'inventaire.")
+        while True:
+            header = f.read(BLOCK_HEADER.size)
+            if len(header) < BLOCK_HEADER.size:
+                raise ValueError(f"Instantané tronqué : {path}")
+            rows, _ = BLOCK_HEADER.unpack(header)
+            if rows == 0:
+                return
+            categories.extend(_read_strings(f))
+            ids = list(accumulate(_from_bytes("q", _read_column(f)),
+                                  initial=last_id))[1:]
+            last_id = ids[-1]
+            names = _read_strings(f)
+            quantities = _from_bytes("q", _read_column(f))
+            prices = _from_bytes("d", _read_column(f))
+            codes = _from_bytes("I", _read_column(f))
+            yield list(zip(ids, names, quantities, prices,
+                           map(categories.__getitem__, codes)))
+
+
+@instrumented
+def load_snapshot(db_conn, path):
+    """Remplace le contenu de inventory par celui de l'instantané, en une
+    transaction. Les triggers de inventory sont suspendus pendant le
+    chargement, puis l'index plein texte et le récapitulatif par catégorie
+    sont reconstruits en une passe ; le journal des modifications reçoit
+    une copie complète (les répliques repartent de zéro). Retourne le
+    nombre de produits."""
+    cursor = db_conn.cursor()
+    cursor.execute(
+        "SELECT name, sql FROM sqlite_master"
+        " WHERE type = 'trigger' AND tbl_name = 'inventory'"
+        )
+    triggers = cursor.fetchall()
+    db_conn.commit()
+    count = 0
+    try:
+        cursor.execute("BEGIN")
+        for name, _ in triggers:
+            cursor.execute(f'DROP TRIGGER "{name}"')
+        cursor.execute("DELETE FROM inventory")
+        for rows in iter_snapshot(path):
+            cursor.executemany(
+                "INSERT INTO inventory (id, name, quantity, price, category)"
+                " VALUES (?, ?, ?, ?, ?)", rows
+                )
+            count += len(rows)
+        for _, sql in triggers:
+            cursor.execute(sql)
+        cursor.execute(
+            "SELECT name FROM sqlite_master"
+            " WHERE name IN ('inventory_fts', 'category_summary',"
+            " 'change_log')"
+            )
+        tables = {name for (name,) in cursor.fetchall()}
+        if "inventory_fts" in tables:
+            cursor.execute(
+                "INSERT INTO inventory_fts (inventory_fts) VALUES ('rebuild')"
+                )
+        if "category_summary" in tables:
+            rebuild_category_summary(cursor)
+        if "change_log" in tables:
+            log_full_copy(cursor)
+        db_conn.commit()
+    except Exception:
+        db_conn.rollback()
+        raise
+    record_rows(count)
+    return count
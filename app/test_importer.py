@@ -2,16 +2,49 @@ import unittest
 from unittest.mock import patch
 import os
 import io
+import tempfile
 import sqlite3
+import asyncio
 import csv
-
-from importer import import_csv_files
-from database import (
+import gzip
+import json
+import threading
+import gc
+
+from app.importer import (
+    import_csv_files, import_csv_files_parallel, ImportCancelled,
+    ImportAborted, _iter_mmap_rows
+)
+from app.database import (
     initialize_database, display_all_data,
-    delete_item_by_id, add_product
+    delete_item_by_id, add_product, fetch_page, active_pragmas,
+    delete_items, update_items, analyze_inventory, analyze_if_stale,
+    create_change_log, rebuild_category_summary, InventoryConnection,
+    deduplicate_inventory
+)
+from app.search import (
+    search_products, has_fts_index, search_page, iter_search_results,
+    build_search_filter, search_cache_stats, clear_search_cache,
+    column_selectivity
+)
+from app.report import (
+    generate_summary_report, check_category_summary, write_report,
+    SUMMARY_QUERY, MATERIALIZED_SUMMARY_QUERY
 )
-from search import search_products
-from report import generate_summary_report
+from app.pool import ConnectionPool
+from app.snapshot import write_snapshot, load_snapshot
+from app.sharding import ShardedInventory, decode_id
+from app import analytics
+from app.analytics import InventoryColumns
+from app.replication import (
+    enable_change_log, open_replica, replicate, replication_lag,
+    prune_change_log, ReplicationGap, has_change_log
+)
+from app.aio import AsyncInventory
+from app.instrumentation import (
+    enable, disable, get_stats, reset_stats
+)
+import main
 
 
 class TestImporter(unittest.TestCase):
@@ -60,6 +93,26 @@ class TestImporter(unittest.TestCase):
         # Le test passera si la table 'inventory' existe
         self.assertIsNotNone(result, "La table 'inventory' n'a pas été créée.")
 
+    def test_initialize_database_profile(self):
+        """Test de l'application d'un profil de performance"""
+        db_path = "test_profile.db"
+        conn = initialize_database(db_path, profile="performance")
+        try:
+            pragmas = active_pragmas(conn)
+            self.assertEqual(conn.pragmas, pragmas)
+            self.assertEqual(pragmas["journal_mode"], "wal")
+            self.assertEqual(pragmas["synchronous"], 1)  # NORMAL
+            self.assertEqual(pragmas["temp_store"], 2)  # MEMORY
+            self.assertEqual(pragmas["page_size"], 8192)
+        finally:
+            conn.close()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+        with self.assertRaises(ValueError):
+            initialize_database(":memory:", profile="inconnu")
+
     def test_import_csv_files(self):
         """Test d'importation des fichiers CSV"""
         test_data = (
@@ -84,6 +137,348 @@ class TestImporter(unittest.TestCase):
 
         os.remove("test.csv")
 
+    def test_import_csv_files_batches(self):
+        """Test de l'importation par lots avec statistiques par fichier"""
+        with open("test.csv", "w") as f:
+            f.write("name,quantity,price,category\n")
+            for i in range(25):
+                f.write(f"Item{i},{i},0.5,Fruit\n")
+
+        with patch('sys.stdout', new_callable=io.StringIO):
+            stats = import_csv_files(
+                ["test.csv"], self.conn, batch_size=4, commit_every=10
+                )
+        os.remove("test.csv")
+
+        # Une entrée par fichier avec le nombre de lignes importées
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]["file"], "test.csv")
+        self.assertEqual(stats[0]["rows"], 25)
+        self.cursor.execute("SELECT COUNT(*) FROM inventory")
+        self.assertEqual(self.cursor.fetchone()[0], 25)
+
+    def test_import_csv_files_mmap_reader(self):
+        """Test du lecteur projeté en mémoire, y compris le repli sur le
+        module csv lorsque des guillemets apparaissent"""
+        with open("test.csv", "w", newline="") as f:
+            f.write("category,name,price,quantity\r\n")
+            for i in range(30):
+                f.write(f"Fruit,Item{i},0.5,{i}\r\n")
+            f.write('Fruit,"Melon, jaune",2.0,3\r\n')
+            f.write("\r\n")
+            f.write("Fruit,Last,1.0,1\r\n")
+
+        try:
+            rows = list(_iter_mmap_rows("test.csv", chunk_size=64))
+            stats = import_csv_files(
+                ["test.csv"], self.conn, verbose=False, reader="mmap"
+                )
+        finally:
+            os.remove("test.csv")
+
+        # Colonnes lues par position, dans l'ordre de l'en-tête
+        self.assertEqual(len(rows), 32)
+        self.assertEqual(rows[0], ("Item0", 0, 0.5, "Fruit"))
+        self.assertEqual(rows[30], ("Melon, jaune", 3, 2.0, "Fruit"))
+        self.assertEqual(rows[31], ("Last", 1, 1.0, "Fruit"))
+        self.assertEqual(stats[0]["rows"], 32)
+
+        with open("test.csv", "w") as f:
+            f.write("name,quantity,category\nApple,1,Fruit\n")
+        try:
+            with self.assertRaises(ValueError):
+                import_csv_files(
+                    ["test.csv"], self.conn, verbose=False, reader="mmap"
+                    )
+        finally:
+            os.remove("test.csv")
+
+    def test_import_csv_files_parallel(self):
+        """Test de l'importation parallèle découpée en tranches"""
+        with open("test.csv", "w") as f:
+            f.write("name,quantity,price,category\n")
+            for i in range(200):
+                f.write(f"Item{i},{i},0.5,Fruit\n")
+
+        # Des tranches minuscules forcent le découpage sur plusieurs processus
+        with patch('sys.stdout', new_callable=io.StringIO):
+            stats = import_csv_files_parallel(
+                ["test.csv"], self.conn, workers=2, shard_size=256
+                )
+        os.remove("test.csv")
+
+        self.assertEqual(stats[0]["rows"], 200)
+        self.cursor.execute("SELECT name, quantity FROM inventory ORDER BY id")
+        rows = self.cursor.fetchall()
+        self.assertEqual(rows, [(f"Item{i}", i) for i in range(200)])
+
+    def test_import_csv_files_parallel_multiline_fields(self):
+        """Test du découpage en tranches d'un fichier dont des champs entre
+        guillemets contiennent des fins de ligne"""
+        with open("test.csv", "w", newline="") as f:
+            f.write("name,quantity,price,category\n")
+            for i in range(40):
+                f.write(f'"Item\n{i}, ""{"x" * i}""",{i},0.5,Fruit\n')
+
+        with patch('sys.stdout', new_callable=io.StringIO):
+            stats = import_csv_files_parallel(
+                ["test.csv"], self.conn, workers=2, shard_size=64
+                )
+        os.remove("test.csv")
+
+        self.assertEqual(stats[0]["rows"], 40)
+        self.cursor.execute("SELECT name, quantity FROM inventory ORDER BY id")
+        self.assertEqual(
+            self.cursor.fetchall(),
+            [(f'Item\n{i}, "{"x" * i}"', i) for i in range(40)]
+            )
+
+    def test_import_csv_files_parallel_invalid_row(self):
+        """Test que l'importation parallèle rejette les valeurs invalides"""
+        with open("test.csv", "w") as f:
+            f.write("name,quantity,price,category\n")
+            for i in range(50):
+                f.write(f"Item{i},{i},0.5,Fruit\n")
+            f.write("Broken,abc,0.5,Fruit\n")
+
+        try:
+            with self.assertRaises(ValueError):
+                import_csv_files_parallel(
+                    ["test.csv"], self.conn, workers=2, shard_size=128,
+                    verbose=False
+                    )
+        finally:
+            os.remove("test.csv")
+
+    def test_import_csv_files_concurrent_writer(self):
+        """Test que l'importation attend le verrou d'écriture (busy
+        timeout) au lieu d'échouer quand une autre connexion écrit"""
+        directory = tempfile.TemporaryDirectory()
+        db_path = os.path.join(directory.name, "concurrent.db")
+        csv_path = os.path.join(directory.name, "concurrent.csv")
+        with open(csv_path, "w") as f:
+            f.write("name,quantity,price,category\n")
+            f.write("Apple,1,1.0,Fruit\n" * 50)
+        conn = initialize_database(db_path, profile="performance")
+        stop = threading.Event()
+
+        def write():
+            other = initialize_database(db_path, profile="performance")
+            while not stop.is_set():
+                add_product(other, "Carrot", 1, 0.5, "Vegetable")
+            other.close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        try:
+            for _ in range(30):
+                import_csv_files([csv_path], conn, verbose=False)
+        finally:
+            stop.set()
+            thread.join()
+            conn.close()
+            directory.cleanup()
+
+    def test_import_csv_files_strict(self):
+        """Test des contrôles stricts : sans quarantaine, ils ne
+        s'appliquent qu'à la demande (strict=True) et font alors échouer
+        (et annuler) l'importation"""
+        for broken in ("Broken,1,inf,Fruit", ",1,0.5,Fruit"):
+            with open("test.csv", "w") as f:
+                f.write("name,quantity,price,category\n")
+                for i in range(50):
+                    f.write(f"Item{i},{i},0.5,Fruit\n")
+                f.write(broken + "\n")
+
+            try:
+                for reader in ("csv", "mmap"):
+                    with self.assertRaisesRegex(ValueError, "ligne 52"):
+                        import_csv_files(["test.csv"], self.conn,
+                                         verbose=False, reader=reader,
+                                         strict=True)
+                with self.assertRaisesRegex(ValueError, "ligne 52"):
+                    import_csv_files_parallel(
+                        ["test.csv"], self.conn, workers=2, shard_size=128,
+                        verbose=False, strict=True
+                        )
+                self.assertFalse(self.conn.in_transaction)
+                self.cursor.execute("SELECT COUNT(*) FROM inventory")
+                self.assertEqual(self.cursor.fetchone()[0], 0)
+
+                # Par défaut, ces lignes sont importées comme auparavant
+                for reader in ("csv", "mmap"):
+                    stats = import_csv_files(["test.csv"], self.conn,
+                                             verbose=False, reader=reader)
+                    self.assertEqual(stats[0]["rows"], 51)
+                stats = import_csv_files_parallel(
+                    ["test.csv"], self.conn, workers=2, shard_size=128,
+                    verbose=False
+                    )
+                self.assertEqual(stats[0]["rows"], 51)
+                self.cursor.execute("DELETE FROM inventory")
+                self.conn.commit()
+            finally:
+                os.remove("test.csv")
+
+    def test_import_csv_files_rejects(self):
+        """Test de la mise en quarantaine des lignes invalides"""
+        with open("test.csv", "w") as f:
+            f.write("name,quantity,price,category\n")
+            for i in range(40):
+                if i in (5, 33):
+                    f.write(f"Broken{i},abc,0.5,Fruit\n")
+                elif i == 20:
+                    f.write(f"Broken{i},1\n")
+                else:
+                    f.write(f"Item{i},{i},0.5,Fruit\n")
+
+        try:
+            for reader in ("csv", "mmap"):
+                stats = import_csv_files(
+                    ["test.csv"], self.conn, verbose=False, reader=reader,
+                    reject_file="rejects.csv"
+                    )
+                self.assertEqual(stats[0]["rows"], 37)
+                self.assertEqual(stats[0]["rejected"], 3)
+                with open("rejects.csv", "r") as f:
+                    rows = list(csv.reader(f))
+                # Numéros de ligne dans le fichier, en-tête compris
+                self.assertEqual([row[1] for row in rows[1:]],
+                                 ['7', '22', '35'])
+                self.assertEqual(rows[2][3], 'Broken20,1')
+
+            stats = import_csv_files_parallel(
+                ["test.csv"], self.conn, workers=2, shard_size=128,
+                verbose=False, reject_file="rejects.csv"
+                )
+            self.assertEqual(stats[0]["rejected"], 3)
+            with open("rejects.csv", "r") as f:
+                rows = list(csv.reader(f))
+            self.assertEqual([row[1] for row in rows[1:]], ['7', '22', '35'])
+
+            # Au-delà du seuil, l'importation est interrompue et annulée
+            self.cursor.execute("SELECT COUNT(*) FROM inventory")
+            count = self.cursor.fetchone()[0]
+            with self.assertRaises(ImportAborted):
+                import_csv_files(["test.csv"], self.conn, verbose=False,
+                                 max_errors=1)
+            self.cursor.execute("SELECT COUNT(*) FROM inventory")
+            self.assertEqual(self.cursor.fetchone()[0], count)
+        finally:
+            os.remove("test.csv")
+            os.remove("rejects.csv")
+
+    def test_import_csv_files_upsert(self):
+        """Test de l'importation en mode upsert sur (nom, catégorie)"""
+        with open("test.csv", "w") as f:
+            f.write(
+                "name,quantity,price,category\n"
+                "Apple,10,1.2,Fruit\nBanana,20,0.8,Fruit\n"
+                )
+        stats = import_csv_files(
+            ["test.csv"], self.conn, mode="replace", verbose=False
+            )
+        self.assertEqual(stats[0]["inserted"], 2)
+
+        # Réimporter le même fichier ne duplique rien
+        stats = import_csv_files(
+            ["test.csv"], self.conn, mode="replace", verbose=False
+            )
+        self.assertEqual(stats[0]["inserted"], 0)
+        self.assertEqual(stats[0]["unchanged"], 2)
+
+        with open("test.csv", "w") as f:
+            f.write(
+                "name,quantity,price,category\n"
+                "Apple,5,1.2,Fruit\nBanana,0,0.8,Fruit\nKiwi,3,0.5,Fruit\n"
+                )
+        stats = import_csv_files(
+            ["test.csv"], self.conn, mode="add", verbose=False
+            )
+        os.remove("test.csv")
+        self.assertEqual(
+            (stats[0]["inserted"], stats[0]["updated"],
+             stats[0]["unchanged"]),
+            (1, 1, 1)
+            )
+        self.cursor.execute(
+            "SELECT name, quantity FROM inventory ORDER BY name"
+            )
+        self.assertEqual(
+            self.cursor.fetchall(),
+            [("Apple", 15), ("Banana", 20), ("Kiwi", 3)]
+            )
+
+    def test_import_csv_files_replace_then_insert(self):
+        """Test des ajouts simples après un import upsert : la clé (nom,
+        catégorie) n'est pas imposée, l'upsert met à jour le plus récent"""
+        with open("test.csv", "w") as f:
+            f.write("name,quantity,price,category\nApple,10,1.2,Fruit\n")
+        import_csv_files(["test.csv"], self.conn, mode="replace",
+                         verbose=False)
+        stats = import_csv_files(["test.csv"], self.conn, verbose=False)
+        self.assertEqual(stats[0]["inserted"], 1)
+        latest = add_product(self.conn, "Apple", 1, 1.0, "Fruit")
+
+        with open("test.csv", "w") as f:
+            f.write(
+                "name,quantity,price,category\n"
+                "Apple,7,1.5,Fruit\nKiwi,1,0.5,Fruit\nKiwi,2,0.5,Fruit\n"
+                )
+        stats = import_csv_files(["test.csv"], self.conn, mode="add",
+                                 verbose=False)
+        os.remove("test.csv")
+        self.assertEqual(
+            (stats[0]["inserted"], stats[0]["updated"]), (1, 2)
+            )
+        self.cursor.execute(
+            "SELECT id, name, quantity, price FROM inventory ORDER BY id"
+            )
+        rows = self.cursor.fetchall()
+        self.assertEqual([row[2:] for row in rows],
+                         [(10, 1.2), (10, 1.2), (8, 1.5), (3, 0.5)])
+        self.assertEqual(rows[2][0], latest)
+
+    def test_import_csv_files_incremental(self):
+        """Test de l'importation incrémentale des fichiers inchangés"""
+        with open("test.csv", "w") as f:
+            f.write(
+                "name,quantity,price,category\n"
+                "Apple,10,1.2,Fruit\nBanana,20,0.8,Fruit\n"
+                )
+        import_csv_files(["test.csv"], self.conn, incremental=True,
+                         verbose=False)
+
+        # Fichier inchangé : rien n'est réimporté
+        stats = import_csv_files(
+            ["test.csv"], self.conn, incremental=True, verbose=False
+            )
+        self.assertTrue(stats[0]["skipped"])
+        self.assertEqual(stats[0]["rows_skipped"], 2)
+
+        # Fichier modifié : seules les lignes nouvelles sont appliquées
+        with open("test.csv", "w") as f:
+            f.write(
+                "name,quantity,price,category\n"
+                "Apple,10,1.2,Fruit\nBanana,25,0.8,Fruit\n"
+                "Kiwi,3,0.5,Fruit\n"
+                )
+        stats = import_csv_files(
+            ["test.csv"], self.conn, incremental=True, verbose=False,
+            mode="replace"
+            )
+        os.remove("test.csv")
+        self.assertFalse(stats[0]["skipped"])
+        self.assertEqual(stats[0]["rows_skipped"], 1)
+        self.assertEqual(stats[0]["rows"], 2)
+        self.cursor.execute(
+            "SELECT name, quantity FROM inventory ORDER BY name"
+            )
+        self.assertEqual(
+            self.cursor.fetchall(),
+            [("Apple", 10), ("Banana", 25), ("Kiwi", 3)]
+            )
+
     def test_add_product(self):
         """Test de l'ajout d'un produit"""
         # Ajouter un produit à la base de données
@@ -124,6 +519,45 @@ class TestImporter(unittest.TestCase):
         # Le produit ne doit plus exister
         self.assertIsNone(result_after_delete)
 
+    def test_bulk_delete_and_update(self):
+        """Test des suppressions et modifications en masse"""
+        self.cursor.executemany(
+            "INSERT INTO inventory (name, quantity, price, category)"
+            " VALUES (?, ?, ?, ?)",
+            [(f"P{i}", i, 1.0, "Fruit" if i % 2 else "Vegetable")
+             for i in range(1, 21)]
+            )
+        self.conn.commit()
+
+        # Liste d'ID découpée en paquets de trois paramètres
+        self.assertEqual(
+            delete_items(self.conn, item_ids=[1, 2, 3, 4, 99, 2],
+                         chunk_size=3), 4
+            )
+        self.assertEqual(delete_items(self.conn, id_range=(5, 6)), 2)
+        self.assertEqual(
+            delete_items(self.conn, where="category = ?",
+                         values=["Vegetable"], id_range=(7, 10)), 2
+            )
+        self.assertEqual(
+            update_items(self.conn, where="category = ?", values=["Fruit"],
+                         quantity_delta=-1, price_factor=2.0), 7
+            )
+        self.assertEqual(
+            update_items(self.conn, item_ids=[7, 9, 8], quantity=0,
+                         chunk_size=2), 2
+            )
+        self.cursor.execute(
+            "SELECT id, quantity, price FROM inventory ORDER BY id LIMIT 3"
+            )
+        self.assertEqual(self.cursor.fetchall(),
+                         [(7, 0, 2.0), (9, 0, 2.0), (11, 10, 2.0)])
+
+        with self.assertRaises(ValueError):
+            delete_items(self.conn)
+        with self.assertRaises(ValueError):
+            update_items(self.conn, item_ids=[11])
+
     def test_display_all_data(self):
         """Test de l'affichage de toutes les données"""
         # Ajouter des produits à la base de données
@@ -142,6 +576,20 @@ class TestImporter(unittest.TestCase):
             # Vérifier que "Banana" est dans l'affichage
             self.assertIn("Banana", output)
 
+    def test_fetch_page_keyset(self):
+        """Test de la pagination par id avec jeton de page suivante"""
+        for i in range(5):
+            add_product(self.conn, f"Item{i}", i, 1.0, "Fruit")
+
+        rows, token = fetch_page(self.conn, page_size=2)
+        self.assertEqual([row[1] for row in rows], ["Item0", "Item1"])
+        rows, token = fetch_page(self.conn, page_size=2, after_id=token)
+        self.assertEqual([row[1] for row in rows], ["Item2", "Item3"])
+        rows, token = fetch_page(self.conn, page_size=2, after_id=token)
+        self.assertEqual([row[1] for row in rows], ["Item4"])
+        # Dernière page : plus de jeton
+        self.assertIsNone(token)
+
 
 class TestReport(unittest.TestCase):
 
@@ -264,6 +712,106 @@ class TestReport(unittest.TestCase):
             self.assertEqual(rows[1], ['Fruit', '2', '30', '28.0'])
             self.assertEqual(rows[2], ['Vegetable', '1', '30', '15.0'])
 
+    def test_materialized_category_summary(self):
+        """Test du récapitulatif matérialisé tenu à jour par les écritures"""
+        conn = initialize_database(":memory:")
+        add_product(conn, 'Apple', 10, 1.2, 'Fruit')
+        add_product(conn, 'Banana', 20, 0.8, 'Fruit')
+        add_product(conn, 'Carrot', 30, 0.5, 'Vegetable')
+        add_product(conn, 'Leek', 5, 2.0, 'Vegetable')
+        conn.execute("UPDATE inventory SET quantity = 15 WHERE name = 'Leek'")
+        delete_item_by_id(conn, 3)
+
+        generate_summary_report(conn, "test_file.csv")
+        with open("test_file.csv", "r") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[1], ['Fruit', '2', '30', '28.0'])
+        self.assertEqual(rows[2], ['Vegetable', '1', '15', '30.0'])
+        self.assertEqual(check_category_summary(conn), [])
+
+        # Une table faussée est détectée
+        conn.execute("UPDATE category_summary SET total_quantity = 0")
+        self.assertEqual(len(check_category_summary(conn)), 2)
+        conn.close()
+
+    def test_category_summary_after_writes(self):
+        """Test du récapitulatif matérialisé après insertions, suppressions
+        et modifications : valeurs de SUM(price * quantity) sans arrondi au
+        centime, catégories NULL comprises"""
+        conn = initialize_database(":memory:")
+        for i in range(1, 8):
+            add_product(conn, f"Item{i}", 3, 0.1 * i, "Cat")
+        for item_id in range(2, 8):
+            delete_item_by_id(conn, item_id)
+        add_product(conn, "Sans catégorie", 2, 0.7, None)
+        add_product(conn, "Sans catégorie", 2, 0.7, None)
+        update_items(conn, id_range=(1, 1), price_factor=1.1)
+        add_product(conn, "Vis", 3, 0.333, "Hardware")
+        conn.executemany(
+            "INSERT INTO inventory (name, quantity, price, category)"
+            " VALUES (?, 1, 0.004, 'Hardware')",
+            [(f"Écrou{i}",) for i in range(1000)]
+            )
+
+        self.assertEqual(check_category_summary(conn), [])
+        stored = conn.execute(MATERIALIZED_SUMMARY_QUERY).fetchall()
+        live = conn.execute(SUMMARY_QUERY).fetchall()
+        self.assertEqual([row[:3] for row in stored],
+                         [('', 2, 4), ('Cat', 1, 3), ('Hardware', 1001, 1003)])
+        for expected, row in zip([2.8, 0.33, 4.999], stored):
+            self.assertAlmostEqual(row[3], expected)
+        for row, live_row in zip(stored, live):
+            self.assertAlmostEqual(row[3], live_row[3])
+        totals = InventoryColumns(conn).category_totals()
+        self.assertEqual([row[:3] for row in totals],
+                         [row[:3] for row in live])
+
+        # Un écart est signalé, puis corrigé par la reconstruction
+        conn.execute("UPDATE category_summary SET total_value = 4.0"
+                     " WHERE category = 'Hardware'")
+        self.assertEqual([row[0] for row in check_category_summary(conn)],
+                         ['Hardware'])
+        rebuild_category_summary(conn.cursor())
+        self.assertEqual(check_category_summary(conn), [])
+        conn.close()
+
+    def test_write_report_formats(self):
+        """Test des rapports produits en flux, en JSON Lines compressé"""
+        self.cursor.executemany('''
+            INSERT INTO inventory (name, quantity, price, category)
+            VALUES (?, ?, ?, ?)
+        ''', [
+            ('Apple', 10, 1.2, 'Fruit'),
+            ('Banana', 2, 0.8, 'Fruit'),
+            ('Carrot', 30, 0.5, 'Vegetable')
+        ])
+        self.conn.commit()
+
+        path = "test_file.jsonl.gz"
+        try:
+            count = write_report(self.conn, "detail", path, chunk_size=2)
+            with gzip.open(path, "rt") as f:
+                rows = [json.loads(line) for line in f]
+        finally:
+            os.remove(path)
+        self.assertEqual(count, 3)
+        self.assertEqual([row["Name"] for row in rows],
+                         ['Apple', 'Banana', 'Carrot'])
+        self.assertAlmostEqual(rows[0]["Value"], 12.0)
+
+        write_report(self.conn, "low-stock", "test_file.csv", threshold=5)
+        with open("test_file.csv", "r") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual([row[1] for row in rows[1:]], ['Banana'])
+
+        write_report(self.conn, "top-value", "test_file.csv", limit=2)
+        with open("test_file.csv", "r") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual([row[1] for row in rows[1:]], ['Carrot', 'Apple'])
+
+        with self.assertRaises(ValueError):
+            write_report(self.conn, "unknown", "test_file.csv")
+
 
 class TestSearchProducts(unittest.TestCase):
 
@@ -433,5 +981,859 @@ class TestSearchProducts(unittest.TestCase):
             self.assertIn("Broccoli", output)
 
 
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Créer une base initialisée avec les index de recherche"""
+        self.conn = initialize_database(":memory:")
+        for product in [
+            ('Apple', 10, 1.2, 'Fruit'),
+            ('Pineapple', 5, 2.5, 'Fruit'),
+            ('Carrot', 30, 0.5, 'Vegetable'),
+            ('Broccoli', 15, 1.0, 'Vegetable')
+        ]:
+            add_product(self.conn, *product)
+
+    def tearDown(self):
+        """Fermer la connexion après chaque test"""
+        self.conn.close()
+
+    def search(self, criteria):
+        """Retourne la sortie de search_products pour les critères donnés"""
+        with patch('sys.stdout', new_callable=io.StringIO) as captured_output:
+            search_products(self.conn, criteria)
+            return captured_output.getvalue()
+
+    def test_substring_search_uses_fts(self):
+        """Test de la recherche par sous-chaîne via l'index plein texte"""
+        self.assertTrue(has_fts_index(self.conn))
+        output = self.search(["name:APPLE"])
+        self.assertIn("'Apple'", output)
+        self.assertIn("Pineapple", output)
+        self.assertNotIn("Carrot", output)
+
+    def test_typed_operators(self):
+        """Test des comparaisons typées sur les colonnes numériques"""
+        output = self.search(["quantity>10"])
+        self.assertIn("Carrot", output)
+        self.assertIn("Broccoli", output)
+        self.assertNotIn("'Apple'", output)
+        output = self.search(["price<=1.0", "category=Vegetable"])
+        self.assertIn("Carrot", output)
+        self.assertIn("Broccoli", output)
+        self.assertNotIn("Fruit", output)
+        self.assertIn("Pineapple", self.search(["quantity=5"]))
+
+        # L'index B-tree de la colonne est utilisé, sans LIKE
+        where, values = build_search_filter(self.conn, ["quantity>=15"])
+        self.assertEqual((where, values), ("quantity >= ?", [15]))
+        plan = self.conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM inventory WHERE {where}",
+            values
+            ).fetchall()
+        self.assertIn("idx_inventory_quantity", plan[0][3])
+
+    def test_invalid_criteria(self):
+        """Test du refus des colonnes et valeurs invalides"""
+        for criteria in (["nom:Apple"], ["quantity>abc"], ["price^1"],
+                         ["1=1 OR name:x"]):
+            with self.assertRaises(ValueError):
+                build_search_filter(self.conn, criteria)
+
+    def test_criteria_ordered_by_selectivity(self):
+        """Test de l'ordre des conditions selon les statistiques d'ANALYZE"""
+        for i in range(200):
+            add_product(self.conn, f"Item{i}", i, 1.0, "Bulk")
+        analyze_inventory(self.conn)
+        where, values = build_search_filter(
+            self.conn, ["category=Bulk", "name=Item7", "price>0.5"]
+            )
+        # Nom quasi unique d'abord, catégorie peu sélective en dernier
+        self.assertTrue(where.startswith("name = ?"))
+        self.assertEqual(values, ["Item7", 0.5, "Bulk"])
+
+    def test_analyze_if_stale(self):
+        """Test de la relance d'ANALYZE selon la part de lignes écrites et
+        du cache des sélectivités"""
+        self.assertEqual(column_selectivity(self.conn), ())
+        self.assertFalse(analyze_if_stale(self.conn, 0))
+        self.assertTrue(analyze_if_stale(self.conn, 4))
+        selectivity = column_selectivity(self.conn)
+        self.assertEqual(dict(selectivity)["category"], 0.5)
+        self.assertIs(column_selectivity(self.conn), selectivity)
+
+        for i in range(36):
+            add_product(self.conn, f"Item{i}", i, 1.0, f"Cat{i}")
+        # Nouvelles données, statistiques inchangées
+        self.assertEqual(column_selectivity(self.conn), selectivity)
+        self.assertTrue(analyze_if_stale(self.conn, 36))
+        self.assertFalse(analyze_if_stale(self.conn, 3))
+        self.assertTrue(analyze_if_stale(self.conn, 4))
+        self.assertEqual(dict(column_selectivity(self.conn))["category"],
+                         0.025)
+
+    def test_exact_and_prefix_search(self):
+        """Test des recherches exacte et par préfixe"""
+        output = self.search(["name:=Apple"])
+        self.assertIn("Apple", output)
+        self.assertNotIn("Pineapple", output)
+
+        output = self.search(["category:^Veg"])
+        self.assertIn("Carrot", output)
+        self.assertIn("Broccoli", output)
+        self.assertNotIn("Apple", output)
+
+    def test_fts_index_follows_deletions(self):
+        """Test que l'index plein texte suit les suppressions"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id FROM inventory WHERE name = 'Pineapple'")
+        delete_item_by_id(self.conn, cursor.fetchone()[0])
+
+        output = self.search(["name:apple"])
+        self.assertIn("Apple", output)
+        self.assertNotIn("Pineapple", output)
+
+    def test_import_feeds_indexes_in_bulk(self):
+        """Test de l'importation avec triggers d'insertion suspendus : index
+        plein texte et récapitulatif complets, triggers rétablis"""
+        def triggers():
+            return self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+                " ORDER BY name"
+                ).fetchall()
+
+        expected = triggers()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.csv")
+            with open(path, "w") as f:
+                f.write("name,quantity,price,category\n")
+                for i in range(25):
+                    f.write(f"Item{i % 10},{i},0.5,Cat{i % 3}\n")
+            import_csv_files([path], self.conn, batch_size=2,
+                             commit_every=3, verbose=False)
+            # Lignes nouvelles modifiées dans la même transaction
+            with open(path, "a") as f:
+                for i in range(5):
+                    f.write(f"New{i},{i},0.5,Cat{i}\n")
+                    f.write(f"New{i},{i + 10},0.5,Cat{i}\n")
+            import_csv_files([path], self.conn, batch_size=2,
+                             commit_every=3, verbose=False, mode="replace")
+            with open(path, "w") as f:
+                f.write("name,quantity,price,category\nItem1,x,0.5,Cat0\n")
+            with self.assertRaises(ValueError):
+                import_csv_files([path], self.conn, verbose=False)
+        self.assertEqual(triggers(), expected)
+        self.conn.execute(
+            "INSERT INTO inventory_fts (inventory_fts, rank)"
+            " VALUES ('integrity-check', 1)"
+            )
+        self.assertEqual(check_category_summary(self.conn), [])
+        self.assertEqual(len(list(iter_search_results(self.conn,
+                                                      ["name:tem1"]))), 3)
+        rows = list(iter_search_results(self.conn, ["name:ew"]))
+        self.assertEqual([row[2] for row in rows], list(range(10, 15)))
+
+        # Un changement de quantité ne touche pas l'index plein texte
+        self.conn.execute("UPDATE inventory SET quantity = 0")
+        output = self.search(["name:apple"])
+        self.assertIn("'Apple'", output)
+        self.assertIn("Pineapple", output)
+
+    def test_search_cache_invalidated_by_writes(self):
+        """Test du cache des recherches et de son invalidation"""
+        clear_search_cache()
+        before = search_cache_stats()
+        self.search(["category:Fruit", "name:apple"])
+        # Même critères dans un autre ordre : servis par le cache
+        output = self.search(["name:apple", "category:Fruit"])
+        stats = search_cache_stats()
+        self.assertEqual(stats["hits"] - before["hits"], 1)
+        self.assertIn("Pineapple", output)
+
+        add_product(self.conn, "Custard apple", 2, 3.0, "Fruit")
+        output = self.search(["category:Fruit", "name:apple"])
+        self.assertIn("Custard apple", output)
+        self.assertEqual(
+            search_cache_stats()["invalidations"] - before["invalidations"],
+            1
+            )
+
+    def test_search_page(self):
+        """Test de la pagination des résultats de recherche, lus en base
+        puis dans le cache rempli par search_products"""
+        clear_search_cache()
+        for cached in (False, True):
+            before = search_cache_stats()
+            rows, token = search_page(
+                self.conn, ["category:Fruit"], page_size=1
+                )
+            self.assertEqual(rows[0][1], "Apple")
+            rows, token = search_page(
+                self.conn, ["category:Fruit"], page_size=1, after_id=token
+                )
+            self.assertEqual(rows[0][1], "Pineapple")
+            self.assertIsNone(token)
+            stats = search_cache_stats()
+            self.assertEqual(stats["hits"] - before["hits"], 2 * cached)
+            # Une page lue en base n'alimente pas le cache
+            self.assertEqual(stats["entries"], int(cached))
+            self.search(["category:Fruit"])
+
+    def test_search_cache_per_connection(self):
+        """Test que le cache ne retient pas les connexions et oublie les
+        résultats d'une connexion libérée"""
+        clear_search_cache()
+        conn = initialize_database(":memory:")
+        add_product(conn, "Apple", 1, 1.0, "Fruit")
+        with patch('sys.stdout', new_callable=io.StringIO):
+            search_products(conn, ["name:apple"])
+        self.search(["name:apple"])
+        self.assertEqual(search_cache_stats()["entries"], 2)
+        conn.close()
+        del conn
+        self.search(["category:Fruit"])
+        self.assertEqual(search_cache_stats()["entries"], 2)
+
+        # Une sqlite3.Connection simple est servie sans cache
+        plain = sqlite3.connect(":memory:")
+        plain.execute(
+            "CREATE TABLE inventory (id INTEGER PRIMARY KEY, name TEXT,"
+            " quantity INTEGER, price REAL, category TEXT)"
+            )
+        with patch('sys.stdout', new_callable=io.StringIO):
+            self.assertEqual(search_products(plain, ["name:apple"]), 0)
+        self.assertEqual(search_cache_stats()["entries"], 2)
+        plain.close()
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        """Créer une base source et une base cible en mémoire"""
+        self.source = initialize_database(":memory:")
+        self.target = initialize_database(":memory:")
+        self.path = "test_snapshot.snap"
+
+    def tearDown(self):
+        """Fermer les connexions et supprimer l'instantané"""
+        self.source.close()
+        self.target.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_snapshot_round_trip(self):
+        """Test de l'enregistrement puis de la restauration d'un instantané"""
+        for i in range(50):
+            add_product(self.source, f"Produit é{i}", i, i * 0.25,
+                        f"Catégorie{i % 7}")
+        delete_item_by_id(self.source, 10)
+        add_product(self.target, "Ancien", 1, 1.0, "Autre")
+
+        self.assertEqual(
+            write_snapshot(self.source, self.path, block_rows=8), 49
+            )
+        self.assertEqual(load_snapshot(self.target, self.path), 49)
+
+        query = "SELECT * FROM inventory ORDER BY id"
+        self.assertEqual(self.target.execute(query).fetchall(),
+                         self.source.execute(query).fetchall())
+        # Index plein texte, récapitulatif et triggers rétablis
+        self.assertEqual(check_category_summary(self.target), [])
+        self.assertEqual(
+            len(list(iter_search_results(self.target, ["name:uit é4"]))), 11
+            )
+        add_product(self.target, "Nouveau", 1, 1.0, "Autre")
+        self.assertEqual(check_category_summary(self.target), [])
+
+    def test_invalid_snapshot(self):
+        """Test du refus d'un fichier qui n'est pas un instantané"""
+        with open(self.path, "wb") as f:
+            f.write(b"name,quantity\n")
+        with self.assertRaises(ValueError):
+            load_snapshot(self.target, self.path)
+
+
+class TestShardedInventory(unittest.TestCase):
+
+    def setUp(self):
+        """Créer un inventaire réparti dans un répertoire temporaire"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.inventory = ShardedInventory(self.directory.name, shards=3)
+
+    def tearDown(self):
+        """Fermer les partitions et supprimer le répertoire"""
+        self.inventory.close()
+        self.directory.cleanup()
+
+    def test_routing_and_fan_out(self):
+        """Test du routage par catégorie et de la fusion des résultats"""
+        path = os.path.join(self.directory.name, "test.csv")
+        with open(path, "w") as f:
+            f.write("name,quantity,price,category\n")
+            for i in range(60):
+                f.write(f"Item{i},{i},0.5,Cat{i % 6}\n")
+        self.inventory.import_csv_files([path], batch_size=4, verbose=False)
+        item_id = self.inventory.add_product("Apple", 10, 1.2, "Cat0")
+
+        # Une catégorie n'occupe qu'une partition
+        shard_no, _ = decode_id(item_id)
+        rows = list(self.inventory.iter_search_results(["category:=Cat0"]))
+        self.assertEqual(len(rows), 11)
+        self.assertEqual({decode_id(row[0])[0] for row in rows}, {shard_no})
+
+        # Résultats de toutes les partitions, dans l'ordre des id globaux
+        rows = list(self.inventory.iter_search_results(["name:Item1"]))
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows, sorted(rows))
+        # Lecture page par page de chaque partition
+        self.assertEqual(
+            list(self.inventory.iter_search_results(["name:Item1"],
+                                                    page_size=2)),
+            rows
+            )
+
+        self.assertEqual(self.inventory.delete_item_by_id(item_id), 1)
+        self.assertEqual(self.inventory.delete_item_by_id(item_id), 0)
+
+        # Même rapport qu'en mode mono-fichier
+        single = initialize_database(":memory:")
+        import_csv_files([path], single, verbose=False)
+        expected = os.path.join(self.directory.name, "single.csv")
+        actual = os.path.join(self.directory.name, "sharded.csv")
+        generate_summary_report(single, expected)
+        single.close()
+        self.inventory.generate_summary_report(actual)
+        with open(expected) as f1, open(actual) as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    def test_chunked_commits(self):
+        """Test des commits intermédiaires : une erreur n'annule que les
+        lignes non encore validées de chaque partition"""
+        path = os.path.join(self.directory.name, "test.csv")
+        with open(path, "w") as f:
+            f.write("name,quantity,price,category\n")
+            for i in range(60):
+                f.write(f"Item{i},{i},0.5,Cat{i % 6}\n")
+            f.write("Bad,x,0.5,Cat0\n")
+        with self.assertRaises(ValueError):
+            self.inventory.import_csv_files(
+                [path], batch_size=4, commit_every=8, verbose=False
+                )
+        count = sum(
+            conn.execute("SELECT COUNT(*) FROM inventory").fetchone()[0]
+            for conn in self.inventory.connections
+            )
+        self.assertTrue(0 < count < 60)
+        self.assertEqual(count % 4, 0)
+
+    def test_layout_mismatch(self):
+        """Test du refus d'un nombre de partitions différent"""
+        with self.assertRaises(ValueError):
+            ShardedInventory(self.directory.name, shards=4)
+
+
+class TestAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        """Créer une base en mémoire avec quelques produits"""
+        self.conn = initialize_database(":memory:")
+        for i in range(1, 21):
+            add_product(self.conn, f"Item{i}", i, i * 0.5, f"Cat{i % 3}")
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Fermer la connexion et supprimer les rapports"""
+        self.conn.close()
+        self.directory.cleanup()
+
+    def both_engines(self):
+        """Exécute le test avec NumPy (s'il est installé) puis sans"""
+        yield "numpy" if analytics.numpy is not None else "python"
+        with patch.object(analytics, "numpy", None):
+            yield "python"
+
+    def test_summary_matches_sql_report(self):
+        """Test du rapport récapitulatif, identique à celui de SQLite"""
+        expected = os.path.join(self.directory.name, "sql.csv")
+        actual = os.path.join(self.directory.name, "analytics.csv")
+        generate_summary_report(self.conn, expected)
+        for engine in self.both_engines():
+            with self.subTest(engine=engine):
+                columns = InventoryColumns(self.conn)
+                self.assertEqual(columns.write_summary_report(actual), 3)
+                with open(expected) as f1, open(actual) as f2:
+                    self.assertEqual(f1.read(), f2.read())
+
+    def test_incremental_refresh(self):
+        """Test de la mise à jour après ajout, puis après suppression"""
+        columns = InventoryColumns(self.conn)
+        self.assertEqual(len(columns), 20)
+        self.assertEqual(columns.refresh(), 0)
+
+        add_product(self.conn, "Nouveau", 3, 2.0, "Cat9")
+        self.assertEqual(columns.refresh(), 1)
+        self.assertEqual(columns.category_totals()[-1], ("Cat9", 1, 3, 6.0))
+
+        delete_item_by_id(self.conn, 5)
+        self.assertEqual(columns.refresh(), 20)
+        self.assertNotIn(5, columns.ids)
+        self.assertEqual(columns.category_totals()[2][:3], ("Cat2", 6, 72))
+
+    def test_statistics(self):
+        """Test des percentiles, du classement et de l'histogramme"""
+        for engine in self.both_engines():
+            with self.subTest(engine=engine):
+                columns = InventoryColumns(self.conn)
+                self.assertEqual(
+                    columns.percentiles("quantity", (0.0, 0.5, 1.0)),
+                    {0.0: 1, 0.5: 10.5, 1.0: 20}
+                    )
+                top = columns.top_by_value(2)
+                self.assertEqual([row[0] for row in top], [20, 19])
+                self.assertEqual(top[0][4:], ("Cat2", 200.0))
+                edges, counts = columns.price_histogram(4)
+                self.assertEqual(len(edges), 5)
+                self.assertEqual(counts, [5, 5, 5, 5])
+                with self.assertRaises(ValueError):
+                    columns.percentiles("name")
+
+
+class TestReplication(unittest.TestCase):
+
+    def setUp(self):
+        """Créer une base source et une réplique en mémoire"""
+        self.source = initialize_database(":memory:")
+        # Journal facultatif, absent d'une base neuve
+        self.assertIsNone(self.source.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'change_log'"
+            ).fetchone())
+        enable_change_log(self.source)
+        self.replica = open_replica(":memory:")
+        self.path = "test_replication.csv"
+
+    def tearDown(self):
+        """Fermer les connexions et supprimer les fichiers de test"""
+        self.source.close()
+        self.replica.close()
+        for path in (self.path, "test_replication.snap"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def assertReplicated(self, replica=None):
+        replica = replica or self.replica
+        for query in ("SELECT * FROM inventory ORDER BY id",
+                      "SELECT * FROM category_summary ORDER BY category"):
+            self.assertEqual(replica.execute(query).fetchall(),
+                             self.source.execute(query).fetchall())
+
+    def log_size(self):
+        return self.source.execute(
+            "SELECT COUNT(*) FROM change_log"
+            ).fetchone()[0]
+
+    def test_lag_is_read_only(self):
+        """Test que le retard d'une source sans journal est signalé sans
+        activer le journal"""
+        source = initialize_database(":memory:")
+        add_product(source, "Apple", 10, 1.2, "Fruit")
+        self.assertIsNone(replication_lag(source, self.replica))
+        self.assertFalse(has_change_log(source))
+        replicate(source, self.replica)
+        self.assertTrue(has_change_log(source))
+        self.assertEqual(replication_lag(source, self.replica), (0, 0.0))
+        source.close()
+
+    def test_every_write_path_is_replicated(self):
+        """Test de la réplication des ajouts, imports, modifications et
+        suppressions, par lots"""
+        with open(self.path, "w") as f:
+            f.write("name,quantity,price,category\n")
+            for i in range(30):
+                f.write(f"Item{i},{i},1.5,Cat{i % 4}\n")
+        import_csv_files([self.path], self.source, verbose=False)
+        add_product(self.source, "Apple", 10, 1.2, "Fruits")
+        update_items(self.source, id_range=(1, 10), quantity_delta=5)
+        delete_item_by_id(self.source, 3)
+        delete_items(self.source, where="category = ?", values=["Cat2"])
+        self.assertEqual(replication_lag(self.source, self.replica)[0], 48)
+
+        stats = replicate(self.source, self.replica, batch_size=7)
+        self.assertEqual((stats["applied"], stats["batches"]), (48, 7))
+        self.assertEqual((stats["remaining"], stats["pruned"]), (0, 48))
+        self.assertEqual(self.log_size(), 0)
+        self.assertReplicated()
+        self.assertEqual(replicate(self.source, self.replica)["applied"], 0)
+        # La réplique ne journalise pas ce qu'elle applique
+        self.assertIsNone(self.replica.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'change_log'"
+            ).fetchone())
+
+    def test_resume_and_prune(self):
+        """Test de la reprise après une réplication partielle, de la purge
+        des entrées appliquées par toutes les répliques, de la copie
+        initiale d'une réplique tardive et du refus d'un journal purgé"""
+        for i in range(10):
+            add_product(self.source, f"Item{i}", i, 1.0, "Cat")
+        stats = replicate(self.source, self.replica, max_changes=4,
+                          prune=False)
+        self.assertEqual((stats["last_seq"], stats["remaining"]), (4, 6))
+        self.assertEqual(stats["pruned"], 0)
+        stats = replicate(self.source, self.replica)
+        self.assertEqual(stats["pruned"], 10)
+        self.assertReplicated()
+
+        # Réplique tardive : début du journal purgé, copie de l'inventaire
+        late = open_replica(":memory:")
+        add_product(self.source, "Nouveau", 1, 1.0, "Cat")
+        stats = replicate(self.source, late)
+        self.assertEqual((stats["copied"], stats["applied"]), (11, 0))
+        self.assertEqual(stats["last_seq"], 11)
+        self.assertReplicated(late)
+        # L'entrée 11 attend la première réplique
+        self.assertEqual((stats["pruned"], self.log_size()), (0, 1))
+        self.assertEqual(replicate(self.source, self.replica)["pruned"], 1)
+        self.assertReplicated()
+
+        add_product(self.source, "Perdu", 1, 1.0, "Cat")
+        self.assertEqual(prune_change_log(self.source, 12), 1)
+        with self.assertRaises(ReplicationGap):
+            replicate(self.source, late)
+        late.close()
+
+    def test_existing_inventory_and_snapshot(self):
+        """Test du journal d'une base existante et du chargement d'un
+        instantané, qui repartent d'une copie complète"""
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE inventory (id INTEGER PRIMARY KEY,"
+                     " name TEXT, quantity INTEGER, price REAL,"
+                     " category TEXT)")
+        conn.execute("INSERT INTO inventory VALUES (7, 'Old', 1, 2.0, 'A')")
+        create_change_log(conn.cursor())
+        self.assertEqual(
+            conn.execute("SELECT op, item_id FROM change_log").fetchall(),
+            [("R", None), ("I", 7)]
+            )
+        conn.close()
+
+        for i in range(5):
+            add_product(self.source, f"Item{i}", i, 1.0, "Cat")
+        replicate(self.source, self.replica)
+        write_snapshot(self.source, "test_replication.snap")
+        delete_item_by_id(self.source, 1)
+        add_product(self.source, "Autre", 1, 1.0, "Cat")
+        load_snapshot(self.source, "test_replication.snap")
+        add_product(self.source, "Après", 2, 3.0, "Cat")
+        replicate(self.source, self.replica)
+        self.assertReplicated()
+
+
+class TestAsyncInventory(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Créer un fichier CSV et une base temporaire sur disque"""
+        self.db_path = "test_aio.db"
+        self.csv_path = "test_aio.csv"
+        with open(self.csv_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "quantity", "price", "category"])
+            for i in range(5000):
+                writer.writerow([f"P{i}", i, 1.5, f"C{i % 10}"])
+
+    def tearDown(self):
+        """Supprimer les fichiers temporaires"""
+        for path in (self.csv_path, self.db_path, self.db_path + "-wal",
+                     self.db_path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def test_operations(self):
+        """Test des opérations asynchrones et de l'itération des résultats"""
+        async with AsyncInventory(self.db_path) as inventory:
+            stats = await inventory.import_csv_files([self.csv_path])
+            self.assertEqual(stats[0]["rows"], 5000)
+            rows = [row async for row in inventory.iter_search(
+                ["category:=C3"], page_size=100)]
+            self.assertEqual(len(rows), 500)
+            self.assertEqual(rows[0][1], "P3")
+            await inventory.add_product("Kiwi", 1, 0.5, "Fruit")
+            self.assertEqual(len(await inventory.search(["name:Kiwi"])), 1)
+            self.assertEqual(
+                await inventory.delete_items(where="category = 'C3'"), 500
+                )
+
+    async def test_concurrent_reads(self):
+        """Test des lectures parallèles, au plus une connexion de lecture
+        par thread de lecture"""
+        async with AsyncInventory(self.db_path, readers=2) as inventory:
+            await inventory.import_csv_files([self.csv_path])
+            results = await asyncio.gather(*(
+                inventory.search([f"category:=C{i}"]) for i in range(10)
+                ))
+            self.assertEqual([len(rows) for rows in results], [500] * 10)
+            self.assertLessEqual(inventory._pool.reader_count(), 2)
+
+    async def test_close_does_not_block_loop(self):
+        """Test que la fermeture attend les lectures en cours sans bloquer
+        la boucle d'événements"""
+        inventory = await AsyncInventory(self.db_path).open()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_read(conn):
+            started.set()
+            release.wait(5)
+
+        read = inventory._read(slow_read)
+        await asyncio.to_thread(started.wait, 5)
+        closing = asyncio.create_task(inventory.close())
+        # La boucle reste disponible pendant que close() attend la lecture
+        await asyncio.sleep(0.05)
+        self.assertFalse(closing.done())
+        release.set()
+        await read
+        await closing
+
+    async def test_cancel_import(self):
+        """Test de l'annulation d'une importation en cours"""
+        async with AsyncInventory(self.db_path) as inventory:
+            task = asyncio.create_task(
+                inventory.import_csv_files([self.csv_path])
+                )
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            # Les lignes non validées ont été annulées
+            self.assertEqual(await inventory.search(["name:P1"]), [])
+
+    def test_cancel_event(self):
+        """Test de l'interruption de l'importation par cancel_event"""
+        conn = initialize_database(":memory:")
+        event = threading.Event()
+        event.set()
+        with self.assertRaises(ImportCancelled):
+            import_csv_files([self.csv_path], conn, verbose=False,
+                             cancel_event=event)
+        self.assertEqual(
+            conn.execute("SELECT COUNT(*) FROM inventory").fetchone()[0], 0
+            )
+        conn.close()
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        """Créer un pool sur une base temporaire sur disque"""
+        self.db_path = "test_pool.db"
+        self.pool = ConnectionPool(self.db_path)
+
+    def tearDown(self):
+        """Fermer le pool et supprimer les fichiers de la base"""
+        self.pool.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+
+    def test_reader_per_thread(self):
+        """Test qu'une connexion de lecture distincte est donnée par thread"""
+        connections = []
+
+        def read():
+            with self.pool.reader() as conn:
+                connections.append(conn)
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(conn) for conn in connections}), 3)
+
+    def test_reader_released_with_thread(self):
+        """Test que la connexion de lecture d'un thread terminé est fermée"""
+        def read():
+            with self.pool.reader() as conn:
+                conn.execute("SELECT COUNT(*) FROM inventory").fetchone()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        gc.collect()
+        self.assertEqual(self.pool.reader_count(), 0)
+
+    def test_concurrent_reads_during_write(self):
+        """Test des lectures concurrentes pendant une écriture en cours"""
+        with self.pool.writer() as conn:
+            add_product(conn, "Apple", 10, 1.2, "Fruit")
+
+        results = []
+        with self.pool.writer() as conn:
+            # Écriture non validée : les lecteurs voient l'état précédent
+            conn.execute(
+                "INSERT INTO inventory (name, quantity, price, category)"
+                " VALUES ('Banana', 20, 0.8, 'Fruit')"
+                )
+
+            def read():
+                with self.pool.reader() as reader_conn:
+                    results.append(
+                        list(iter_search_results(reader_conn, ["name:a"]))
+                        )
+
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join()
+        self.assertEqual([row[1] for row in results[0]], ["Apple"])
+
+        with self.pool.reader() as conn:
+            cursor = conn.execute("SELECT COUNT(*) FROM inventory")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+        # Les lecteurs ne peuvent pas écrire
+        with self.pool.reader() as conn:
+            with self.assertRaises(sqlite3.OperationalError):
+                add_product(conn, "Carrot", 30, 0.5, "Vegetable")
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        """Créer une base en mémoire et activer l'instrumentation"""
+        self.conn = initialize_database(":memory:")
+        reset_stats()
+        enable()
+
+    def tearDown(self):
+        """Désactiver l'instrumentation et fermer la connexion"""
+        disable()
+        reset_stats()
+        self.conn.close()
+
+    def test_calls_rows_and_sql_are_recorded(self):
+        """Test de la mesure des appels, lignes et requêtes SQL"""
+        add_product(self.conn, "Apple", 10, 1.2, "Fruit")
+        add_product(self.conn, "Banana", 20, 0.8, "Fruit")
+        with patch('sys.stdout', new_callable=io.StringIO):
+            search_products(self.conn, ["category:Fruit"])
+
+        stats = get_stats()
+        add_stats = next(
+            values for name, values in stats.items()
+            if name.endswith("add_product")
+            )
+        self.assertEqual(add_stats["calls"], 2)
+        self.assertEqual(add_stats["rows"], 2)
+        self.assertGreater(add_stats["sql_statements"], 0)
+        search_stats = next(
+            values for name, values in stats.items()
+            if name.endswith("search_products")
+            )
+        self.assertEqual(search_stats["rows"], 2)
+
+    def test_calls_counted_once(self):
+        """Test qu'un appel n'est compté qu'une fois"""
+        add_product(self.conn, "Apple", 10, 1.2, "Fruit")
+        add_product(self.conn, "Apple", 10, 1.2, "Fruit")
+        deduplicate_inventory(self.conn)
+        stats = next(
+            values for name, values in get_stats().items()
+            if name.endswith("deduplicate_inventory")
+            )
+        self.assertEqual(stats["calls"], 1)
+
+    def test_initialize_database_is_instrumented(self):
+        """Test que l'ouverture de la base est mesurée et retourne bien
+        une InventoryConnection"""
+        conn = initialize_database(":memory:")
+        conn.close()
+        self.assertIsInstance(conn, InventoryConnection)
+        calls = {name.rsplit(".", 1)[-1]: values["calls"]
+                 for name, values in get_stats().items()}
+        self.assertEqual(calls.get("initialize_database"), 1)
+        self.assertNotIn("InventoryConnection", calls)
+
+    def test_disabled_records_nothing(self):
+        """Test qu'aucune mesure n'est prise une fois désactivée"""
+        disable()
+        add_product(self.conn, "Apple", 10, 1.2, "Fruit")
+        self.assertEqual(get_stats(), {})
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        """Créer un répertoire temporaire pour la base"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, "cli.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_main(self, *argv, stdin=""):
+        """Exécute main ; retourne (code de sortie, stdout, stderr)"""
+        with patch('sys.stdin', io.StringIO(stdin)), \
+                patch('sys.stdout', new_callable=io.StringIO) as out, \
+                patch('sys.stderr', new_callable=io.StringIO) as err:
+            try:
+                code = main.main(["--db", self.db_path, *argv])
+            except SystemExit as exit:
+                code = exit.code
+        return code, out.getvalue(), err.getvalue()
+
+    def test_import_from_stdin_and_search(self):
+        """Test de l'importation depuis l'entrée standard et des codes de
+        sortie de la recherche"""
+        code, _, _ = self.run_main(
+            "import", "-", "--quiet",
+            stdin="name,quantity,price,category\n"
+                  "Apple,10,1.2,Fruit\nCarrot,30,0.5,Vegetable\n"
+            )
+        self.assertEqual(code, main.EXIT_OK)
+
+        code, out, _ = self.run_main("search", "--csv", "name=Apple")
+        self.assertEqual(code, main.EXIT_OK)
+        self.assertEqual(out.splitlines()[1], "1,Apple,10,1.2,Fruit")
+        # Critères lus sur l'entrée standard
+        code, out, _ = self.run_main(
+            "search", "-", stdin="category:Vegetable quantity>20\n"
+            )
+        self.assertEqual(code, main.EXIT_OK)
+        self.assertIn("Carrot", out)
+        code, out, _ = self.run_main("search", "name:Banana")
+        self.assertEqual(code, main.EXIT_NOT_FOUND)
+        self.assertEqual(out, "")
+
+    def test_usage_errors(self):
+        """Test que les arguments invalides retournent EXIT_USAGE"""
+        for argv in (
+            ("search", "color:red"),
+            ("search", "quantity>beaucoup"),
+            ("search", "sans-operateur"),
+            ("delete", "--where", "inconnu=1"),
+            ("import", "--mode", "inconnu", "-"),
+            ("search",)
+        ):
+            with self.subTest(argv=argv):
+                code, out, err = self.run_main(*argv)
+                self.assertEqual(code, main.EXIT_USAGE)
+                self.assertEqual(out, "")
+                self.assertTrue(err)
+
+    def test_runtime_errors(self):
+        """Test du code de sortie des erreurs d'exécution"""
+        code, _, err = self.run_main(
+            "import", os.path.join(self.directory.name, "absent.csv")
+            )
+        self.assertEqual(code, main.EXIT_ERROR)
+        self.assertIn("Erreur", err)
+        code, _, _ = self.run_main(
+            "import", "-", "--quiet",
+            stdin="name,quantity,price,category\nApple,abc,1.2,Fruit\n"
+            )
+        self.assertEqual(code, main.EXIT_ERROR)
+        code, out, _ = self.run_main("delete", "-", stdin="1 2\n")
+        self.assertEqual(code, main.EXIT_NOT_FOUND)
+
+
 if __name__ == "__main__":
     unittest.main()
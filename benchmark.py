@@ -0,0 +1,344 @@
+"""Banc d'essai des opérations de l'inventaire.
+
+Exemples :
+    python benchmark.py run --sizes 10000 100000 -o bench.json
+    python benchmark.py compare ancien.json nouveau.json --threshold 0.1
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.database import (
+    initialize_database, display_all_data, delete_item_by_id
+)
+from app.importer import import_csv_files
+from app.report import generate_summary_report
+from app.search import clear_search_cache, search_products
+from app.snapshot import load_snapshot, write_snapshot
+
+# Métriques où une valeur plus grande est une amélioration
+HIGHER_IS_BETTER = ("rows_per_second",)
+
+
+def generate_csv(path, rows, categories, seed=0):
+    """Écrit un fichier d'inventaire synthétique"""
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "quantity", "price", "category"])
+        for i in range(rows):
+            writer.writerow([
+                f"Product{i}",
+                rng.randint(0, 1000),
+                round(rng.uniform(0.1, 100.0), 2),
+                f"Category{rng.randrange(categories)}"
+            ])
+
+
+def percentiles(samples):
+    """Résumé des latences (en ms)"""
+    samples = sorted(samples)
+
+    def pick(fraction):
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": samples[-1]
+    }
+
+
+def measure(fn, repeat=1, setup=None):
+    """Exécute fn repeat fois, sortie standard masquée, après setup (non
+    chronométré) ; retourne les latences (ms)"""
+    latencies = []
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            for i in range(repeat):
+                if setup is not None:
+                    setup(i)
+                start = time.perf_counter()
+                fn(i)
+                latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def peak_memory_kib(fn):
+    """Pic de mémoire allouée par Python (Kio) pendant un appel de fn,
+    mesuré à part avec tracemalloc, qui ralentirait les latences. Le cache
+    de pages de SQLite, alloué en C, n'est pas compté."""
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            tracemalloc.start()
+            try:
+                fn()
+                return tracemalloc.get_traced_memory()[1] // 1024
+            finally:
+                tracemalloc.stop()
+
+
+def on_new_database(fn):
+    """Appelle fn(connexion) sur une base en mémoire neuve, fermée
+    ensuite : une opération qui écrit peut être répétée à l'identique"""
+    db_conn = initialize_database(":memory:")
+    try:
+        fn(db_conn)
+    finally:
+        db_conn.close()
+
+
+def bench_backend(csv_path, rows, categories, backend, workdir, queries,
+                  deletes, seed):
+    """Mesure chaque opération sur une base en mémoire ou sur disque"""
+    if backend == "memory":
+        db_path = ":memory:"
+    else:
+        db_path = os.path.join(workdir, f"bench_{rows}.db")
+    db_conn = initialize_database(db_path)
+    rng = random.Random(seed)
+    results = {}
+    try:
+        latencies = measure(
+            lambda i: import_csv_files([csv_path], db_conn, verbose=False)
+            )
+        results["import"] = {
+            "rows_per_second": rows / (latencies[0] / 1000),
+            "peak_alloc_kib": peak_memory_kib(lambda: on_new_database(
+                lambda conn: import_csv_files([csv_path], conn,
+                                              verbose=False)
+                )),
+            **percentiles(latencies)
+        }
+
+        criteria = [
+            rng.choice([
+                [f"name:Product{rng.randrange(rows)}"],
+                [f"name:=Product{rng.randrange(rows)}"],
+                [f"category:=Category{rng.randrange(categories)}"],
+                [f"name:^Product{rng.randrange(10)}",
+                 f"category:Category{rng.randrange(categories)}"]
+            ])
+            for _ in range(queries)
+        ]
+        # À froid : cache des résultats vidé avant chaque recherche
+        latencies = measure(
+            lambda i: search_products(db_conn, criteria[i]), repeat=queries,
+            setup=lambda i: clear_search_cache()
+            )
+        clear_search_cache()
+        results["search"] = {
+            "peak_alloc_kib": peak_memory_kib(
+                lambda: search_products(db_conn, criteria[0])
+                ),
+            **percentiles(latencies)
+        }
+        # À chaud : les mêmes recherches, toutes en cache
+        measure(lambda i: search_products(db_conn, criteria[i]),
+                repeat=queries)
+        latencies = measure(
+            lambda i: search_products(db_conn, criteria[i]), repeat=queries
+            )
+        results["search_cached"] = percentiles(latencies)
+        clear_search_cache()
+
+        report_path = os.path.join(workdir, "bench_report.csv")
+        latencies = measure(
+            lambda i: generate_summary_report(db_conn, report_path),
+            repeat=5
+            )
+        results["report"] = {
+            "peak_alloc_kib": peak_memory_kib(
+                lambda: generate_summary_report(db_conn, report_path)
+                ),
+            **percentiles(latencies)
+        }
+
+        latencies = measure(lambda i: display_all_data(db_conn))
+        results["display_all_data"] = {
+            "rows_per_second": rows / (latencies[0] / 1000),
+            "peak_alloc_kib": peak_memory_kib(
+                lambda: display_all_data(db_conn)
+                ),
+            **percentiles(latencies)
+        }
+
+        results.update(bench_recovery(db_conn, rows, workdir))
+
+        ids = rng.sample(range(1, rows + 1), min(deletes, rows))
+        latencies = measure(
+            lambda i: delete_item_by_id(db_conn, ids[i]), repeat=len(ids)
+            )
+        results["delete_item_by_id"] = percentiles(latencies)
+    finally:
+        db_conn.close()
+        if backend == "disk":
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+    return results
+
+
+def export_csv(db_conn, path):
+    """Exporte l'inventaire au format d'importation"""
+    cursor = db_conn.execute(
+        "SELECT name, quantity, price, category FROM inventory ORDER BY id"
+        )
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "quantity", "price", "category"])
+        while True:
+            chunk = cursor.fetchmany(10000)
+            if not chunk:
+                break
+            writer.writerows(chunk)
+
+
+def bench_recovery(db_conn, rows, workdir):
+    """Compare la sauvegarde et la restauration par instantané à
+    l'aller-retour par CSV (export puis réimportation)"""
+    results = {}
+    steps = (
+        ("snapshot", "bench.snap", write_snapshot,
+         lambda conn, path: load_snapshot(conn, path)),
+        ("csv", "bench_export.csv", export_csv,
+         lambda conn, path: import_csv_files([path], conn, verbose=False))
+    )
+    for name, filename, save, restore in steps:
+        path = os.path.join(workdir, filename)
+        latencies = measure(lambda i: save(db_conn, path))
+        results[f"{name}_save"] = {
+            "rows_per_second": rows / (latencies[0] / 1000),
+            "bytes": os.path.getsize(path),
+            "peak_alloc_kib": peak_memory_kib(lambda: save(db_conn, path)),
+            **percentiles(latencies)
+        }
+        target = initialize_database(":memory:")
+        try:
+            latencies = measure(lambda i: restore(target, path))
+        finally:
+            target.close()
+        results[f"{name}_restore"] = {
+            "rows_per_second": rows / (latencies[0] / 1000),
+            "peak_alloc_kib": peak_memory_kib(lambda: on_new_database(
+                lambda conn: restore(conn, path)
+                )),
+            **percentiles(latencies)
+        }
+        os.remove(path)
+    return results
+
+
+def command_run(args):
+    report = {
+        "python": sys.version.split()[0],
+        "categories": args.categories,
+        "results": {}
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            csv_path = os.path.join(workdir, f"inventory_{rows}.csv")
+            generate_csv(csv_path, rows, args.categories, args.seed)
+            for backend in args.backends:
+                key = f"{backend}/{rows}"
+                print(f"Mesure {key}...", file=sys.stderr)
+                report["results"][key] = bench_backend(
+                    csv_path, rows, args.categories, backend, workdir,
+                    args.queries, args.deletes, args.seed
+                    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+def compare(old, new, threshold):
+    """Retourne la liste des régressions au-delà du seuil relatif"""
+    regressions = []
+    for key, operations in new["results"].items():
+        for operation, metrics in operations.items():
+            before = old["results"].get(key, {}).get(operation)
+            if before is None:
+                continue
+            for metric in ("p50_ms", "p95_ms", "rows_per_second"):
+                if metric not in metrics or not before.get(metric):
+                    continue
+                change = (metrics[metric] - before[metric]) / before[metric]
+                if metric in HIGHER_IS_BETTER:
+                    change = -change
+                if change > threshold:
+                    regressions.append(
+                        (key, operation, metric, before[metric],
+                         metrics[metric], change)
+                        )
+    return regressions
+
+
+def command_compare(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    regressions = compare(old, new, args.threshold)
+    for key, operation, metric, before, after, change in regressions:
+        print(
+            f"Régression {key} {operation} {metric} :"
+            f" {before:.3f} -> {after:.3f} ({change:+.1%})"
+            )
+    if not regressions:
+        print("Aucune régression au-delà du seuil.")
+    return 1 if regressions else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sub = subparsers.add_parser("run", help="lancer les mesures")
+    sub.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000],
+        help="nombres de lignes (ex. 10000 1000000 10000000)"
+        )
+    sub.add_argument("--categories", type=int, default=20)
+    sub.add_argument(
+        "--backends", nargs="+", choices=("memory", "disk"),
+        default=["memory", "disk"]
+        )
+    sub.add_argument("--queries", type=int, default=50)
+    sub.add_argument("--deletes", type=int, default=200)
+    sub.add_argument("--seed", type=int, default=0)
+    sub.add_argument("-o", "--output", help="fichier JSON de sortie")
+    sub.set_defaults(handler=command_run)
+
+    sub = subparsers.add_parser("compare", help="comparer deux exécutions")
+    sub.add_argument("old")
+    sub.add_argument("new")
+    sub.add_argument(
+        "--threshold", type=float, default=0.10,
+        help="écart relatif toléré (défaut : 10 %%)"
+        )
+    sub.set_defaults(handler=command_compare)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
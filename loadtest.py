@@ -0,0 +1,255 @@
+"""Test de charge du menu interactif par des sessions simultanées.
+
+Chaque session est un processus qui exécute main.run_interactive sur une
+base partagée sur disque, en répondant aux questions du menu selon un
+mélange d'opérations (options 1 à 6).
+
+Exemples :
+    python loadtest.py --sessions 8 --operations 100
+    python loadtest.py --sessions 16 --mix 2:6,6:2,5:1,1:1 -o charge.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+from benchmark import generate_csv, percentiles
+
+# Opérations du menu simulées
+OPERATIONS = {
+    "1": "import",
+    "2": "search",
+    "3": "report",
+    "4": "list",
+    "5": "delete",
+    "6": "add"
+}
+DEFAULT_MIX = "1:1,2:5,3:1,4:2,5:2,6:3"
+# Pages lues avant de répondre "q" lors d'un affichage paginé
+MAX_PAGES = 3
+LOCKED_MESSAGE = "database is locked"
+# Délai laissé au lancement des processus avant le départ commun
+START_DELAY = 1.0
+
+
+def parse_mix(text):
+    """"2:5,6:3" -> {"2": 5, "6": 3}"""
+    mix = {}
+    for part in text.split(","):
+        option, _, weight = part.partition(":")
+        option = option.strip()
+        if option not in OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                f"Option inconnue : {option} (1 à 6)"
+                )
+        mix[option] = int(weight or 1)
+    return mix
+
+
+class ScriptedSession:
+    """Répond aux questions du menu à la place d'un opérateur et mesure
+    chaque opération, de la saisie du choix jusqu'au retour au menu"""
+
+    def __init__(self, session_no, operations, mix, import_path, categories,
+                 max_id, seed):
+        self.session_no = session_no
+        self.remaining = operations
+        self.rng = random.Random(seed)
+        self.options = list(mix)
+        self.weights = list(mix.values())
+        self.import_path = import_path
+        self.categories = categories
+        self.max_id = max_id
+        self.output = io.StringIO()
+        self.current = None
+        self.started = None
+        self.pages = 0
+        self.added = 0
+        self.results = []
+
+    def _finish(self):
+        """Clôt l'opération en cours d'après ce qu'elle a affiché"""
+        if self.current is None:
+            return
+        elapsed = (time.perf_counter() - self.started) * 1000
+        text = self.output.getvalue()
+        if LOCKED_MESSAGE in text:
+            status = "locked"
+        elif "Erreur" in text or "erreur" in text:
+            status = "error"
+        else:
+            status = "ok"
+        self.results.append((OPERATIONS[self.current], elapsed, status))
+        self.current = None
+
+    def input(self, prompt=""):
+        if "numéro de votre choix" in prompt:
+            self._finish()
+            if self.remaining == 0:
+                return "7"
+            self.remaining -= 1
+            self.current = self.rng.choices(self.options, self.weights)[0]
+            self.output.seek(0)
+            self.output.truncate()
+            self.pages = 0
+            self.started = time.perf_counter()
+            return self.current
+        if "fichiers CSV" in prompt:
+            return self.import_path
+        if "critères de recherche" in prompt:
+            return self.rng.choice([
+                f"name:Product{self.rng.randrange(self.max_id)}",
+                f"name=Product{self.rng.randrange(self.max_id)}",
+                f"category={self.rng.choice(self.categories)}",
+                f"quantity>{self.rng.randrange(1000)}"
+            ])
+        if "page suivante" in prompt:
+            self.pages += 1
+            return "" if self.pages < MAX_PAGES else "q"
+        if "à supprimer" in prompt:
+            return str(self.rng.randint(1, self.max_id))
+        if "nom du produit" in prompt:
+            self.added += 1
+            return f"Load{self.session_no}-{self.added}"
+        if "quantité" in prompt:
+            return str(self.rng.randint(0, 100))
+        if "prix" in prompt:
+            return f"{self.rng.uniform(0.1, 50):.2f}"
+        if "catégorie" in prompt:
+            return self.rng.choice(self.categories)
+        raise RuntimeError(f"Question inattendue du menu : {prompt!r}")
+
+
+def run_session(job):
+    """Exécute une session dans un processus ; retourne ses mesures"""
+    (session_no, db_path, profile, workdir, operations, mix, import_rows,
+     categories, max_id, seed, start_at) = job
+    import main
+
+    session_dir = os.path.join(workdir, f"session_{session_no}")
+    os.makedirs(session_dir, exist_ok=True)
+    # Le rapport (option 3) est écrit dans le répertoire courant
+    os.chdir(session_dir)
+    import_path = os.path.join(session_dir, "import.csv")
+    generate_csv(import_path, import_rows, len(categories), seed)
+    session = ScriptedSession(
+        session_no, operations, mix, import_path, categories, max_id, seed
+        )
+    time.sleep(max(0.0, start_at - time.time()))
+    with patch("builtins.input", session.input), \
+            contextlib.redirect_stdout(session.output):
+        main.run_interactive(db_path, profile)
+    return session.results
+
+
+def summarize(results, seconds):
+    """Débit, erreurs et distribution des latences par opération"""
+    operations = {}
+    for operation in sorted({operation for operation, _, _ in results}):
+        samples = [r for r in results if r[0] == operation]
+        operations[operation] = {
+            "ok": sum(status == "ok" for _, _, status in samples),
+            "locked": sum(status == "locked" for _, _, status in samples),
+            "errors": sum(status == "error" for _, _, status in samples),
+            **percentiles([elapsed for _, elapsed, _ in samples])
+        }
+    return {
+        "seconds": seconds,
+        "operations": len(results),
+        "operations_per_second": len(results) / seconds if seconds else 0.0,
+        "locked": sum(values["locked"] for values in operations.values()),
+        "errors": sum(values["errors"] for values in operations.values()),
+        "by_operation": operations
+    }
+
+
+def print_summary(summary, sessions):
+    print(
+        f"{sessions} sessions, {summary['operations']} opérations en"
+        f" {summary['seconds']:.2f} s"
+        f" ({summary['operations_per_second']:.1f} op/s),"
+        f" {summary['locked']} verrous, {summary['errors']} autres erreurs"
+        )
+    print(f"{'opération':<10} {'nb':>6} {'verrous':>8} {'erreurs':>8}"
+          f" {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for operation, values in summary["by_operation"].items():
+        print(
+            f"{operation:<10} {values['count']:>6} {values['locked']:>8}"
+            f" {values['errors']:>8} {values['p50_ms']:>9.2f}"
+            f" {values['p95_ms']:>9.2f} {values['p99_ms']:>9.2f}"
+            f" {values['max_ms']:>9.2f}"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument(
+        "--operations", type=int, default=50,
+        help="opérations par session"
+        )
+    parser.add_argument(
+        "--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+        help=f"poids des options du menu (défaut : {DEFAULT_MIX})"
+        )
+    parser.add_argument(
+        "--rows", type=int, default=10000,
+        help="produits chargés avant le test"
+        )
+    parser.add_argument(
+        "--import-rows", type=int, default=200,
+        help="lignes du fichier importé par l'option 1"
+        )
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--profile", default="performance")
+    parser.add_argument(
+        "--db", help="base à utiliser (défaut : base temporaire)"
+        )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="fichier JSON des résultats")
+    args = parser.parse_args(argv)
+
+    from app.database import initialize_database
+    from app.importer import import_csv_files
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.abspath(args.db or os.path.join(workdir, "load.db"))
+        seed_path = os.path.join(workdir, "seed.csv")
+        generate_csv(seed_path, args.rows, args.categories, args.seed)
+        db_conn = initialize_database(db_path, profile=args.profile)
+        import_csv_files([seed_path], db_conn, verbose=False)
+        db_conn.close()
+
+        categories = [f"Category{i}" for i in range(args.categories)]
+        start_at = time.time() + START_DELAY
+        jobs = [
+            (session_no, db_path, args.profile, workdir, args.operations,
+             args.mix, args.import_rows, categories, args.rows,
+             args.seed + session_no, start_at)
+            for session_no in range(args.sessions)
+        ]
+        results = []
+        with ProcessPoolExecutor(max_workers=args.sessions) as executor:
+            for session_results in executor.map(run_session, jobs):
+                results.extend(session_results)
+        seconds = time.time() - start_at
+
+    summary = summarize(results, seconds)
+    summary["sessions"] = args.sessions
+    print_summary(summary, args.sessions)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+            f.write("\n")
+    return 1 if summary["locked"] or summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,73 @@
-from app.importer import import_csv_files
-from app.database import (
-    initialize_database,
-    display_all_data,
-    delete_item_by_id,
-    add_product
-)
-from app.search import search_products
-from app.report import generate_summary_report
-
-
-def main():
+import importlib
+import sys
+import time
+
+# Codes de sortie du mode non interactif
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2  # argparse, critère de recherche invalide
+EXIT_NOT_FOUND = 3
+
+# Budget de démarrage à froid (en ms) pour les appels scriptés
+STARTUP_BUDGET_MS = 100
+
+# Durée d'importation (en ms) de chaque module chargé à la demande
+_import_times = {}
+
+
+class UsageError(Exception):
+    """Argument invalide détecté après l'analyse de la ligne de commande
+    (critère de recherche) : même code de sortie que les erreurs
+    d'argparse"""
+
+
+def load(module_name):
+    """Importe un module au moment où il sert pour la première fois"""
+    module = sys.modules.get(module_name)
+    if module is None:
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        _import_times[module_name] = (time.perf_counter() - start) * 1000
+    return module
+
+
+def report_startup(startup_ms, budget_ms):
+    """Affiche sur stderr le détail du temps de démarrage"""
+    print("Temps de démarrage :", file=sys.stderr)
+    for module_name, elapsed in _import_times.items():
+        print(f"  {module_name:<20} {elapsed:8.2f} ms", file=sys.stderr)
+    print(f"  {'total':<20} {startup_ms:8.2f} ms", file=sys.stderr)
+    if startup_ms > budget_ms:
+        print(
+            f"Budget de démarrage dépassé ({budget_ms} ms).", file=sys.stderr
+            )
+
+
+def page_through(fetch):
+    """Affiche les résultats page par page ; fetch(after_id) doit retourner
+    (lignes, jeton de la page suivante)"""
+    after_id = None
+    while True:
+        rows, after_id = fetch(after_id)
+        for row in rows:
+            print(row)
+        if after_id is None:
+            return
+        answer = input(
+            "Entrée pour la page suivante, q pour arrêter : "
+            ).strip().lower()
+        if answer == "q":
+            return
+
+
+def run_interactive(db_path="inventory.db", profile="performance",
+                    config_file=None):
+    """Menu interactif historique"""
     print("Bienvenue dans le système de gestion d'inventaire")
-    db_conn = initialize_database()
+    database = load("app.database")
+    db_conn = database.initialize_database(
+        db_path, profile=profile, config_file=config_file
+        )
 
     while True:
         print("\nQue voulez-vous faire ?")
@@ -22,6 +78,7 @@ def main():
         print("5 : Supprimer un article par ID")
         print("6 : Ajouter un produit")
         print("7 : Quitter le programme")
+        print("8 : Vérifier / reconstruire le récapitulatif par catégorie")
         try:
             choice = input("\nEntrez le numéro de votre choix : ").strip()
             #
@@ -35,7 +92,8 @@ def main():
                         ).strip().split()
                     if not file_paths:
                         raise ValueError("Aucun chemin fourni.")
-                    import_csv_files(file_paths, db_conn)
+                    importer = load("app.importer")
+                    importer.import_csv_files_parallel(file_paths, db_conn)
                 except Exception as e:
                     print(f"Erreur lors de l'importation des fichiers : {e}")
             #
@@ -49,7 +107,10 @@ def main():
                         ).strip().split()
                     if not search_criteria:
                         raise ValueError("Aucun critère de recherche fourni.")
-                    search_products(db_conn, search_criteria)
+                    search = load("app.search")
+                    page_through(lambda after_id: search.search_page(
+                        db_conn, search_criteria, after_id=after_id
+                        ))
                 except Exception as e:
                     print(f"Erreur lors de la recherche : {e}")
             #
@@ -57,7 +118,10 @@ def main():
             #
             elif choice == "3":
                 try:
-                    generate_summary_report(db_conn, "summary_report.csv")
+                    report = load("app.report")
+                    report.generate_summary_report(
+                        db_conn, "summary_report.csv"
+                        )
                     print("Rapport récapitulatif généré : summary_report.csv")
                 except Exception as e:
                     print(f"Erreur lors de la génération du rapport : {e}")
@@ -66,7 +130,9 @@ def main():
             #
             elif choice == "4":
                 try:
-                    display_all_data(db_conn)
+                    page_through(lambda after_id: database.fetch_page(
+                        db_conn, after_id=after_id
+                        ))
                 except Exception as e:
                     print(f"Erreur lors de l'affichage des données : {e}")
             #
@@ -79,7 +145,9 @@ def main():
                         ).strip()
                     if not item_id.isdigit():
                         raise ValueError("L'ID doit être un entier.")
-                    rows_deleted = delete_item_by_id(db_conn, int(item_id))
+                    rows_deleted = database.delete_item_by_id(
+                        db_conn, int(item_id)
+                        )
                     if rows_deleted > 0:
                         print(f"L'article avec l'ID {item_id} a été supprimé.")
                     else:
@@ -111,7 +179,9 @@ def main():
                     category = input("Entrez la catégorie : ").strip()
                     if not category:
                         raise ValueError("La catégorie ne peut pas être vide.")
-                    add_product(db_conn, name, quantity, price, category)
+                    database.add_product(
+                        db_conn, name, quantity, price, category
+                        )
                     print(
                         f"Produit ajouté : {name}, quantité : {quantity},"
                         " prix : {price}, catégorie : {category}"
@@ -127,14 +197,632 @@ def main():
                     "Au revoir !"
                     )
                 break
+            #
+            # Huitieme option
+            #
+            elif choice == "8":
+                try:
+                    report = load("app.report")
+                    mismatches = report.check_category_summary(db_conn)
+                    if not mismatches:
+                        print("Le récapitulatif par catégorie est cohérent.")
+                    else:
+                        for category, stored, live in mismatches:
+                            print(
+                                f"Écart pour {category} : stocké {stored},"
+                                f" réel {live}"
+                                )
+                        database.rebuild_category_summary(db_conn.cursor())
+                        db_conn.commit()
+                        print("Récapitulatif par catégorie reconstruit.")
+                except Exception as e:
+                    print(f"Erreur lors de la vérification : {e}")
             else:
                 print(
-                    "Choix invalide. Veuillez entrer un numéro entre 1 et 7."
+                    "Choix invalide. Veuillez entrer un numéro entre 1 et 8."
                     )
+        except EOFError:
+            # Fin de l'entrée standard : rien de plus à lire
+            break
         except Exception as e:
             print(f"Une erreur inattendue est survenue : {e}")
     db_conn.close()
 
 
+def expand_paths(patterns):
+    """Développe les motifs glob ; "-" (entrée standard) est conservé"""
+    import glob
+    file_paths = []
+    for pattern in patterns:
+        if pattern == "-" or not glob.has_magic(pattern):
+            file_paths.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            raise FileNotFoundError(f"Aucun fichier ne correspond à {pattern}")
+        file_paths.extend(matches)
+    return file_paths
+
+
+def read_arguments(values):
+    """Remplace "-" par les valeurs lues sur l'entrée standard"""
+    if values == ["-"]:
+        return sys.stdin.read().split()
+    return values
+
+
+def check_criteria(criteria):
+    """Valide les critères de recherche avant toute requête ; retourne
+    les critères"""
+    search = load("app.search")
+    try:
+        if all(search.parse_criteria(value) is None for value in criteria):
+            raise ValueError(
+                "Aucun critère de recherche valide (ex. name:Apple)."
+                )
+    except ValueError as e:
+        raise UsageError(e) from None
+    return criteria
+
+
+def row_printer(as_csv):
+    """Retourne la fonction d'affichage des lignes : tuples ou CSV
+    (l'en-tête CSV est écrit immédiatement)"""
+    if not as_csv:
+        return print
+    import csv
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["id", "name", "quantity", "price", "category"])
+    return writer.writerow
+
+
+def command_import(args, db_conn):
+    file_paths = expand_paths(args.files)
+    importer = load("app.importer")
+    if args.dedupe:
+        database = load("app.database")
+        removed = database.deduplicate_inventory(db_conn)
+        print(f"{removed} doublons supprimés.")
+    importer.import_csv_files_parallel(
+        file_paths, db_conn, workers=args.workers, verbose=not args.quiet,
+        mode=args.mode, incremental=args.incremental, reader=args.reader,
+        reject_file=args.rejects, max_errors=args.max_errors,
+        strict=args.strict or None
+        )
+    return EXIT_OK
+
+
+def command_search(args, db_conn):
+    criteria = check_criteria(read_arguments(args.criteria))
+    search = load("app.search")
+    found = search.search_products(db_conn, criteria, row_printer(args.csv))
+    if args.cache_stats:
+        print(f"Cache de recherche : {search.search_cache_stats()}",
+              file=sys.stderr)
+    return EXIT_OK if found else EXIT_NOT_FOUND
+
+
+def command_list(args, db_conn):
+    database = load("app.database")
+    database.display_all_data(db_conn, row_printer(args.csv))
+    return EXIT_OK
+
+
+def command_report(args, db_conn):
+    report = load("app.report")
+    if args.check or args.rebuild:
+        mismatches = report.check_category_summary(db_conn)
+        for category, stored, live in mismatches:
+            print(f"Écart pour {category} : stocké {stored}, réel {live}")
+        if args.rebuild:
+            database = load("app.database")
+            database.rebuild_category_summary(db_conn.cursor())
+            db_conn.commit()
+            print("Récapitulatif par catégorie reconstruit.")
+        elif mismatches:
+            return EXIT_ERROR
+    if args.output:
+        count = report.write_report(
+            db_conn, args.type, args.output, fmt=args.format,
+            compress=args.gzip or None, threshold=args.threshold,
+            limit=args.limit
+            )
+        if args.output != "-":
+            print(f"Rapport {args.type} généré : {args.output}"
+                  f" ({count} lignes)")
+    return EXIT_OK
+
+
+def bulk_filter(args, db_conn):
+    """Filtre des opérations en masse : ID, intervalle et critères"""
+    item_ids = read_arguments(args.ids) if args.ids else None
+    if item_ids is not None and not all(
+            item_id.isdigit() for item_id in item_ids):
+        raise ValueError("Les ID doivent être des entiers.")
+    where, values = "", []
+    if args.where:
+        search = load("app.search")
+        where, values = search.build_search_filter(
+            db_conn, check_criteria(args.where)
+            )
+    return {"item_ids": item_ids, "id_range": args.range,
+            "where": where, "values": values}
+
+
+def command_delete(args, db_conn):
+    filters = bulk_filter(args, db_conn)
+    database = load("app.database")
+    count = database.delete_items(db_conn, **filters)
+    print(f"{count} article(s) supprimé(s).")
+    if filters["item_ids"] is not None:
+        missing = len(set(map(int, filters["item_ids"]))) - count
+        if missing > 0:
+            print(f"{missing} ID introuvable(s).")
+            return EXIT_NOT_FOUND
+    return EXIT_OK if count else EXIT_NOT_FOUND
+
+
+def command_update(args, db_conn):
+    filters = bulk_filter(args, db_conn)
+    database = load("app.database")
+    count = database.update_items(
+        db_conn, quantity=args.quantity, quantity_delta=args.add_quantity,
+        price=args.price, price_factor=args.price_factor, **filters
+        )
+    print(f"{count} article(s) modifié(s).")
+    return EXIT_OK if count else EXIT_NOT_FOUND
+
+
+def add_bulk_arguments(sub):
+    sub.add_argument(
+        "ids", nargs="*", help="ID visés, - pour l'entrée standard"
+        )
+    sub.add_argument(
+        "--range", nargs=2, type=int, metavar=("PREMIER", "DERNIER"),
+        help="intervalle d'ID (bornes incluses)"
+        )
+    sub.add_argument(
+        "--where", nargs="+", metavar="CRITERE",
+        help="critères de recherche (ex. category:=Fruits)"
+        )
+
+
+def command_snapshot(args, db_conn):
+    snapshot = load("app.snapshot")
+    start = time.perf_counter()
+    if args.action == "save":
+        count = snapshot.write_snapshot(db_conn, args.path)
+        print(f"{count} produits enregistrés dans {args.path}", end="")
+    else:
+        count = snapshot.load_snapshot(db_conn, args.path)
+        print(f"{count} produits restaurés depuis {args.path}", end="")
+    print(f" en {time.perf_counter() - start:.3f} s.")
+    return EXIT_OK
+
+
+def command_analytics(args, db_conn):
+    analytics = load("app.analytics")
+    columns = analytics.InventoryColumns(db_conn)
+    if args.output:
+        count = columns.write_summary_report(args.output)
+        print(f"Rapport summary généré : {args.output} ({count} lignes)")
+    for column in args.percentiles:
+        values = columns.percentiles(column)
+        print(f"Percentiles {column} : " + ", ".join(
+            f"p{fraction * 100:g} = {value:.2f}"
+            for fraction, value in values.items()
+        ))
+    if args.top:
+        print(f"{args.top} produits de plus grande valeur :")
+        for row in columns.top_by_value(args.top):
+            print(row)
+    if args.histogram:
+        edges, counts = columns.price_histogram(args.histogram)
+        print("Histogramme des prix :")
+        for low, high, count in zip(edges, edges[1:], counts):
+            print(f"{low:>10.2f} - {high:<10.2f} {count}")
+    return EXIT_OK
+
+
+def command_replicate(args, db_conn):
+    replication = load("app.replication")
+    replica_conn = replication.open_replica(
+        args.replica, args.profile, args.config
+        )
+    try:
+        if args.status:
+            lag = replication.replication_lag(db_conn, replica_conn)
+            if lag is None:
+                print(f"Journal des modifications non activé sur {args.db}"
+                      " (activé par la première réplication).")
+                return EXIT_OK
+            pending, seconds = lag
+            print(f"Retard de {args.replica} : {pending} modifications"
+                  f" ({seconds:.1f} s)")
+            return EXIT_OK
+        stats = replication.replicate(
+            db_conn, replica_conn, batch_size=args.batch_size,
+            max_changes=args.max_changes
+            )
+        print(
+            f"Retard initial : {stats['pending']} modifications"
+            f" ({stats['lag_seconds']:.1f} s)"
+            )
+        print(
+            f"{stats['applied']} modifications appliquées en"
+            f" {stats['batches']} lots et {stats['seconds']:.3f} s"
+            f" ({stats['changes_per_second']:.0f} modifications/s),"
+            f" dernière : {stats['last_seq']}, restantes :"
+            f" {stats['remaining']}"
+            )
+        if stats["copied"]:
+            print(f"Réplique initialisée par copie de {stats['copied']}"
+                  " produits (début du journal purgé).")
+        print(f"{stats['pruned']} entrées purgées du journal (appliquées"
+              " par toutes les répliques).")
+    finally:
+        replica_conn.close()
+    return EXIT_OK
+
+
+def command_add(args, db_conn):
+    if not args.name.strip() or not args.category.strip():
+        raise ValueError("Le nom et la catégorie ne peuvent pas être vides.")
+    database = load("app.database")
+    database.add_product(
+        db_conn, args.name, args.quantity, args.price, args.category
+        )
+    print(
+        f"Produit ajouté : {args.name}, quantité : {args.quantity},"
+        f" prix : {args.price}, catégorie : {args.category}"
+        )
+    return EXIT_OK
+
+
+def sharded_import(args, inventory):
+    if args.incremental or args.dedupe or args.rejects or args.max_errors:
+        raise ValueError(
+            "--incremental, --dedupe, --rejects et --max-errors ne sont pas"
+            " disponibles en mode réparti."
+            )
+    inventory.import_csv_files(
+        expand_paths(args.files), verbose=not args.quiet, mode=args.mode,
+        reader=args.reader
+        )
+    return EXIT_OK
+
+
+def sharded_search(args, inventory):
+    criteria = check_criteria(read_arguments(args.criteria))
+    found = inventory.search_products(criteria, row_printer(args.csv))
+    return EXIT_OK if found else EXIT_NOT_FOUND
+
+
+def sharded_report(args, inventory):
+    if (args.type != "summary" or args.check or args.rebuild
+            or args.format == "jsonl" or args.gzip or args.output == "-"):
+        raise ValueError(
+            "Seul le rapport récapitulatif CSV est disponible en mode"
+            " réparti."
+            )
+    inventory.generate_summary_report(args.output)
+    print(f"Rapport récapitulatif généré : {args.output}")
+    return EXIT_OK
+
+
+def sharded_delete(args, inventory):
+    item_ids = read_arguments(args.ids)
+    if args.range or args.where or not item_ids:
+        raise ValueError("Seule la suppression par ID est disponible en mode"
+                         " réparti.")
+    if not all(item_id.isdigit() for item_id in item_ids):
+        raise ValueError("Les ID doivent être des entiers.")
+    missing = 0
+    for item_id in item_ids:
+        if inventory.delete_item_by_id(int(item_id)) > 0:
+            print(f"L'article avec l'ID {item_id} a été supprimé.")
+        else:
+            missing += 1
+            print(f"Aucun article trouvé avec l'ID {item_id}.")
+    return EXIT_NOT_FOUND if missing else EXIT_OK
+
+
+def sharded_add(args, inventory):
+    if not args.name.strip() or not args.category.strip():
+        raise ValueError("Le nom et la catégorie ne peuvent pas être vides.")
+    item_id = inventory.add_product(
+        args.name, args.quantity, args.price, args.category
+        )
+    print(
+        f"Produit ajouté (ID {item_id}) : {args.name}, quantité :"
+        f" {args.quantity}, prix : {args.price}, catégorie : {args.category}"
+        )
+    return EXIT_OK
+
+
+# Sous-commandes disponibles en mode réparti (--shards)
+SHARDED_HANDLERS = {
+    "import": sharded_import,
+    "search": sharded_search,
+    "report": sharded_report,
+    "delete": sharded_delete,
+    "add": sharded_add
+}
+
+
+def build_parser():
+    """Analyseur des arguments ; sans sous-commande, le menu est lancé"""
+    argparse = load("argparse")
+    parser = argparse.ArgumentParser(
+        description="Système de gestion d'inventaire"
+        )
+    parser.add_argument(
+        "--db", default="inventory.db", help="chemin de la base SQLite"
+        )
+    parser.add_argument(
+        "--profile", default="performance",
+        help="profil de connexion (default, performance, safe)"
+        )
+    parser.add_argument(
+        "--config", metavar="FICHIER",
+        help="réglages JSON des PRAGMA, par exemple"
+        ' {"profile": "safe", "pragmas": {"cache_size": -131072}}'
+        )
+    parser.add_argument(
+        "--show-pragmas", action="store_true",
+        help="afficher les PRAGMA actifs après ouverture de la base"
+        )
+    parser.add_argument(
+        "--shards", type=int, metavar="N",
+        help="inventaire réparti par catégorie sur N fichiers SQLite ;"
+        " --db désigne alors un répertoire"
+        )
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="afficher le temps d'importation de chaque module"
+        )
+    parser.add_argument(
+        "--startup-budget", type=float, default=STARTUP_BUDGET_MS,
+        help="budget de démarrage en ms (défaut : %(default)s)"
+        )
+    parser.add_argument(
+        "--stats", metavar="FICHIER",
+        help="mesurer les appels et requêtes SQL, écrits en JSON ou CSV"
+        )
+    subparsers = parser.add_subparsers(dest="command")
+
+    sub = subparsers.add_parser("import", help="importer des fichiers CSV")
+    sub.add_argument(
+        "files", nargs="+",
+        help="fichiers ou motifs glob, - pour l'entrée standard"
+        )
+    sub.add_argument("--workers", type=int, help="nombre de processus")
+    sub.add_argument("--quiet", action="store_true")
+    sub.add_argument(
+        "--mode", choices=("insert", "replace", "add"), default="insert",
+        help="insert : ajout simple ; replace / add : mise à jour du produit"
+        " existant (nom + catégorie) en remplaçant / ajoutant la quantité"
+        )
+    sub.add_argument(
+        "--dedupe", action="store_true",
+        help="supprimer d'abord les doublons (nom, catégorie)"
+        )
+    sub.add_argument(
+        "--incremental", action="store_true",
+        help="ignorer les fichiers et les lignes déjà importés"
+        )
+    sub.add_argument(
+        "--reader", choices=("csv", "mmap"), default="csv",
+        help="mmap : lecture projetée en mémoire, plus rapide et plus sobre"
+        " sur les gros fichiers"
+        )
+    sub.add_argument(
+        "--rejects", metavar="FICHIER",
+        help="écarter les lignes invalides dans ce fichier CSV au lieu"
+        " d'interrompre l'importation"
+        )
+    sub.add_argument(
+        "--max-errors", type=int, metavar="N",
+        help="interrompre l'importation au-delà de N lignes invalides"
+        )
+    sub.add_argument(
+        "--strict", action="store_true",
+        help="refuser aussi les noms ou catégories vides et les prix"
+        " infinis (implicite avec --rejects et --max-errors)"
+        )
+    sub.set_defaults(handler=command_import, modules=("app.importer",))
+
+    sub = subparsers.add_parser("search", help="rechercher des produits")
+    sub.add_argument(
+        "criteria", nargs="+",
+        help="critères (name:App, category=Fruits, name^Ap, quantity>10,"
+        " price<=1.5), - pour l'entrée standard"
+        )
+    sub.add_argument("--csv", action="store_true", help="sortie CSV")
+    sub.add_argument(
+        "--cache-stats", action="store_true",
+        help="afficher les statistiques du cache de recherche"
+        )
+    sub.set_defaults(handler=command_search, modules=("app.search",))
+
+    sub = subparsers.add_parser("list", help="afficher toutes les données")
+    sub.add_argument("--csv", action="store_true", help="sortie CSV")
+    sub.set_defaults(handler=command_list, modules=())
+
+    sub = subparsers.add_parser("report", help="rapports")
+    sub.add_argument(
+        "-o", "--output", default="summary_report.csv",
+        help="fichier de sortie, - pour la sortie standard"
+        )
+    sub.add_argument(
+        "--type", default="summary",
+        choices=("summary", "detail", "low-stock", "top-value"),
+        help="rapport à produire (défaut : summary)"
+        )
+    sub.add_argument(
+        "--format", choices=("csv", "jsonl"),
+        help="format de sortie (défaut : selon l'extension)"
+        )
+    sub.add_argument("--gzip", action="store_true", help="compresser")
+    sub.add_argument(
+        "--threshold", type=int, default=10,
+        help="seuil de stock bas (low-stock)"
+        )
+    sub.add_argument(
+        "--limit", type=int, default=100,
+        help="nombre de produits (top-value)"
+        )
+    sub.add_argument(
+        "--check", action="store_true",
+        help="vérifier le récapitulatif matérialisé"
+        )
+    sub.add_argument(
+        "--rebuild", action="store_true",
+        help="reconstruire le récapitulatif matérialisé"
+        )
+    sub.set_defaults(handler=command_report, modules=("app.report",))
+
+    sub = subparsers.add_parser("delete", help="supprimer des articles")
+    add_bulk_arguments(sub)
+    sub.set_defaults(handler=command_delete, modules=())
+
+    sub = subparsers.add_parser("update", help="modifier des articles")
+    add_bulk_arguments(sub)
+    group = sub.add_mutually_exclusive_group()
+    group.add_argument("--quantity", type=int, help="nouvelle quantité")
+    group.add_argument(
+        "--add-quantity", type=int, metavar="ECART",
+        help="ajouter (ou retirer) à la quantité"
+        )
+    group = sub.add_mutually_exclusive_group()
+    group.add_argument("--price", type=float, help="nouveau prix")
+    group.add_argument(
+        "--price-factor", type=float, metavar="COEF",
+        help="multiplier le prix (ex. 1.05 pour +5 %%)"
+        )
+    sub.set_defaults(handler=command_update, modules=())
+
+    sub = subparsers.add_parser("add", help="ajouter un produit")
+    sub.add_argument("name")
+    sub.add_argument("quantity", type=int)
+    sub.add_argument("price", type=float)
+    sub.add_argument("category")
+    sub.set_defaults(handler=command_add, modules=())
+
+    sub = subparsers.add_parser(
+        "snapshot", help="instantané binaire de l'inventaire"
+        )
+    sub.add_argument(
+        "action", choices=("save", "load"),
+        help="save : enregistrer ; load : remplacer l'inventaire"
+        )
+    sub.add_argument("path", help="fichier de l'instantané")
+    sub.set_defaults(handler=command_snapshot, modules=("app.snapshot",))
+
+    sub = subparsers.add_parser(
+        "analytics", help="analyses en mémoire (NumPy si installé)"
+        )
+    sub.add_argument(
+        "-o", "--output",
+        help="rapport récapitulatif par catégorie (format de report)"
+        )
+    sub.add_argument(
+        "--percentiles", nargs="*", default=["price", "value"],
+        choices=("quantity", "price", "value"),
+        help="colonnes dont afficher les percentiles (défaut : price value)"
+        )
+    sub.add_argument(
+        "--top", type=int, default=10,
+        help="nombre de produits de plus grande valeur (0 : aucun)"
+        )
+    sub.add_argument(
+        "--histogram", type=int, default=10, metavar="INTERVALLES",
+        help="histogramme des prix (0 : aucun)"
+        )
+    sub.set_defaults(handler=command_analytics, modules=("app.analytics",))
+
+    sub = subparsers.add_parser(
+        "replicate", help="appliquer les modifications à une réplique"
+        )
+    sub.add_argument("replica", help="fichier de la réplique (créé au besoin)")
+    sub.add_argument(
+        "--batch-size", type=int, default=5000,
+        help="modifications par transaction (défaut : 5000)"
+        )
+    sub.add_argument(
+        "--max-changes", type=int,
+        help="nombre maximal de modifications appliquées"
+        )
+    sub.add_argument(
+        "--status", action="store_true",
+        help="afficher le retard sans rien appliquer"
+        )
+    sub.set_defaults(handler=command_replicate, modules=("app.replication",))
+    return parser
+
+
+def main(argv=None):
+    start = time.perf_counter()
+    args = build_parser().parse_args(argv)
+    if args.stats:
+        instrumentation = load("app.instrumentation")
+        instrumentation.enable()
+    try:
+        return run_command(args, start)
+    finally:
+        if args.stats:
+            instrumentation.dump_stats(args.stats)
+
+
+def run_command(args, start):
+    """Exécute la sous-commande demandée, ou le menu interactif"""
+    if args.command is None:
+        run_interactive(args.db, args.profile, args.config)
+        return EXIT_OK
+
+    handler = args.handler
+    if args.shards is not None:
+        handler = SHARDED_HANDLERS.get(args.command)
+        if handler is None:
+            print(f"La commande {args.command} n'est pas disponible en mode"
+                  " réparti.", file=sys.stderr)
+            return EXIT_USAGE
+    try:
+        database = load("app.database")
+        # Seuls les modules utiles à la sous-commande sont chargés
+        for module_name in args.modules:
+            load(module_name)
+        if args.shards is not None:
+            sharding = load("app.sharding")
+            db_conn = sharding.ShardedInventory(
+                args.db, args.shards, profile=args.profile,
+                config_file=args.config
+                )
+        else:
+            db_conn = database.initialize_database(
+                args.db, profile=args.profile, config_file=args.config
+                )
+    except Exception as e:
+        print(f"Erreur lors de l'ouverture de la base : {e}", file=sys.stderr)
+        return EXIT_ERROR
+    if args.show_pragmas:
+        print("PRAGMA actifs :", file=sys.stderr)
+        for name, value in db_conn.pragmas.items():
+            print(f"  {name:<20} {value}", file=sys.stderr)
+    if args.profile_startup:
+        startup_ms = (time.perf_counter() - start) * 1000
+        report_startup(startup_ms, args.startup_budget)
+    try:
+        return handler(args, db_conn)
+    except UsageError as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        return EXIT_USAGE
+    except Exception as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        db_conn.close()
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())